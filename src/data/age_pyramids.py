@@ -0,0 +1,190 @@
+"""Age-band populations of every municipality as one integer tensor"""
+import math
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from .age_group_parser import AGE_GROUP_NAMES
+
+
+# Gender rows of each municipality, in tensor order
+GENDERS = ("計", "男", "女")
+
+N_BANDS = len(AGE_GROUP_NAMES)
+
+# Stored for blank cells; never a population
+MISSING = -1
+
+# Band ranges (start, end) of the age structure groups
+YOUTH_BANDS = (0, 3)          # 0-14
+WORKING_AGE_BANDS = (3, 13)   # 15-64
+ELDERLY_BANDS = (13, N_BANDS)  # 65+
+LATE_ELDERLY_BANDS = (15, N_BANDS)  # 75+
+
+# Years per band (100歳以上 is treated as 100-104 for the median)
+BAND_WIDTH = 5
+
+# Indices computed from the bands, beyond the youth/working-age/elderly split
+DEMOGRAPHIC_COLUMNS = [
+    "late_elderly_population", "late_elderly_ratio",
+    "young_dependency_ratio", "old_dependency_ratio", "total_dependency_ratio",
+    "aging_index", "median_age", "sex_ratio",
+]
+
+
+class AgePyramids:
+    """
+    municipality × gender × band populations in a single array('i')
+
+    The value of (row, gender, band) is at
+    (row * len(GENDERS) + gender) * N_BANDS + band, with the gender totals
+    in a parallel (row, gender) array. Rows are sorted by code, so the
+    municipalities of a prefecture (whose codes share their first two
+    digits) are one contiguous range of rows and one contiguous slice of
+    the tensor.
+    """
+
+    def __init__(self, records: List[Dict]):
+        by_code: Dict[str, Dict[str, Dict]] = {}
+        for record in records:
+            by_code.setdefault(record["jichitai_code"], {}).setdefault(record["gender"], record)
+
+        self.codes: List[str] = sorted(by_code)
+        self.row_of: Dict[str, int] = {code: row for row, code in enumerate(self.codes)}
+        self.names: List[Optional[str]] = []
+        self.prefectures: List[Optional[str]] = []
+        self.totals = array("i", [MISSING]) * (len(self.codes) * len(GENDERS))
+        # 1 where the (row, gender) record exists, even if its cells are blank
+        self.present = bytearray(len(self.codes) * len(GENDERS))
+        self.counts = array("i", [MISSING]) * (len(self.codes) * len(GENDERS) * N_BANDS)
+        # prefecture -> (first row, end row)
+        self.prefecture_rows: Dict[str, Tuple[int, int]] = {}
+
+        for row, code in enumerate(self.codes):
+            genders = by_code[code]
+            first = next(iter(genders.values()))
+            self.names.append(first["municipality"])
+            self.prefectures.append(first["prefecture"])
+            start, _ = self.prefecture_rows.get(first["prefecture"], (row, row))
+            self.prefecture_rows[first["prefecture"]] = (start, row + 1)
+            for g, gender in enumerate(GENDERS):
+                record = genders.get(gender)
+                if record is None:
+                    continue
+                slot = row * len(GENDERS) + g
+                self.present[slot] = 1
+                if record["total"] is not None:
+                    self.totals[slot] = record["total"]
+                for band, name in enumerate(AGE_GROUP_NAMES):
+                    value = record["age_groups"].get(name)
+                    if value is not None:
+                        self.counts[slot * N_BANDS + band] = value
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def value(self, row: int, gender: int, band: int) -> Optional[int]:
+        value = self.counts[(row * len(GENDERS) + gender) * N_BANDS + band]
+        return None if value == MISSING else value
+
+    def total(self, row: int, gender: int) -> Optional[int]:
+        value = self.totals[row * len(GENDERS) + gender]
+        return None if value == MISSING else value
+
+    def pyramid(self, row: int, gender: int) -> List[Optional[int]]:
+        """The 21 band populations of one row and gender (None for blanks)"""
+        start = (row * len(GENDERS) + gender) * N_BANDS
+        return [None if value == MISSING else value for value in self.counts[start:start + N_BANDS]]
+
+    def band(self, gender: int, band: int) -> List[Tuple[str, int]]:
+        """(code, population) of one band and gender for every row that has it"""
+        values = self.band_column(gender, band)
+        return [(code, value) for code, value in zip(self.codes, values) if value != MISSING]
+
+    def band_column(self, gender: int, band: int) -> array:
+        """One band and gender for every row, in row order (MISSING for blanks)"""
+        return self.counts[gender * N_BANDS + band::len(GENDERS) * N_BANDS]
+
+    def rows(self, prefecture: Optional[str] = None) -> range:
+        """Rows of every municipality, or of one prefecture (empty if unknown)"""
+        if prefecture is None:
+            return range(len(self.codes))
+        return range(*self.prefecture_rows.get(prefecture, (0, 0)))
+
+
+def _ratio(numerator: float, denominator: float, digits: int = 2) -> float:
+    return round(numerator / denominator * 100, digits) if denominator > 0 else math.nan
+
+
+def _median_age(bands) -> float:
+    """Age at which half of the banded population is younger, interpolated within its band"""
+    half = sum(bands) / 2
+    if not half:
+        return math.nan
+    cumulative = 0
+    for band, count in enumerate(bands):
+        if count and cumulative + count >= half:
+            return round(BAND_WIDTH * (band + (half - cumulative) / count), 1)
+        cumulative += count
+    return math.nan
+
+
+def demographic_indices(pyramids: AgePyramids) -> Dict[str, array]:
+    """
+    Age structure and demographic indices of every row, as columns
+
+    Works band by band: each band is one strided slice of the tensor, and
+    group sums are element-wise sums of those slices. Blank bands count
+    as 0; rows without a 計 record are NaN throughout.
+
+    Returns:
+        Column name -> array('d') aligned with pyramids.codes
+    """
+    n = len(pyramids)
+    stride = len(GENDERS)
+    bands = [[max(count, 0) for count in pyramids.band_column(0, band)] for band in range(N_BANDS)]
+
+    def group(bounds):
+        return [sum(counts) for counts in zip(*bands[bounds[0]:bounds[1]])]
+
+    youth = group(YOUTH_BANDS)
+    working = group(WORKING_AGE_BANDS)
+    elderly = group(ELDERLY_BANDS)
+    late_elderly = group(LATE_ELDERLY_BANDS)
+    totals = pyramids.totals[0::stride]
+    males = pyramids.totals[1::stride]
+    females = pyramids.totals[2::stride]
+
+    columns = {
+        name: array("d", [math.nan]) * n for name in (
+            "age_population_total", "youth_population", "working_age_population", "elderly_population",
+            "youth_ratio", "working_age_ratio", "elderly_ratio",
+            *DEMOGRAPHIC_COLUMNS,
+        )
+    }
+    for row, row_bands in enumerate(zip(*bands)):
+        if not pyramids.present[row * stride]:
+            continue
+        total = totals[row] if totals[row] != MISSING else math.nan
+        columns["age_population_total"][row] = total
+        columns["youth_population"][row] = youth[row]
+        columns["working_age_population"][row] = working[row]
+        columns["elderly_population"][row] = elderly[row]
+        columns["late_elderly_population"][row] = late_elderly[row]
+        if total > 0:
+            columns["youth_ratio"][row] = _ratio(youth[row], total)
+            columns["working_age_ratio"][row] = _ratio(working[row], total)
+            columns["elderly_ratio"][row] = _ratio(elderly[row], total)
+            columns["late_elderly_ratio"][row] = _ratio(late_elderly[row], total)
+        columns["young_dependency_ratio"][row] = _ratio(youth[row], working[row])
+        columns["old_dependency_ratio"][row] = _ratio(elderly[row], working[row])
+        columns["total_dependency_ratio"][row] = _ratio(youth[row] + elderly[row], working[row])
+        columns["aging_index"][row] = _ratio(elderly[row], youth[row])
+        columns["median_age"][row] = _median_age(row_bands)
+        if males[row] != MISSING and females[row] != MISSING:
+            columns["sex_ratio"][row] = _ratio(males[row], females[row], 1)
+    return columns
+
+
+def build_age_pyramids(dataset) -> AgePyramids:
+    """Derived-structure builder"""
+    return AgePyramids(dataset.records("age_group"))
@@ -0,0 +1,97 @@
+"""
+Cooperative cancellation and time budgets for tool calls
+
+The server runs each tool call under a CallBudget, installed in a context
+variable for the worker thread. Long loops call checkpoint(), which raises
+once the call has been cancelled or its deadline has passed, so abandoned
+work stops at the next checkpoint instead of running to completion.
+Outside a budget (tests, scripts), checkpoint() does nothing.
+
+Dataset loading has no checkpoints: a load shared by every later call must
+not be thrown away because the call that happened to trigger it gave up.
+"""
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Iterator, Optional
+
+
+class CallAborted(BaseException):
+    """
+    The current call was cancelled or ran out of time
+
+    A BaseException, like asyncio.CancelledError, so that handlers turning
+    errors into responses (except Exception) do not swallow it.
+    """
+
+
+class CallCancelled(CallAborted):
+    """Every caller waiting for the call went away"""
+
+
+class DeadlineExceeded(CallAborted):
+    """The call ran past its time budget"""
+
+
+class CallBudget:
+    """Cancellation flag and optional deadline of one tool call"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self._cancelled = threading.Event()
+        self.start()
+
+    def start(self):
+        """(Re)start the clock; the deadline is timeout seconds from now"""
+        self.started = time.monotonic()
+        self.deadline = self.started + self.timeout if self.timeout else None
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def aborted(self) -> bool:
+        return self.cancelled or self.expired()
+
+    def check(self):
+        """Raise CallCancelled or DeadlineExceeded if the call should stop"""
+        if self.cancelled:
+            raise CallCancelled()
+        if self.expired():
+            raise DeadlineExceeded()
+
+
+_current: contextvars.ContextVar[Optional[CallBudget]] = contextvars.ContextVar("call_budget", default=None)
+
+
+@contextlib.contextmanager
+def budget_scope(budget: CallBudget) -> Iterator[CallBudget]:
+    """Run the enclosed code under a budget"""
+    token = _current.set(budget)
+    try:
+        yield budget
+    finally:
+        _current.reset(token)
+
+
+def checkpoint():
+    """Abort the current call here if it was cancelled or is past its deadline"""
+    budget = _current.get()
+    if budget is not None:
+        budget.check()
+
+
+def aborted() -> bool:
+    """Whether the current call should stop (for callbacks that cannot raise)"""
+    budget = _current.get()
+    return budget is not None and budget.aborted()
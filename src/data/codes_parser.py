@@ -1,78 +1,60 @@
 """Parser for municipal codes from Excel files"""
-import openpyxl
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
+from .xlsx import intern, read_rows
+
 
 class CodesParser:
     """Parse municipal codes from Excel files"""
 
     def __init__(self, file_path: str):
         self.file_path = Path(file_path)
-        self.workbook = None
-        self.worksheet = None
+        self._records = None
 
     def load(self):
-        """Load the Excel file"""
+        """Read the Excel file into records and release the workbook"""
         if not self.file_path.exists():
             raise FileNotFoundError(f"Codes data file not found: {self.file_path}")
 
-        self.workbook = openpyxl.load_workbook(self.file_path, data_only=True)
-        # Get first sheet (R6.1.1現在の団体)
-        self.worksheet = self.workbook[self.workbook.sheetnames[0]]
-
-    def parse(self) -> List[Dict]:
-        """
-        Parse municipal codes from Excel file
-
-        Returns:
-            List of dictionaries with code data for each municipality
-        """
-        if self.worksheet is None:
-            self.load()
-
-        ws = self.worksheet
         data = []
 
         # Data starts at row 2
         # Columns: 1=団体コード, 2=都道府県名(漢字), 3=市区町村名(漢字), 4=都道府県名(カナ), 5=市区町村名(カナ)
-        for row_idx in range(2, ws.max_row + 1):
-            jichitai_code = ws.cell(row_idx, 1).value
-            prefecture_kanji = ws.cell(row_idx, 2).value
-            municipality_kanji = ws.cell(row_idx, 3).value
-            prefecture_kana = ws.cell(row_idx, 4).value
-            municipality_kana = ws.cell(row_idx, 5).value
+        # First sheet: R6.1.1現在の団体
+        for row in read_rows(self.file_path, min_row=2, width=5):
+            jichitai_code, prefecture_kanji, municipality_kanji, prefecture_kana, municipality_kana = row[:5]
 
             # Skip if no code
             if not jichitai_code:
                 continue
 
             # Determine type
-            jichitai_type = None
-            if municipality_kanji is None:
-                jichitai_type = "都道府県"
-            elif "市" in municipality_kanji:
-                if "区" in municipality_kanji:
-                    jichitai_type = "区"
-                else:
-                    jichitai_type = "市"
-            elif "町" in municipality_kanji:
-                jichitai_type = "町"
-            elif "村" in municipality_kanji:
-                jichitai_type = "村"
+            jichitai_type = jichitai_type_of(municipality_kanji)
 
             record = {
-                "jichitai_code": str(jichitai_code).zfill(6),
-                "prefecture": prefecture_kanji,
+                "jichitai_code": intern(str(jichitai_code).zfill(6)),
+                "prefecture": intern(prefecture_kanji),
                 "municipality": municipality_kanji,
-                "prefecture_kana": prefecture_kana,
+                "prefecture_kana": intern(prefecture_kana),
                 "municipality_kana": municipality_kana,
-                "jichitai_type": jichitai_type,
+                "jichitai_type": intern(jichitai_type),
             }
 
             data.append(record)
 
-        return data
+        self._records = data
+
+    def parse(self) -> List[Dict]:
+        """
+        Parse municipal codes from Excel file
+
+        Returns:
+            List of dictionaries with code data for each municipality
+        """
+        if self._records is None:
+            self.load()
+        return self._records
 
     def get_by_code(self, jichitai_code: str) -> Optional[Dict]:
         """Get code data for a specific municipality by code"""
@@ -96,35 +78,7 @@ class CodesParser:
         Returns:
             List of matching records with match scores
         """
-        data = self.parse()
-        results = []
-
-        for record in data:
-            # Skip prefecture-only records
-            if record["municipality"] is None:
-                continue
-
-            # Check if name matches
-            municipality = record["municipality"]
-            match_score = 0.0
-
-            if municipality_name == municipality:
-                match_score = 1.0  # Exact match
-            elif municipality_name in municipality:
-                match_score = 0.9  # Contains
-            elif municipality in municipality_name:
-                match_score = 0.8  # Partial match
-
-            # Check prefecture if specified
-            if match_score > 0:
-                if prefecture is None or prefecture in record["prefecture"]:
-                    result = record.copy()
-                    result["match_score"] = match_score
-                    results.append(result)
-
-        # Sort by match score descending
-        results.sort(key=lambda x: x["match_score"], reverse=True)
-        return results
+        return match_by_name(self.parse(), municipality_name, prefecture)
 
     def get_municipalities_only(self) -> List[Dict]:
         """Get only municipality records (exclude prefectures)"""
@@ -132,6 +86,95 @@ class CodesParser:
         return [r for r in data if r["municipality"] is not None]
 
     def close(self):
-        """Close the workbook"""
-        if self.workbook:
-            self.workbook.close()
\ No newline at end of file
+        """Drop the parsed records (the workbook is already closed)"""
+        self._records = None
+
+
+def jichitai_type_of(municipality: Optional[str]) -> Optional[str]:
+    """Municipality type from its name (None for special wards and unknown names)"""
+    if municipality is None:
+        return "都道府県"
+    if "市" in municipality:
+        if "区" in municipality:
+            return "区"
+        return "市"
+    if "町" in municipality:
+        return "町"
+    if "村" in municipality:
+        return "村"
+    return None
+
+
+def name_resolver(records: List[Dict]) -> Callable[[Optional[str], Optional[str]], Optional[str]]:
+    """
+    Build a (name, prefecture) -> jichitai_code resolver over code records
+
+    Sources keyed by name sometimes carry the county (e.g. '紫波郡矢巾町'),
+    so the longest code name that the given name ends with is used when
+    there is no exact match within the prefecture.
+    """
+    by_prefecture: Dict[str, List[Tuple[str, str]]] = {}
+    exact: Dict[Tuple[str, str], str] = {}
+    for record in records:
+        if record["municipality"] is None:
+            continue
+        exact.setdefault((record["prefecture"], record["municipality"]), record["jichitai_code"])
+        by_prefecture.setdefault(record["prefecture"], []).append(
+            (record["municipality"], record["jichitai_code"])
+        )
+
+    def resolve(name: Optional[str], prefecture: Optional[str]) -> Optional[str]:
+        if not name:
+            return None
+        code = exact.get((prefecture, name))
+        if code:
+            return code
+        best = None
+        for candidate, candidate_code in by_prefecture.get(prefecture, []):
+            if name.endswith(candidate) and (best is None or len(candidate) > len(best[0])):
+                best = (candidate, candidate_code)
+        return best[1] if best else None
+
+    return resolve
+
+
+def match_by_name(records: List[Dict], municipality_name: str, prefecture: Optional[str] = None) -> List[Dict]:
+    """
+    Fuzzy-match code records by municipality name
+
+    Args:
+        records: Parsed code records
+        municipality_name: Name of municipality to search
+        prefecture: Optional prefecture name to narrow search
+
+    Returns:
+        List of matching records with match scores, best match first
+    """
+    results = []
+
+    for record in records:
+        # Skip prefecture-only records
+        if record["municipality"] is None:
+            continue
+
+        # Check if name matches
+        municipality = record["municipality"]
+        match_score = 0.0
+
+        if municipality_name == municipality:
+            match_score = 1.0  # Exact match
+        elif municipality_name in municipality:
+            match_score = 0.9  # Contains
+        elif municipality in municipality_name:
+            match_score = 0.8  # Partial match
+
+        # Check prefecture if specified
+        if match_score > 0:
+            if prefecture is None or prefecture in record["prefecture"]:
+                result = record.copy()
+                result["match_score"] = match_score
+                results.append(result)
+
+    # Sort by match score descending
+    results.sort(key=lambda x: x["match_score"], reverse=True)
+    return results
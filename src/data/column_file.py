@@ -0,0 +1,141 @@
+"""
+Fixed-width, memory-mappable encoding of the municipality table
+
+Layout (all integers little-endian, every block 8-byte aligned):
+    b"JCOL" | u32 version | u32 directory length | directory JSON
+    numeric column: n_rows float64 (NaN = missing)
+    flag column:    n_rows uint8
+    string column:  n_rows uint8 null flags | (n_rows + 1) uint32 offsets | UTF-8 blob
+
+Block offsets in the directory are relative to the first block, so the
+section can be embedded at any 8-byte aligned position of a file.
+Readers map the file and view numeric columns in place: processes that
+map the same file share its pages through the page cache, and nothing is
+deserialized at startup.
+"""
+import json
+import struct
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from .table import MunicipalityTable
+
+
+MAGIC = b"JCOL"
+COLUMN_FORMAT = 1
+_PREFIX = struct.Struct("<4sII")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _le(values: array) -> bytes:
+    """Little-endian bytes of an array"""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_table(table: MunicipalityTable) -> bytes:
+    """Serialize a table into one column section"""
+    blocks: List[bytes] = []
+    directory: Dict[str, Dict] = {"n_rows": table.n_rows, "strings": {}, "numeric": {}, "flags": {}}
+    position = 0
+
+    def add(data: bytes) -> int:
+        nonlocal position
+        offset = position
+        blocks.append(data + b"\0" * (_align(len(data)) - len(data)))
+        position += _align(len(data))
+        return offset
+
+    for name, values in table.strings.items():
+        nulls = bytes(value is None for value in values)
+        encoded = [(value or "").encode("utf-8") for value in values]
+        offsets = array("I", [0])
+        for item in encoded:
+            offsets.append(offsets[-1] + len(item))
+        directory["strings"][name] = {
+            "nulls": add(nulls),
+            "offsets": add(_le(offsets)),
+            "blob": add(b"".join(encoded)),
+        }
+    for name, values in table.numeric.items():
+        directory["numeric"][name] = add(_le(array("d", values)))
+    directory["flags"]["is_unit"] = add(bytes(bool(flag) for flag in table.is_unit))
+
+    header = json.dumps(directory, ensure_ascii=False).encode("utf-8")
+    prefix = _PREFIX.pack(MAGIC, COLUMN_FORMAT, len(header)) + header
+    return prefix + b"\0" * (_align(len(prefix)) - len(prefix)) + b"".join(blocks)
+
+
+class MappedStrings:
+    """Read-only sequence of strings decoded on access from an offset-indexed blob"""
+
+    def __init__(self, buffer: memoryview, n_rows: int, nulls: int, offsets: int, blob: int):
+        self._nulls = buffer[nulls:nulls + n_rows]
+        self._offsets = _view(buffer[offsets:offsets + 4 * (n_rows + 1)], "I")
+        self._buffer = buffer
+        self._blob = blob
+        self._n_rows = n_rows
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        if row < 0:
+            row += self._n_rows
+        if not 0 <= row < self._n_rows:
+            raise IndexError(row)
+        if self._nulls[row]:
+            return None
+        start = self._blob + self._offsets[row]
+        end = self._blob + self._offsets[row + 1]
+        return str(self._buffer[start:end], "utf-8")
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return (self[row] for row in range(self._n_rows))
+
+
+def _view(buffer: memoryview, typecode: str):
+    """Typed view of little-endian data (copied only on big-endian hosts)"""
+    if sys.byteorder == "little":
+        return buffer.cast(typecode)
+    values = array(typecode, buffer.tobytes())
+    values.byteswap()
+    return values
+
+
+class MappedTable(MunicipalityTable):
+    """
+    MunicipalityTable backed by a column section in a mapped file
+
+    Numeric columns are memoryviews of the mapping (indexable like
+    array('d')), strings are decoded per access, and only the
+    code -> row index is built in process memory.
+    """
+
+    def __init__(self, buffer: memoryview):
+        magic, version, header_length = _PREFIX.unpack_from(buffer, 0)
+        if magic != MAGIC or version != COLUMN_FORMAT:
+            raise ValueError("Unsupported column section")
+        directory = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + header_length]))
+        buffer = buffer[_align(_PREFIX.size + header_length):]
+
+        n_rows = directory["n_rows"]
+        self.n_rows = n_rows
+        self.strings = {
+            name: MappedStrings(buffer, n_rows, **parts)
+            for name, parts in directory["strings"].items()
+        }
+        self.numeric = {
+            name: _view(buffer[offset:offset + 8 * n_rows], "d")
+            for name, offset in directory["numeric"].items()
+        }
+        offset = directory["flags"]["is_unit"]
+        self.is_unit = buffer[offset:offset + n_rows]
+        self.codes = self.strings["jichitai_code"]
+        self.row_of = {code: row for row, code in enumerate(self.codes)}
@@ -0,0 +1,70 @@
+"""Parser for municipal office coordinates"""
+import csv
+import math
+from pathlib import Path
+from typing import Dict, List
+
+from .xlsx import intern
+
+
+# Header of the coordinates CSV: one row per municipal office
+COORDINATE_COLUMNS = ("jichitai_code", "latitude", "longitude")
+
+
+def _degrees(value, limit: float) -> float:
+    """Cell value as degrees within [-limit, limit], NaN otherwise"""
+    try:
+        degrees = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return degrees if -limit <= degrees <= limit else math.nan
+
+
+class CoordinatesParser:
+    """
+    Parse the municipal office coordinates CSV (geo/municipal_office_coordinates.csv)
+
+    Columns: jichitai_code, latitude, longitude (decimal degrees, WGS84).
+    Other columns, such as an office name, are ignored. Rows without a
+    code or with coordinates out of range are skipped.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = Path(file_path)
+        self._records = None
+
+    def load(self):
+        """Read the CSV into records"""
+        if not self.file_path.exists():
+            raise FileNotFoundError(f"Coordinates file not found: {self.file_path}")
+
+        data = []
+        with open(self.file_path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                code = (row.get("jichitai_code") or "").strip()
+                latitude = _degrees(row.get("latitude"), 90.0)
+                longitude = _degrees(row.get("longitude"), 180.0)
+                if not code or math.isnan(latitude) or math.isnan(longitude):
+                    continue
+                data.append({
+                    "jichitai_code": intern(code.zfill(6)),
+                    "latitude": latitude,
+                    "longitude": longitude,
+                })
+
+        self._records = data
+
+    def parse(self) -> List[Dict]:
+        """
+        Parse the office coordinates
+
+        Returns:
+            List of dictionaries, one per municipality
+        """
+        if self._records is None:
+            self.load()
+        return self._records
+
+    def close(self):
+        """Release parsed records"""
+        self._records = None
@@ -0,0 +1,104 @@
+"""Which sources cover each municipality, as one bitmask per code"""
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+
+# Sources tracked, in bit order
+COVERAGE_SOURCES = ("codes", "population", "finance", "mynumber", "age_group", "dx")
+
+BITS = {source: 1 << bit for bit, source in enumerate(COVERAGE_SOURCES)}
+
+
+def sources_of(mask: int) -> List[str]:
+    """Sources whose bit is set in mask"""
+    return [source for source in COVERAGE_SOURCES if mask & BITS[source]]
+
+
+class CoverageIndex:
+    """
+    Per-code source coverage computed once per dataset
+
+    covered[source] is the set of codes the source has data for; masks
+    combines them into one int per code, so checking, filtering and
+    counting coverage never touches the sources themselves.
+    """
+
+    def __init__(self, covered: Dict[str, Set[str]], prefectures: Dict[str, Optional[str]], available: Iterable[str]):
+        self.covered = {source: frozenset(covered.get(source, ())) for source in COVERAGE_SOURCES}
+        available = set(available)
+        self.available = [source for source in COVERAGE_SOURCES if source in available]
+        self.prefectures = prefectures
+
+        self.masks: Dict[str, int] = dict.fromkeys(sorted(set().union(*self.covered.values())), 0)
+        for source, codes in self.covered.items():
+            bit = BITS[source]
+            for code in codes:
+                self.masks[code] |= bit
+
+    def mask(self, code: str) -> int:
+        return self.masks.get(str(code).zfill(6), 0)
+
+    def sources(self, code: str) -> List[str]:
+        """Sources with data for a code"""
+        return sources_of(self.mask(code))
+
+    def covers(self, code: str, source: str) -> bool:
+        return bool(self.mask(code) & BITS[source])
+
+    def codes(self, prefecture: Optional[str] = None) -> List[str]:
+        """Every code known to any source (optionally in one prefecture)"""
+        if prefecture is None:
+            return list(self.masks)
+        return [code for code in self.masks if self.prefectures.get(code) == prefecture]
+
+    def summary(self, prefecture: Optional[str] = None) -> Dict:
+        """Per-source coverage counts and the most common source combinations"""
+        codes = set(self.codes(prefecture))
+        total = len(codes)
+        sources = {}
+        for source in COVERAGE_SOURCES:
+            covered = len(codes & self.covered[source])
+            sources[source] = {
+                "available": source in self.available,
+                "covered": covered,
+                "missing": total - covered,
+                "coverage_ratio": round(covered / total, 4) if total else 0.0,
+            }
+        combinations = Counter(self.masks[code] for code in codes)
+        return {
+            "municipality_count": total,
+            "complete_count": combinations[sum(BITS[source] for source in self.available)],
+            "sources": sources,
+            "combinations": [
+                {"sources": sources_of(mask), "count": count}
+                for mask, count in combinations.most_common()
+            ],
+        }
+
+
+def build_coverage(dataset) -> CoverageIndex:
+    """Derived-structure builder"""
+    table = dataset.derived("table")
+    codes = {r["jichitai_code"] for r in dataset.records("codes") if r["municipality"] is not None}
+    mynumber_population = table.numeric["mynumber_population"]
+    covered = {
+        "codes": codes,
+        "population": set(dataset.derived("population_by_code")),
+        "finance": set(dataset.derived("finance_by_code")),
+        "mynumber": {table.codes[row] for row in range(table.n_rows) if not math.isnan(mynumber_population[row])},
+        "age_group": set(dataset.derived("age_groups_by_code")),
+        "dx": set(),
+    }
+    rankings = dataset.derived("dx_rankings")
+    if rankings is not None:
+        for columns in rankings.columns.values():
+            covered["dx"].update(column["jichitai_code"] for column in columns if column["jichitai_code"])
+
+    prefectures = {}
+    for code, records in dataset.derived("age_groups_by_code").items():
+        prefectures[code] = records[0]["prefecture"]
+    for row, code in enumerate(table.codes):
+        prefectures[code] = table.strings["prefecture"][row]
+
+    return CoverageIndex(covered, prefectures, (source for source in COVERAGE_SOURCES if dataset.has(source)))
@@ -1,18 +1,77 @@
 """Central data manager that integrates all parsers"""
-from typing import Dict, List, Optional
+import logging
+import math
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 from .population_parser import PopulationParser
 from .finance_parser import FinanceParser
-from .codes_parser import CodesParser
+from .codes_parser import CodesParser, match_by_name
 from .mynumber_parser import MyNumberParser
 from .dx_parser import DXParser
-from .age_group_parser import AgeGroupParser
+from .age_group_parser import AGE_GROUP_NAMES, AgeGroupParser
+from .age_pyramids import DEMOGRAPHIC_COLUMNS, GENDERS
+from .history_parser import HistoryParser
+from .coordinates_parser import CoordinatesParser
+from .spatial import check_point
+from .dataset import Dataset, SOURCES
+from .timeseries import SERIES_MODES, SERIES_PATTERNS, VintageParser, vintage_of
+from .watcher import SourceWatcher
+from .snapshot import load_snapshot, save_snapshot
+from .query import SORT_ORDERS, QueryError, predicate_fields
+from .cancellation import checkpoint
+from .export import EXPORT_COLUMNS, ExportError, check_options, export_predicate, stream_export, write_export
+
+
+logger = logging.getLogger(__name__)
+
+# Source files relative to the data directory
+SOURCE_FILES = {
+    "population": ("population/r06_municipal_population.xlsx",),
+    # All municipalities (cities, towns, villages, special wards)
+    "finance": ("finance/r05_finance_all_municipalities.xlsx",),
+    "codes": ("codes/municipal_codes_2019.xlsx",),
+    "mynumber": ("mynumber/mynumber_card_rate.xlsx",),
+    "dx": (
+        "dx_dashboard/extracted/市区町村毎のDX進捗状況_市区町村比較.xlsx",
+        "dx_dashboard/extracted/市区町村毎のDX進捗状況_行政手続のオンライン申請率.xlsx",
+    ),
+    "age_group": ("population/age_group_population.xlsx",),
+    # Optional: retired codes and names (廃置分合) and their successors
+    "history": ("codes/municipal_code_history.csv",),
+    # Optional: latitude/longitude of each municipal office
+    "geo": ("geo/municipal_office_coordinates.csv",),
+}
+
+# DataManager attribute holding the parser of each source
+PARSER_ATTRS = {
+    "population": "population_parser",
+    "finance": "finance_parser",
+    "codes": "codes_parser",
+    "mynumber": "mynumber_parser",
+    "dx": "dx_parser",
+    "age_group": "age_group_parser",
+    "series": "vintage_parser",
+    "history": "history_parser",
+    "geo": "coordinates_parser",
+}
+
+PARSER_CLASSES = {
+    "population": PopulationParser,
+    "finance": FinanceParser,
+    "codes": CodesParser,
+    "mynumber": MyNumberParser,
+    "dx": DXParser,
+    "age_group": AgeGroupParser,
+    "history": HistoryParser,
+    "geo": CoordinatesParser,
+}
 
 
 class DataManager:
     """Central manager for all municipality data"""
 
-    def __init__(self, data_dir: str = None):
+    def __init__(self, data_dir: str = None, sqlite_path: str = None, snapshot_path: str = None):
         # Default to data directory relative to this file's location
         if data_dir is None:
             # Get the project root (2 levels up from this file)
@@ -26,48 +85,235 @@ class DataManager:
         self.mynumber_parser = None
         self.dx_parser = None
         self.age_group_parser = None
+        self.vintage_parser = None
+        self.history_parser = None
+        self.coordinates_parser = None
+
+        # Current dataset version (loaded on first access, swapped on reload)
+        self._dataset = None
+        self._dataset_lock = threading.RLock()
+        self._watcher = None
+
+        # Optional SQLite copy of the dataset, re-synced on every new version
+        self.sqlite = None
+        if sqlite_path:
+            from .sqlite_backend import SQLiteBackend
+            self.sqlite = SQLiteBackend(sqlite_path)
+
+        # Serve from a prebuilt snapshot instead of the workbooks (no parsers, no reload)
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
 
         # Initialize parsers
-        self._init_parsers()
+        if self.snapshot_path is None:
+            self._init_parsers()
 
     def _init_parsers(self):
         """Initialize all data parsers"""
-        # Population parser
-        pop_file = self.data_dir / "population" / "r06_municipal_population.xlsx"
-        if pop_file.exists():
-            self.population_parser = PopulationParser(str(pop_file))
-
-        # Finance parser - all municipalities (cities, towns, villages, special wards)
-        finance_file = self.data_dir / "finance" / "r05_finance_all_municipalities.xlsx"
-        if finance_file.exists():
-            self.finance_parser = FinanceParser(str(finance_file))
-
-        # Codes parser
-        codes_file = self.data_dir / "codes" / "municipal_codes_2019.xlsx"
-        if codes_file.exists():
-            self.codes_parser = CodesParser(str(codes_file))
-
-        # My Number Card parser
-        mynumber_file = self.data_dir / "mynumber" / "mynumber_card_rate.xlsx"
-        if mynumber_file.exists():
-            self.mynumber_parser = MyNumberParser(str(mynumber_file))
-
-        # DX Dashboard parser
-        dx_comparison_file = self.data_dir / "dx_dashboard" / "extracted" / "市区町村毎のDX進捗状況_市区町村比較.xlsx"
-        dx_online_file = self.data_dir / "dx_dashboard" / "extracted" / "市区町村毎のDX進捗状況_行政手続のオンライン申請率.xlsx"
-        if dx_comparison_file.exists() and dx_online_file.exists():
-            self.dx_parser = DXParser(str(dx_comparison_file), str(dx_online_file))
-
-        # Age group population parser
-        age_group_file = self.data_dir / "population" / "age_group_population.xlsx"
-        if age_group_file.exists():
-            self.age_group_parser = AgeGroupParser(str(age_group_file))
+        for source in SOURCES:
+            setattr(self, PARSER_ATTRS[source], self._create_parser(source))
+
+    def _source_paths(self, source: str) -> List[Path]:
+        """Absolute paths of the files backing a source"""
+        if source == "series":
+            return [path for _, path in self._vintage_files()]
+        return [self.data_dir / rel_path for rel_path in SOURCE_FILES[source]]
+
+    def _vintage_files(self) -> List[Tuple[str, Path]]:
+        """
+        Vintage files: (source, path)
+
+        Past vintages, plus any current file whose name has no vintage label
+        (its label is read from the file). Current files with a label are
+        already parsed as their source and are not repeated here.
+        """
+        files = []
+        for source, pattern in SERIES_PATTERNS.items():
+            current = self._source_paths(source)
+            for path in sorted(self.data_dir.glob(pattern)):
+                if path not in current and vintage_of(path.name):
+                    files.append((source, path))
+            files.extend(
+                (source, path) for path in current
+                if not vintage_of(path.name) and path.exists()
+            )
+        return files
+
+    def _create_parser(self, source: str):
+        """Create the parser for a source, or None if its files are missing"""
+        if source == "series":
+            files = self._vintage_files()
+            return VintageParser([(s, str(path)) for s, path in files]) if files else None
+
+        paths = self._source_paths(source)
+        if not all(path.exists() for path in paths):
+            return None
+        return PARSER_CLASSES[source](*[str(path) for path in paths])
+
+    def _source_fingerprint(self, source: str) -> Optional[Tuple]:
+        """(name, size, mtime) of every file of a source, or None if any is missing"""
+        paths = self._source_paths(source)
+        if not paths:
+            return None
+
+        fingerprint = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                return None
+            fingerprint.append((path.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(fingerprint)
+
+    @property
+    def dataset(self) -> Dataset:
+        """
+        Current immutable dataset version
+
+        Request handlers should read this once and use the returned object
+        throughout, so a concurrent reload cannot change data mid-request.
+        """
+        dataset = self._dataset
+        if dataset is None:
+            with self._dataset_lock:
+                if self._dataset is None:
+                    self._dataset = self._load_dataset()
+                    self._sync_sqlite(self._dataset)
+                dataset = self._dataset
+        return dataset
+
+    def _load_dataset(self) -> Dataset:
+        """Parse every available source (or read the snapshot) into the first dataset version"""
+        if self.snapshot_path is not None:
+            return load_snapshot(self.snapshot_path)
+
+        records = {}
+        fingerprints = {}
+        for source in SOURCES:
+            fingerprints[source] = self._source_fingerprint(source)
+            parser = getattr(self, PARSER_ATTRS[source])
+            if parser:
+                records[source] = self._ingest(source, parser)
+        return Dataset(records, fingerprints)
+
+    def _ingest(self, source: str, parser):
+        """Extract the data a dataset keeps for a source from its parser"""
+        if source == "dx":
+            return parser.load_data()
+        return parser.parse()
+
+    def changed_sources(self) -> Dict[str, Optional[Tuple]]:
+        """
+        Sources whose files differ from the current dataset
+
+        Returns:
+            source -> current fingerprint (None if the files were removed)
+        """
+        dataset = self._dataset
+        if dataset is None or self.snapshot_path is not None:
+            return {}
+
+        changed = {}
+        for source in SOURCES:
+            fingerprint = self._source_fingerprint(source)
+            if fingerprint != dataset.fingerprint(source):
+                changed[source] = fingerprint
+        return changed
+
+    def reload(self, sources: Optional[List[str]] = None) -> Optional[Dataset]:
+        """
+        Re-ingest changed sources and atomically swap in a new dataset
+
+        Only the given (or all changed) sources are re-parsed; everything
+        else is shared with the previous version. Requests already running
+        keep the dataset they started with.
+
+        Args:
+            sources: Sources to check (default: all)
+
+        Returns:
+            The new dataset, or None if nothing changed (always None when
+            serving from a snapshot)
+        """
+        if self.snapshot_path is not None:
+            return None
+
+        with self._dataset_lock:
+            current = self.dataset
+
+            updates = {}
+            parsers = {}
+            try:
+                for source in sources or SOURCES:
+                    fingerprint = self._source_fingerprint(source)
+                    if fingerprint == current.fingerprint(source):
+                        continue
+                    parser = self._create_parser(source)
+                    parsers[source] = parser
+                    updates[source] = (self._ingest(source, parser) if parser else None, fingerprint)
+            except Exception:
+                for parser in parsers.values():
+                    if parser:
+                        parser.close()
+                raise
+
+            if not updates:
+                return None
+
+            new_dataset = current.replace(updates)
+            self._dataset = new_dataset
+
+            for source, parser in parsers.items():
+                old_parser = getattr(self, PARSER_ATTRS[source])
+                setattr(self, PARSER_ATTRS[source], parser)
+                if old_parser:
+                    old_parser.close()
+
+            self._sync_sqlite(new_dataset)
+            return new_dataset
+
+    def save_snapshot(self, path: str) -> Path:
+        """
+        Write the current dataset to a snapshot file
+
+        Args:
+            path: Snapshot file to write
+
+        Returns:
+            Path of the written snapshot
+        """
+        return save_snapshot(self.dataset, path)
+
+    def _sync_sqlite(self, dataset: Dataset):
+        """Materialize a dataset into the SQLite backend, if one is configured"""
+        if self.sqlite is None:
+            return
+        try:
+            self.sqlite.sync(dataset)
+        except Exception:
+            # In-memory queries keep working; SQL paths fall back until the next sync
+            logger.exception("Failed to materialize dataset into %s", self.sqlite.path)
+
+    def watch(self, interval: float = 60.0) -> SourceWatcher:
+        """
+        Start a background thread that hot-reloads changed source files
+
+        Args:
+            interval: Polling interval in seconds
+
+        Returns:
+            The running watcher (stopped by close())
+        """
+        if self._watcher is None:
+            self._watcher = SourceWatcher(self, interval)
+            self._watcher.start()
+        return self._watcher
 
     def get_jichitai_basic_info(
         self,
         jichitai_code: Optional[str] = None,
         jichitai_name: Optional[str] = None,
-        prefecture: Optional[str] = None
+        prefecture: Optional[str] = None,
+        include_ranks: bool = False
     ) -> Optional[Dict]:
         """
         Get basic information for a municipality
@@ -76,20 +322,24 @@ class DataManager:
             jichitai_code: 6-digit municipality code
             jichitai_name: Municipality name
             prefecture: Prefecture name (optional, for disambiguation)
+            include_ranks: Add national, in-prefecture and in-type ranks of every metric
 
         Returns:
             Dictionary with all available data for the municipality
         """
+        dataset = self.dataset
+        jichitai_code, jichitai_name, redirect = self._redirect(dataset, jichitai_code, jichitai_name, prefecture)
+
         # Find municipality by code or name
         if jichitai_code:
-            code_data = self.codes_parser.get_by_code(jichitai_code) if self.codes_parser else None
+            code_data = self._find_code(dataset, jichitai_code)
             if not code_data:
                 return None
             code = jichitai_code
         elif jichitai_name:
-            if not self.codes_parser:
+            if not dataset.has("codes"):
                 return None
-            matches = self.codes_parser.get_by_name(jichitai_name, prefecture)
+            matches = match_by_name(dataset.records("codes"), jichitai_name, prefecture)
             if not matches:
                 return None
             # Use best match
@@ -107,8 +357,8 @@ class DataManager:
         }
 
         # Add population data
-        if self.population_parser:
-            pop_data = self.population_parser.get_by_code(code)
+        if dataset.has("population"):
+            pop_data = dataset.derived("population_by_code").get(str(code).zfill(6))
             if pop_data:
                 result["population"] = pop_data.get("population")
                 result["households"] = pop_data.get("households")
@@ -123,13 +373,21 @@ class DataManager:
             result["data_sources"] = {}
         result["data_sources"]["finance_source"] = None
 
-        if self.finance_parser:
-            finance_data = self.finance_parser.get_by_code(code)
+        if dataset.has("finance"):
+            finance_data = dataset.derived("finance_by_code").get(str(code).zfill(6))
             if finance_data:
                 result["finance"] = finance_data.get("finance")
                 result["data_sources"]["finance_source"] = "令和5年度全市町村の主要財政指標"
 
-        return result
+        # Which sources have data for this municipality (so clients can skip empty lookups)
+        result["data_coverage"] = dataset.derived("coverage").sources(code)
+
+        if include_ranks:
+            rank_index = dataset.derived("ranks")
+            row = rank_index.table.row_of.get(str(code).zfill(6))
+            result["ranks"] = rank_index.row_ranks(row) if row is not None else {}
+
+        return self._with_redirect(result, redirect)
 
     def get_jichitai_code(
         self,
@@ -148,10 +406,17 @@ class DataManager:
         Returns:
             Dictionary with matches and exact_match flag
         """
-        if not self.codes_parser:
+        dataset = self.dataset
+        if not dataset.has("codes"):
             return {"matches": [], "exact_match": False}
 
-        matches = self.codes_parser.get_by_name(jichitai_name, prefecture)
+        # A retired name resolves to its successor before any fuzzy matching
+        redirect = dataset.derived("redirects").resolve_name(jichitai_name, prefecture)
+        if redirect is not None:
+            record = dict(dataset.derived("codes_by_code")[redirect["to_code"]], match_score=1.0)
+            return {"matches": [record], "exact_match": True, "redirect": redirect}
+
+        matches = match_by_name(dataset.records("codes"), jichitai_name, prefecture)
 
         # Check for exact match
         exact_match = any(m.get("match_score", 0) == 1.0 for m in matches)
@@ -161,6 +426,66 @@ class DataManager:
             "exact_match": exact_match
         }
 
+    def resolve_jichitai_identifiers(self, identifiers: List[str], prefecture: Optional[str] = None) -> Dict:
+        """
+        Resolve many codes or names to current municipalities at once
+
+        Every identifier is resolved with hash lookups only: a current code
+        or exact current name, or a retired code or name redirected through
+        the merger history. Nothing is fuzzy-matched.
+
+        Args:
+            identifiers: 6-digit codes and/or municipality names
+            prefecture: Prefecture name applied to every name (optional)
+
+        Returns:
+            Dictionary with one resolution per identifier, in input order,
+            and counts by status (current, redirected, ambiguous, not_found)
+        """
+        dataset = self.dataset
+        codes_by_code = dataset.derived("codes_by_code")
+        redirects = dataset.derived("redirects")
+
+        results = []
+        for identifier in identifiers:
+            checkpoint()
+            identifier = str(identifier).strip()
+            entry = {"input": identifier, "status": "not_found"}
+            is_code = identifier.isdigit()
+            record = self._find_code(dataset, identifier) if is_code else None
+            current = [] if is_code else redirects.current(identifier, prefecture)
+
+            if record is not None and record["municipality"] is not None:
+                current = [record]
+            if len(current) == 1:
+                entry.update(status="current", jichitai_code=current[0]["jichitai_code"],
+                             jichitai_name=current[0]["municipality"], prefecture=current[0]["prefecture"])
+            elif len(current) > 1:
+                entry.update(status="ambiguous", candidates=[
+                    {"jichitai_code": r["jichitai_code"], "prefecture": r["prefecture"]} for r in current
+                ])
+            else:
+                if is_code:
+                    redirect = redirects.resolve_code(identifier)
+                    candidates = [redirect] if redirect is not None else []
+                else:
+                    candidates = redirects.name_candidates(identifier, prefecture)
+                if len(candidates) == 1:
+                    redirect = candidates[0]
+                    entry.update(status="redirected", jichitai_code=redirect["to_code"],
+                                 jichitai_name=redirect["to_name"], prefecture=redirect["to_prefecture"],
+                                 redirect=redirect)
+                elif len(candidates) > 1:
+                    entry.update(status="ambiguous", candidates=[
+                        {"jichitai_code": r["to_code"], "prefecture": r["to_prefecture"]} for r in candidates
+                    ])
+            results.append(entry)
+
+        counts = {status: 0 for status in ("current", "redirected", "ambiguous", "not_found")}
+        for entry in results:
+            counts[entry["status"]] += 1
+        return {"results": results, "counts": counts, "history_entries": len(redirects)}
+
     def search_jichitai_by_criteria(
         self,
         population_min: Optional[int] = None,
@@ -188,21 +513,29 @@ class DataManager:
         Returns:
             Dictionary with matching municipalities
         """
-        if not self.population_parser:
+        dataset = self.dataset
+        if not dataset.has("population"):
             return {"jichitai_list": [], "total_count": 0, "filtered_count": 0}
 
+        if self.sqlite is not None and self.sqlite.matches(dataset):
+            return self.sqlite.search(
+                population_min, population_max, prefecture, jichitai_type,
+                financial_capability_min, sort_by, sort_order, limit
+            )
+
         # Get all population data
-        pop_data = self.population_parser.parse()
+        pop_data = dataset.records("population")
 
         # Get all finance data if needed
         finance_data_map = {}
-        if self.finance_parser and (financial_capability_min is not None or sort_by == "financial_capability"):
-            finance_list = self.finance_parser.parse()
-            finance_data_map = {f["jichitai_code"]: f for f in finance_list}
+        if financial_capability_min is not None or sort_by == "financial_capability":
+            finance_data_map = dataset.derived("finance_by_code")
+        codes_by_code = dataset.derived("codes_by_code")
 
         # Filter results
         results = []
         for record in pop_data:
+            checkpoint()
             # Apply filters
             pop_total = record["population"]["total"]
 
@@ -219,7 +552,7 @@ class DataManager:
                 continue
 
             # Get municipality type from codes
-            code_data = self.codes_parser.get_by_code(record["jichitai_code"]) if self.codes_parser else None
+            code_data = codes_by_code.get(record["jichitai_code"])
             muni_type = code_data.get("jichitai_type") if code_data else None
 
             if jichitai_type and muni_type not in jichitai_type:
@@ -280,7 +613,9 @@ class DataManager:
         Returns:
             Dictionary with My Number Card data
         """
-        if not self.mynumber_parser:
+        dataset = self.dataset
+        jichitai_code, jichitai_name, redirect = self._redirect(dataset, jichitai_code, jichitai_name, prefecture)
+        if not dataset.has("mynumber"):
             return None
 
         # Find municipality by code or name
@@ -289,7 +624,7 @@ class DataManager:
 
         if jichitai_code:
             # Get municipality name from codes
-            code_data = self.codes_parser.get_by_code(jichitai_code) if self.codes_parser else None
+            code_data = self._find_code(dataset, jichitai_code)
             if not code_data:
                 return None
             target_name = code_data.get("municipality")
@@ -302,17 +637,17 @@ class DataManager:
             return None
 
         # Get My Number Card data
-        mynumber_data = self.mynumber_parser.get_by_name(target_name, target_prefecture)
+        mynumber_data = self._find_mynumber(dataset, target_name, target_prefecture)
         if not mynumber_data:
             return None
 
         # Get jichitai_code if we don't have it
-        if not jichitai_code and self.codes_parser:
-            matches = self.codes_parser.get_by_name(target_name, target_prefecture)
+        if not jichitai_code and dataset.has("codes"):
+            matches = match_by_name(dataset.records("codes"), target_name, target_prefecture)
             if matches:
                 jichitai_code = matches[0].get("jichitai_code")
 
-        return {
+        return self._with_redirect({
             "jichitai_code": jichitai_code,
             "jichitai_name": mynumber_data["municipality"],
             "prefecture": mynumber_data["prefecture"],
@@ -321,7 +656,7 @@ class DataManager:
                 "source_name": "総務省 マイナンバーカード交付状況",
                 "source_url": "https://www.soumu.go.jp/kojinbango_card/kofujokyo.html"
             }
-        }
+        }, redirect)
 
     def get_digital_agency_dx_data(
         self,
@@ -342,7 +677,9 @@ class DataManager:
         Returns:
             Dictionary with DX data
         """
-        if not self.dx_parser:
+        dataset = self.dataset
+        jichitai_code, jichitai_name, redirect = self._redirect(dataset, jichitai_code, jichitai_name, prefecture)
+        if not dataset.has("dx"):
             return None
 
         # Find municipality by code or name
@@ -351,7 +688,7 @@ class DataManager:
 
         if jichitai_code:
             # Get municipality name from codes
-            code_data = self.codes_parser.get_by_code(jichitai_code) if self.codes_parser else None
+            code_data = self._find_code(dataset, jichitai_code)
             if not code_data:
                 return None
             target_name = code_data.get("municipality")
@@ -364,17 +701,17 @@ class DataManager:
             return None
 
         # Get DX data
-        dx_data = self.dx_parser.get_by_name(target_name)
+        dx_data = dataset.records("dx").get_by_name(target_name)
         if not dx_data:
             return None
 
         # Get jichitai_code if we don't have it
-        if not jichitai_code and self.codes_parser:
-            matches = self.codes_parser.get_by_name(target_name, target_prefecture)
+        if not jichitai_code and dataset.has("codes"):
+            matches = match_by_name(dataset.records("codes"), target_name, target_prefecture)
             if matches:
                 jichitai_code = matches[0].get("jichitai_code")
 
-        return {
+        return self._with_redirect({
             "jichitai_code": jichitai_code,
             "jichitai_name": dx_data["municipality"],
             "prefecture": target_prefecture,
@@ -386,7 +723,85 @@ class DataManager:
                 "source_name": "デジタル庁 自治体DX推進状況ダッシュボード",
                 "source_url": "https://www.digital.go.jp/resources/govdashboard/local-government-dx"
             }
+        }, redirect)
+
+    def get_dx_leaderboard(
+        self,
+        indicator: str,
+        prefecture: Optional[List[str]] = None,
+        jichitai_type: Optional[List[str]] = None,
+        group_by: Optional[str] = None,
+        sort_order: str = "desc",
+        limit: Optional[int] = 20
+    ) -> Dict:
+        """
+        Rank all municipalities on one DX indicator or online procedure
+
+        Args:
+            indicator: DX indicator or online procedure name (e.g., "転入届")
+            prefecture: List of prefecture names to restrict the ranking to
+            jichitai_type: List of municipality types to restrict the ranking to
+            group_by: "prefecture" or "jichitai_type" to add group aggregates
+            sort_order: Sort order ("asc" or "desc")
+            limit: Maximum number of ranked municipalities to return (None: all)
+
+        Returns:
+            Dictionary with the ranking and national / group aggregates
+        """
+        if sort_order not in SORT_ORDERS:
+            return {"error": f"Unsupported sort_order: {sort_order}", "supported": list(SORT_ORDERS)}
+        if limit is not None and limit < 1:
+            return {"error": f"limit must be at least 1 (or null for all): {limit}"}
+
+        dataset = self.dataset
+        rankings = dataset.derived("dx_rankings")
+        if rankings is None:
+            return {"error": "DX data not available"}
+
+        stats = rankings.stats(indicator)
+        if stats is None:
+            return {"error": f"Unknown DX indicator or procedure: {indicator}", "available": rankings.indicators()}
+        if group_by is not None and group_by not in stats.groups:
+            return {"error": f"Unsupported group_by: {group_by}", "supported": list(stats.groups)}
+
+        columns = rankings.columns[stats.sheet]
+        order = stats.order if sort_order == "desc" else stats.order[::-1]
+        if prefecture or jichitai_type:
+            order = [
+                col for col in order
+                if (not prefecture or columns[col]["prefecture"] in prefecture)
+                and (not jichitai_type or columns[col]["jichitai_type"] in jichitai_type)
+            ]
+
+        ranking = []
+        prev_value = None
+        for position, col in enumerate(order if limit is None else order[:limit], start=1):
+            value = stats.values[col]
+            if value != prev_value:
+                rank = position
+                prev_value = value
+            entry = dict(columns[col])
+            entry["rank"] = rank
+            entry["national_rank"] = stats.national_rank[col]
+            entry["value"] = value
+            original = stats.matrix.decode(stats.row, col, value)
+            if isinstance(original, str):
+                entry["raw_value"] = original
+            ranking.append(entry)
+
+        result = {
+            "indicator": stats.label,
+            "category": stats.sheet,
+            "ranking": ranking,
+            "ranked_count": len(order),
+            "national": stats.national,
         }
+        if group_by:
+            groups = stats.groups[group_by]
+            if prefecture and group_by == "prefecture":
+                groups = {k: v for k, v in groups.items() if k in prefecture}
+            result["groups"] = groups
+        return result
 
     def get_age_group_population(
         self,
@@ -405,7 +820,9 @@ class DataManager:
         Returns:
             Dictionary with age group population data
         """
-        if not self.age_group_parser:
+        dataset = self.dataset
+        jichitai_code, jichitai_name, redirect = self._redirect(dataset, jichitai_code, jichitai_name, prefecture)
+        if not dataset.has("age_group"):
             return None
 
         # Find municipality by code or name
@@ -414,9 +831,9 @@ class DataManager:
         if jichitai_code:
             target_code = jichitai_code
         elif jichitai_name:
-            if not self.codes_parser:
+            if not dataset.has("codes"):
                 return None
-            matches = self.codes_parser.get_by_name(jichitai_name, prefecture)
+            matches = match_by_name(dataset.records("codes"), jichitai_name, prefecture)
             if not matches:
                 return None
             target_code = matches[0].get("jichitai_code")
@@ -425,7 +842,7 @@ class DataManager:
             return None
 
         # Get age group data (3 records: 計, 男, 女)
-        age_data_list = self.age_group_parser.get_by_code(target_code)
+        age_data_list = dataset.derived("age_groups_by_code").get(str(target_code).zfill(6))
         if not age_data_list:
             return None
 
@@ -484,37 +901,646 @@ class DataManager:
                     "elderly_ratio": round(elderly / total_pop * 100, 2)
                 }
 
-        return result
+        # Dependency ratios, aging index, median age, ... (precomputed for all municipalities)
+        table = dataset.derived("table")
+        row = table.row_of.get(str(target_code).zfill(6))
+        if row is not None:
+            result["demographic_indices"] = table.row_dict(row, DEMOGRAPHIC_COLUMNS)
+
+        return self._with_redirect(result, redirect)
 
-    def export_all_municipalities_to_csv(self, output_path: str) -> Dict:
+    def get_age_pyramids(
+        self,
+        jichitai_codes: Optional[List[str]] = None,
+        prefecture: Optional[str] = None,
+        genders: Optional[List[str]] = None,
+        share: bool = False
+    ) -> Dict:
         """
-        Export all municipalities data to CSV file
+        Age pyramids of many municipalities at once, as nested arrays
+
+        Args:
+            jichitai_codes: 6-digit codes (retired codes are redirected)
+            prefecture: Every municipality of a prefecture (when no codes are given)
+            genders: Genders to return, of 計, 男, 女 (default: 男 and 女)
+            share: Return each band as % of the municipality's total population
+
+        Returns:
+            Dictionary with "populations"[municipality][gender][band], aligned
+            with "municipalities", "genders" and "bands"
+        """
+        dataset = self.dataset
+        pyramids = dataset.derived("age_pyramids")
+        if not len(pyramids):
+            return {"error": "Age group population data is not loaded"}
+
+        genders = genders or ["男", "女"]
+        unknown = [gender for gender in genders if gender not in GENDERS]
+        if unknown:
+            return {"error": f"Unknown genders: {', '.join(unknown)}", "supported": list(GENDERS)}
+
+        not_found = []
+        if jichitai_codes:
+            redirects = dataset.derived("redirects")
+            rows = []
+            for jichitai_code in jichitai_codes:
+                code = str(jichitai_code).zfill(6)
+                if code not in pyramids.row_of and redirects.resolve_code(code) is not None:
+                    code = redirects.resolve_code(code)["to_code"]
+                if code in pyramids.row_of:
+                    rows.append(pyramids.row_of[code])
+                else:
+                    not_found.append(jichitai_code)
+        elif prefecture:
+            rows = pyramids.rows(prefecture)
+        else:
+            return {"error": "Specify jichitai_codes or prefecture"}
+
+        slots = [GENDERS.index(gender) for gender in genders]
+        municipalities = []
+        populations = []
+        for row in rows:
+            total = pyramids.total(row, 0)
+            municipalities.append({
+                "jichitai_code": pyramids.codes[row],
+                "jichitai_name": pyramids.names[row],
+                "prefecture": pyramids.prefectures[row],
+                "total": total,
+            })
+            if share:
+                populations.append([
+                    [round(v / total * 100, 2) if v is not None and total else None for v in pyramids.pyramid(row, g)]
+                    for g in slots
+                ])
+            else:
+                populations.append([pyramids.pyramid(row, g) for g in slots])
+
+        return {
+            "bands": AGE_GROUP_NAMES,
+            "genders": genders,
+            "unit": "percent_of_total" if share else "persons",
+            "municipalities": municipalities,
+            "populations": populations,
+            "not_found": not_found,
+        }
+
+    def get_prefecture_summary(self, prefecture: Optional[str] = None) -> Optional[Dict]:
+        """
+        Get precomputed prefecture or national aggregates
+
+        Args:
+            prefecture: Prefecture name, "全国" for the national total,
+                or None for the national total plus every prefecture
+
+        Returns:
+            Dictionary with population sums, population-weighted finance
+            indicators, My Number Card rate and age structure
+        """
+        rollups = self.dataset.derived("rollups")
+
+        if prefecture is None:
+            return {
+                "national": rollups["national"],
+                "prefectures": list(rollups["prefectures"].values()),
+            }
+        if prefecture == rollups["national"]["prefecture"]:
+            return rollups["national"]
+        return rollups["prefectures"].get(prefecture)
+
+    def get_data_coverage(
+        self,
+        jichitai_code: Optional[str] = None,
+        jichitai_name: Optional[str] = None,
+        prefecture: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Which data sources cover a municipality, or a coverage summary
+
+        Args:
+            jichitai_code: 6-digit municipality code
+            jichitai_name: Municipality name
+            prefecture: Prefecture name (for disambiguation with jichitai_name,
+                otherwise restricts the summary to one prefecture)
+
+        Returns:
+            For a municipality, its covered and missing sources; otherwise
+            per-source counts over all codes (or one prefecture's)
+        """
+        dataset = self.dataset
+        coverage = dataset.derived("coverage")
+        jichitai_code, jichitai_name, redirect = self._redirect(dataset, jichitai_code, jichitai_name, prefecture)
+
+        if jichitai_code:
+            code = str(jichitai_code).zfill(6)
+        elif jichitai_name:
+            matches = match_by_name(dataset.records("codes"), jichitai_name, prefecture)
+            code = matches[0]["jichitai_code"] if matches else None
+        else:
+            return coverage.summary(prefecture)
+        if code is None or code not in coverage.masks:
+            return None
+
+        covered = coverage.sources(code)
+        return self._with_redirect({
+            "jichitai_code": code,
+            "prefecture": coverage.prefectures.get(code),
+            "covered_sources": covered,
+            "missing_sources": [source for source in coverage.available if source not in covered],
+        }, redirect)
+
+    def find_similar_municipalities(
+        self,
+        jichitai_code: Optional[str] = None,
+        jichitai_name: Optional[str] = None,
+        prefecture: Optional[str] = None,
+        k: int = 10,
+        weights: Optional[Dict[str, float]] = None,
+        target_prefecture: Optional[List[str]] = None,
+        target_jichitai_type: Optional[List[str]] = None
+    ) -> Optional[Dict]:
+        """
+        Find the municipalities with the most similar profile
+
+        Args:
+            jichitai_code: 6-digit municipality code
+            jichitai_name: Municipality name
+            prefecture: Prefecture name (optional, for disambiguation)
+            k: Number of similar municipalities to return
+            weights: Feature name -> weight (default 1.0; 0 ignores the feature)
+            target_prefecture: Restrict results to these prefectures
+            target_jichitai_type: Restrict results to these municipality types
+
+        Returns:
+            Dictionary with the reference profile and its nearest neighbours
+        """
+        if k < 1:
+            return {"error": f"k must be at least 1: {k}"}
+
+        dataset = self.dataset
+        jichitai_code, jichitai_name, redirect = self._redirect(dataset, jichitai_code, jichitai_name, prefecture)
+        index = dataset.derived("similarity")
+        table = index.table
+
+        if weights:
+            unknown = [name for name in weights if name not in index.features]
+            if unknown:
+                return {"error": f"Unknown features: {', '.join(unknown)}", "supported": list(index.features)}
+            invalid = [
+                name for name, weight in weights.items()
+                if isinstance(weight, bool) or not isinstance(weight, (int, float))
+                or not math.isfinite(weight) or weight < 0
+            ]
+            if invalid:
+                return {
+                    "error": f"Weights must be non-negative numbers: {', '.join(invalid)}",
+                    "supported": list(index.features)
+                }
+
+        if jichitai_code:
+            row = table.row_of.get(str(jichitai_code).zfill(6))
+        elif jichitai_name:
+            matches = match_by_name(dataset.records("codes"), jichitai_name, prefecture)
+            row = table.row_of.get(matches[0]["jichitai_code"]) if matches else None
+        else:
+            row = None
+        if row is None:
+            return None
+
+        profile_columns = ["jichitai_code", "jichitai_name", "prefecture", "jichitai_type", *index.features]
+        neighbours = []
+        for rank, match in enumerate(index.query(row, k, weights, target_prefecture, target_jichitai_type), start=1):
+            entry = table.row_dict(match["row"], profile_columns)
+            entry["rank"] = rank
+            entry["distance"] = match["distance"]
+            neighbours.append(entry)
+
+        return self._with_redirect({
+            "reference": table.row_dict(row, profile_columns),
+            "features": {name: (weights or {}).get(name, 1.0) for name in index.features},
+            "similar_municipalities": neighbours,
+        }, redirect)
+
+    def find_municipalities_within_radius(
+        self,
+        radius_km: float,
+        jichitai_code: Optional[str] = None,
+        jichitai_name: Optional[str] = None,
+        prefecture: Optional[str] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        target_prefecture: Optional[List[str]] = None,
+        target_jichitai_type: Optional[List[str]] = None,
+        population_min: Optional[int] = None,
+        population_max: Optional[int] = None,
+        financial_capability_min: Optional[float] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None
+    ) -> Optional[Dict]:
+        """
+        Find municipalities whose office lies within a radius
+
+        The centre is a municipality's office (by code or name) or a
+        latitude/longitude. Filters are the search_jichitai_by_criteria ones
+        plus any query_municipalities predicate.
+
+        Args:
+            radius_km: Great-circle radius in km
+            jichitai_code: 6-digit code of the centre municipality
+            jichitai_name: Name of the centre municipality
+            prefecture: Prefecture name (optional, for disambiguation)
+            latitude: Latitude of the centre (with longitude, instead of a municipality)
+            longitude: Longitude of the centre
+            target_prefecture: Restrict results to these prefectures
+            target_jichitai_type: Restrict results to these municipality types
+            population_min: Minimum population
+            population_max: Maximum population
+            financial_capability_min: Minimum financial capability index
+            where: query_municipalities predicate
+            limit: Maximum number of results
+
+        Returns:
+            Dictionary with the centre and the municipalities sorted by distance
+        """
+        return self._spatial_search(
+            lambda index, lat, lon, rows: index.within(lat, lon, radius_km, rows),
+            {"radius_km": radius_km}, jichitai_code, jichitai_name, prefecture, latitude, longitude,
+            export_predicate(target_prefecture, target_jichitai_type, population_min, population_max,
+                             financial_capability_min, where),
+            limit
+        )
+
+    def find_nearest_municipalities(
+        self,
+        k: int = 10,
+        jichitai_code: Optional[str] = None,
+        jichitai_name: Optional[str] = None,
+        prefecture: Optional[str] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        target_prefecture: Optional[List[str]] = None,
+        target_jichitai_type: Optional[List[str]] = None,
+        population_min: Optional[int] = None,
+        population_max: Optional[int] = None,
+        financial_capability_min: Optional[float] = None,
+        where: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """
+        Find the municipalities whose offices are closest to a point
 
         Args:
-            output_path: Path to save the CSV file
+            k: Number of municipalities to return
+            (other arguments as in find_municipalities_within_radius)
+
+        Returns:
+            Dictionary with the centre and the k nearest municipalities
+        """
+        return self._spatial_search(
+            lambda index, lat, lon, rows: index.nearest(lat, lon, k, rows),
+            {"k": k}, jichitai_code, jichitai_name, prefecture, latitude, longitude,
+            export_predicate(target_prefecture, target_jichitai_type, population_min, population_max,
+                             financial_capability_min, where),
+            None
+        )
+
+    def _spatial_search(
+        self,
+        search,
+        params: Dict,
+        jichitai_code: Optional[str],
+        jichitai_name: Optional[str],
+        prefecture: Optional[str],
+        latitude: Optional[float],
+        longitude: Optional[float],
+        predicate: Optional[Dict],
+        limit: Optional[int]
+    ) -> Optional[Dict]:
+        """Resolve the centre and filters, run search(index, lat, lon, rows) and format the matches"""
+        if "radius_km" in params and not params["radius_km"] > 0:
+            return {"success": False, "error": f"radius_km must be positive: {params['radius_km']}"}
+        if "k" in params and params["k"] < 1:
+            return {"success": False, "error": f"k must be at least 1: {params['k']}"}
+        if limit is not None and limit < 1:
+            return {"success": False, "error": f"limit must be at least 1: {limit}"}
+        if latitude is not None and longitude is not None and not (jichitai_code or jichitai_name):
+            try:
+                check_point(latitude, longitude)
+            except ValueError as e:
+                return {"success": False, "error": str(e)}
+
+        dataset = self.dataset
+        index = dataset.derived("spatial")
+        if index is None:
+            return {"error": "Municipal office coordinates are not loaded (geo/municipal_office_coordinates.csv)"}
+        table = index.table
+
+        jichitai_code, jichitai_name, redirect = self._redirect(dataset, jichitai_code, jichitai_name, prefecture)
+        center_row = None
+        if jichitai_code:
+            center_row = table.row_of.get(str(jichitai_code).zfill(6))
+        elif jichitai_name:
+            matches = match_by_name(dataset.records("codes"), jichitai_name, prefecture)
+            center_row = table.row_of.get(matches[0]["jichitai_code"]) if matches else None
+        elif latitude is None or longitude is None:
+            return {"error": "Specify jichitai_code, jichitai_name, or latitude and longitude"}
+
+        if jichitai_code or jichitai_name:
+            if center_row is None:
+                return None
+            if index.location(center_row) is None:
+                return {
+                    "error": "No office coordinates for this municipality",
+                    "jichitai_code": table.codes[center_row],
+                    "jichitai_name": table.strings["jichitai_name"][center_row],
+                }
+            latitude, longitude = index.location(center_row)
+            center = table.row_dict(center_row, ["jichitai_code", "jichitai_name", "prefecture"])
+        else:
+            center = {}
+        center.update(latitude=latitude, longitude=longitude)
+
+        engine = dataset.derived("query")
+        try:
+            rows = set(engine.run(predicate)[0]) if predicate else None
+        except QueryError as e:
+            return {"error": str(e), "fields": engine.fields()}
+        if center_row is not None:
+            rows = (rows if rows is not None else set(index.locations)) - {center_row}
+
+        columns = ["jichitai_code", "jichitai_name", "prefecture", "jichitai_type",
+                   "population_total", "financial_capability_index"]
+        found = search(index, latitude, longitude, rows)
+        selected = found[:limit] if limit else found
+        municipalities = []
+        for rank, match in enumerate(selected, start=1):
+            entry = table.row_dict(match["row"], columns)
+            entry["latitude"], entry["longitude"] = index.location(match["row"])
+            entry["distance_km"] = match["distance_km"]
+            entry["rank"] = rank
+            municipalities.append(entry)
+
+        return self._with_redirect({
+            "center": center,
+            **params,
+            "municipalities": municipalities,
+            "total_count": len(found),
+            "filtered_count": len(municipalities),
+        }, redirect)
+
+    def get_time_series(
+        self,
+        source: str = "population",
+        jichitai_codes: Optional[List[str]] = None,
+        jichitai_name: Optional[str] = None,
+        prefecture: Optional[str] = None,
+        metrics: Optional[List[str]] = None,
+        mode: str = "series"
+    ) -> Dict:
+        """
+        Get values across data vintages for one or many municipalities
+
+        Args:
+            source: "population", "finance" or "mynumber"
+            jichitai_codes: List of 6-digit municipality codes
+            jichitai_name: Municipality name (used if no codes are given)
+            prefecture: Prefecture name; alone, selects every municipality in it
+            metrics: Metrics to return (default: all metrics of the source)
+            mode: "series" for raw values, "delta" for year-over-year changes
+
+        Returns:
+            Dictionary with vintage labels and per-municipality series
+        """
+        if mode not in SERIES_MODES:
+            return {"error": f"Unsupported mode: {mode}", "supported": list(SERIES_MODES)}
+
+        dataset = self.dataset
+        table = dataset.derived("time_series").get(source)
+        if table is None:
+            return {"error": f"No time-series data for source: {source}", "vintages": [], "municipalities": []}
+
+        unknown = [m for m in metrics or [] if m not in table.columns]
+        if unknown:
+            return {"error": f"Unknown metrics for {source}: {unknown}", "available_metrics": list(table.columns)}
+        metrics = metrics or list(table.columns)
+
+        # Resolve target municipalities
+        if jichitai_codes:
+            codes = [str(code).zfill(6) for code in jichitai_codes]
+        elif jichitai_name:
+            matches = match_by_name(dataset.records("codes"), jichitai_name, prefecture)
+            codes = [matches[0]["jichitai_code"]] if matches else []
+        elif prefecture:
+            codes = [code for code, pref in zip(table.codes, table.prefectures) if pref == prefecture]
+        else:
+            codes = []
+
+        municipalities = []
+        for code in codes:
+            row = table.row_of.get(code)
+            if row is None:
+                municipalities.append({"jichitai_code": code, "error": "No time-series data"})
+                continue
+
+            entry = {
+                "jichitai_code": code,
+                "jichitai_name": table.names[row],
+                "prefecture": table.prefectures[row],
+            }
+            if row in table.name_history:
+                entry["name_history"] = table.name_history[row]
+
+            values = {metric: table.series(code, metric) for metric in metrics}
+            if mode == "delta":
+                entry["delta"] = {metric: self._deltas(table.vintages, series) for metric, series in values.items()}
+            else:
+                entry["series"] = values
+            municipalities.append(entry)
+
+        return {
+            "source": source,
+            "mode": mode,
+            "vintages": table.vintages,
+            "metrics": metrics,
+            "municipalities": municipalities,
+        }
+
+    def _deltas(self, vintages: List[str], series: List[Optional[float]]) -> List[Dict]:
+        """Year-over-year changes between consecutive vintages"""
+        deltas = []
+        for i in range(1, len(series)):
+            prev, cur = series[i - 1], series[i]
+            change = round(cur - prev, 6) if prev is not None and cur is not None else None
+            deltas.append({
+                "from": vintages[i - 1],
+                "to": vintages[i],
+                "change": change,
+                "change_rate": round(change / prev * 100, 2) if change is not None and prev else None,
+            })
+        return deltas
+
+    def export_all_municipalities_to_csv(
+        self,
+        output_path: str,
+        columns: Optional[List[str]] = None,
+        prefecture: Optional[List[str]] = None,
+        jichitai_type: Optional[List[str]] = None,
+        population_min: Optional[int] = None,
+        population_max: Optional[int] = None,
+        financial_capability_min: Optional[float] = None,
+        where: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Export all municipalities data to CSV file
+
+        See export_municipalities for the arguments.
 
         Returns:
             Dictionary with export status and count
         """
-        import csv
+        return self.export_municipalities(
+            output_path, "csv", None, columns,
+            prefecture, jichitai_type, population_min, population_max, financial_capability_min, where
+        )
+
+    def export_municipalities(
+        self,
+        output_path: str,
+        format: str = "csv",
+        compression: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        prefecture: Optional[List[str]] = None,
+        jichitai_type: Optional[List[str]] = None,
+        population_min: Optional[int] = None,
+        population_max: Optional[int] = None,
+        financial_capability_min: Optional[float] = None,
+        where: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Export municipalities data to a CSV or JSON Lines file
 
-        if not self.codes_parser:
+        Without filters or columns, every entry of the code list is written.
+        With any of them, rows come from the joined municipality table: the
+        filters select rows first and only the requested columns are then
+        read, so nothing is assembled for rows or columns that are not
+        exported. Rows are generated and written (and compressed) in one
+        pass.
+
+        A manifest sidecar (<output_path>.manifest.json) records the dataset
+        digest, parameters and checksum of the file; if nothing changed since
+        the last export to output_path, the file is left as is.
+
+        Args:
+            output_path: Path to save the file
+            format: "csv" (flat columns) or "jsonl" (one JSON object per line;
+                without columns, with population, finance, My Number Card,
+                age group and DX data nested as returned by the other tools)
+            compression: None, "gzip" or "zstd"
+            columns: Columns to export; any query_municipalities field,
+                including "dx:<indicator>" and "age:<band>" (default: the
+                standard CSV columns, or nested records for JSON Lines)
+            prefecture: List of prefecture names
+            jichitai_type: List of municipality types
+            population_min: Minimum population
+            population_max: Maximum population
+            financial_capability_min: Minimum financial capability index
+            where: Additional query_municipalities predicate
+
+        Returns:
+            Dictionary with export status and count
+        """
+        dataset = self.dataset
+        if not dataset.has("codes"):
             return {"success": False, "error": "Codes parser not available"}
+        try:
+            check_options(format, compression)
+        except ExportError as e:
+            return {"success": False, "error": str(e)}
+
+        nested = format == "jsonl" and columns is None
+        headers = None if nested else list(columns or EXPORT_COLUMNS)
+        filters = {
+            "prefecture": prefecture,
+            "jichitai_type": jichitai_type,
+            "population_min": population_min,
+            "population_max": population_max,
+            "financial_capability_min": financial_capability_min,
+            "where": where,
+        }
+        filters = {key: value for key, value in filters.items() if value is not None}
+        params = {"format": format, "compression": compression, "columns": headers}
+
+        if columns is None and not filters:
+            if nested:
+                def rows():
+                    return self._nested_export_rows(dataset, (
+                        (record["jichitai_code"], {
+                            "jichitai_name": record.get("municipality"),
+                            "prefecture": record.get("prefecture"),
+                            "jichitai_type": record.get("jichitai_type"),
+                        })
+                        for record in dataset.records("codes")
+                    ))
+            else:
+                def rows():
+                    return self._export_rows(dataset)
+        else:
+            params["filters"] = filters
+            engine = dataset.derived("query")
+            try:
+                for column in headers or ():
+                    engine.column(column)
+                selected, _ = engine.run(export_predicate(**filters))
+            except QueryError as e:
+                return {"success": False, "error": str(e), "fields": engine.fields()}
+
+            if nested:
+                table = engine.table
+
+                def rows():
+                    return self._nested_export_rows(dataset, (
+                        (table.codes[row], {
+                            "jichitai_name": table.strings["jichitai_name"][row],
+                            "prefecture": table.strings["prefecture"][row],
+                            "jichitai_type": table.strings["jichitai_type"][row],
+                        })
+                        for row in selected
+                    ))
+            else:
+                def rows():
+                    for row in selected:
+                        record = {}
+                        for column in headers:
+                            value = engine.value(row, column)
+                            record[column] = "" if value is None and format == "csv" else value
+                        yield record
 
+        def write(path):
+            return stream_export(path, rows(), format, compression, headers)
+
+        try:
+            manifest = write_export(output_path, dataset.digest, params, write)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+        return {
+            "success": True,
+            "file_path": output_path,
+            "format": format,
+            "compression": compression,
+            "municipality_count": manifest["rows"],
+            "columns": len(headers) if headers else None,
+            "unchanged": manifest["unchanged"],
+            "sha256": manifest["sha256"]
+        }
+
+    def _export_rows(self, dataset: Dataset) -> Iterator[Dict]:
+        """One CSV row per entry of the code list"""
         # Get all municipality codes
-        all_codes = self.codes_parser.parse()
-
-        # Prepare CSV rows
-        rows = []
-        headers = [
-            "jichitai_code", "jichitai_name", "prefecture", "jichitai_type",
-            "population_total", "population_male", "population_female", "households",
-            "financial_capability_index", "current_balance_ratio",
-            "real_debt_service_ratio", "future_burden_ratio", "laspeyres_index",
-            "mynumber_card_issuance_rate",
-            "youth_ratio", "working_age_ratio", "elderly_ratio"
-        ]
+        all_codes = dataset.records("codes")
+        population_by_code = dataset.derived("population_by_code")
+        finance_by_code = dataset.derived("finance_by_code")
+        age_groups_by_code = dataset.derived("age_groups_by_code")
 
+        # Generate CSV rows
         for code_data in all_codes:
             code = code_data["jichitai_code"]
 
@@ -527,8 +1553,8 @@ class DataManager:
             }
 
             # Get population data
-            if self.population_parser:
-                pop_data = self.population_parser.get_by_code(code)
+            if dataset.has("population"):
+                pop_data = population_by_code.get(code)
                 if pop_data and pop_data.get("population"):
                     pop = pop_data["population"]
                     row["population_total"] = pop.get("total", "")
@@ -542,8 +1568,8 @@ class DataManager:
                     row["households"] = ""
 
             # Get finance data
-            if self.finance_parser:
-                finance_data = self.finance_parser.get_by_code(code)
+            if dataset.has("finance"):
+                finance_data = finance_by_code.get(code)
                 if finance_data and finance_data.get("finance"):
                     fin = finance_data["finance"]
                     row["financial_capability_index"] = fin.get("financial_capability_index", "")
@@ -559,10 +1585,10 @@ class DataManager:
                     row["laspeyres_index"] = ""
 
             # Get MyNumber Card data
-            if self.mynumber_parser:
+            if dataset.has("mynumber"):
                 target_name = code_data.get("municipality")
                 target_prefecture = code_data.get("prefecture")
-                mynumber_data = self.mynumber_parser.get_by_name(target_name, target_prefecture)
+                mynumber_data = self._find_mynumber(dataset, target_name, target_prefecture)
                 if mynumber_data and mynumber_data.get("mynumber_card"):
                     row["mynumber_card_issuance_rate"] = mynumber_data["mynumber_card"].get("issuance_rate", "")
                 else:
@@ -571,8 +1597,8 @@ class DataManager:
                 row["mynumber_card_issuance_rate"] = ""
 
             # Get age group data (demographic summary)
-            if self.age_group_parser:
-                age_data_list = self.age_group_parser.get_by_code(code)
+            if dataset.has("age_group"):
+                age_data_list = age_groups_by_code.get(code)
                 if age_data_list and len(age_data_list) > 0:
                     # Calculate demographic summary
                     total_record = next((r for r in age_data_list if r["gender"] == "計"), None)
@@ -618,26 +1644,199 @@ class DataManager:
                 row["working_age_ratio"] = ""
                 row["elderly_ratio"] = ""
 
-            rows.append(row)
+            yield row
 
-        # Write to CSV
-        try:
-            with open(output_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=headers)
-                writer.writeheader()
-                writer.writerows(rows)
+    def _nested_export_rows(self, dataset: Dataset, entries: Iterable[Tuple[str, Dict]]) -> Iterator[Dict]:
+        """
+        One record per municipality with the source structures kept nested
 
-            return {
-                "success": True,
-                "file_path": output_path,
-                "municipality_count": len(rows),
-                "columns": len(headers)
+        Args:
+            entries: (jichitai_code, {"jichitai_name", "prefecture", "jichitai_type"}) pairs
+        """
+        population_by_code = dataset.derived("population_by_code")
+        finance_by_code = dataset.derived("finance_by_code")
+        age_groups_by_code = dataset.derived("age_groups_by_code")
+        dx = dataset.records("dx") if dataset.has("dx") else None
+
+        for code, names in entries:
+            name = names.get("jichitai_name")
+            population = population_by_code.get(code) or {}
+            finance = finance_by_code.get(code) or {}
+            mynumber = self._find_mynumber(dataset, name, names.get("prefecture")) if name else None
+            ages = age_groups_by_code.get(code)
+            dx_data = dx.get_by_name(name) if dx is not None and name else None
+
+            yield {
+                "jichitai_code": code,
+                **names,
+                "population": population.get("population"),
+                "households": population.get("households"),
+                "population_dynamics": population.get("population_dynamics"),
+                "finance": finance.get("finance"),
+                "mynumber_card": mynumber.get("mynumber_card") if mynumber else None,
+                "age_groups": {
+                    record["gender"]: {"total": record["total"], "breakdown": record["age_groups"]}
+                    for record in ages
+                } if ages else None,
+                "dx_data": {
+                    "dx_indicators": dx_data.get("dx_indicators", {}),
+                    "online_procedures": dx_data.get("online_procedures", {}),
+                } if dx_data else None,
             }
-        except Exception as e:
-            return {"success": False, "error": str(e)}
+
+    def query_municipalities(
+        self,
+        where: Optional[Dict] = None,
+        fields: Optional[List[str]] = None,
+        sort_by: Optional[str] = None,
+        sort_order: str = "desc",
+        limit: Optional[int] = 50,
+        units_only: bool = False
+    ) -> Dict:
+        """
+        Filter and sort municipalities with structured predicates over any metric
+
+        Args:
+            where: Predicate tree, e.g. {"and": [{"field": "elderly_ratio", "op": ">=", "value": 35},
+                {"field": "dx:転入届", "op": "not_null"}]}
+            fields: Fields to return (default: identity columns plus every field used)
+            sort_by: Field to sort by (missing values last)
+            sort_order: Sort order ("asc" or "desc")
+            limit: Maximum number of results
+            units_only: Exclude designated-city wards and the 特別区部 total
+
+        Returns:
+            Dictionary with matching municipalities
+        """
+        if sort_order not in SORT_ORDERS:
+            return {"error": f"Unsupported sort_order: {sort_order}", "supported": list(SORT_ORDERS)}
+        if limit is not None and limit < 1:
+            return {"error": f"limit must be at least 1 (or null for all): {limit}"}
+
+        engine = self.dataset.derived("query")
+        try:
+            rows, cached = engine.run(where, sort_by, sort_order, units_only)
+            if fields is None:
+                fields = ["jichitai_code", "jichitai_name", "prefecture", "jichitai_type"]
+                for field in [*predicate_fields(where), *([sort_by] if sort_by else [])]:
+                    if field not in fields:
+                        fields.append(field)
+            for field in fields:
+                engine.column(field)
+        except QueryError as e:
+            return {"error": str(e), "fields": engine.fields()}
+
+        selected = rows if limit is None else rows[:limit]
+        return {
+            "municipalities": [{field: engine.value(row, field) for field in fields} for row in selected],
+            "total_count": len(rows),
+            "filtered_count": len(selected),
+            "plan_cached": cached,
+        }
+
+    def describe_metric(
+        self,
+        field: str,
+        group_by: Optional[str] = None,
+        bins: int = 10,
+        binning: str = "fixed",
+        where: Optional[Dict] = None,
+        units_only: bool = True
+    ) -> Dict:
+        """
+        Summary statistics and histogram of a numeric metric
+
+        Args:
+            field: Numeric field, as in query_municipalities (e.g. "elderly_ratio", "dx:転入届")
+            group_by: "prefecture" or "jichitai_type" for per-group statistics
+            bins: Number of histogram bins
+            binning: "fixed" (equal width) or "quantile" (equal count)
+            where: Predicate restricting the municipalities described
+            units_only: Exclude designated-city wards and the 特別区部 total
+
+        Returns:
+            Dictionary with count, mean, std, quantiles and histogram, overall and per group
+        """
+        distributions = self.dataset.derived("distributions")
+        try:
+            return distributions.describe(field, group_by, bins, binning, where, units_only)
+        except QueryError as e:
+            return {"error": str(e), "fields": distributions.engine.fields()}
+
+    def run_sql_query(self, sql: str, params: Optional[List] = None, limit: int = 1000) -> Dict:
+        """
+        Run a read-only SQL query against the SQLite backend
+
+        Args:
+            sql: A single SELECT statement
+            params: Positional parameters for ? placeholders
+            limit: Maximum number of rows to return
+
+        Returns:
+            Dictionary with column names and rows
+        """
+        if self.sqlite is None:
+            return {"error": "SQLite backend not enabled (set JICHITAI_SQLITE_PATH)"}
+        dataset = self.dataset
+        if not self.sqlite.matches(dataset):
+            return {"error": "SQLite backend is not in sync with the loaded data"}
+        import sqlite3
+        try:
+            return self.sqlite.query(sql, params, limit)
+        except sqlite3.Error as e:
+            # An interrupted statement is reported as the call's timeout or cancellation
+            checkpoint()
+            return {"error": str(e)}
+
+    def _redirect(
+        self,
+        dataset: Dataset,
+        jichitai_code: Optional[str],
+        jichitai_name: Optional[str],
+        prefecture: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[str], Optional[Dict]]:
+        """
+        Replace a retired code or name by its current successor
+
+        Returns:
+            (jichitai_code, jichitai_name, redirect): unchanged with redirect
+            None when the identifier is current or unknown; otherwise the
+            successor's code, no name, and the redirect that was applied
+        """
+        redirects = dataset.derived("redirects")
+        if jichitai_code:
+            if self._find_code(dataset, jichitai_code) is None:
+                redirect = redirects.resolve_code(jichitai_code)
+                if redirect is not None:
+                    return redirect["to_code"], None, redirect
+        elif jichitai_name:
+            redirect = redirects.resolve_name(jichitai_name, prefecture)
+            if redirect is not None:
+                return redirect["to_code"], None, redirect
+        return jichitai_code, jichitai_name, None
+
+    def _with_redirect(self, result: Optional[Dict], redirect: Optional[Dict]) -> Optional[Dict]:
+        """Report an applied redirect in a response"""
+        if result is not None and redirect is not None:
+            result["redirect"] = redirect
+        return result
+
+    def _find_code(self, dataset: Dataset, jichitai_code: str) -> Optional[Dict]:
+        """Look up a code record by (possibly unpadded) jichitai_code"""
+        return dataset.derived("codes_by_code").get(str(jichitai_code).zfill(6))
+
+    def _find_mynumber(self, dataset: Dataset, municipality_name: str, prefecture: Optional[str] = None) -> Optional[Dict]:
+        """Look up My Number Card data by exact municipality name (and prefecture)"""
+        for record in dataset.derived("mynumber_by_name").get(municipality_name, []):
+            if prefecture is None or record["prefecture"] == prefecture:
+                return record
+        return None
 
     def close(self):
         """Close all parsers"""
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
         if self.population_parser:
             self.population_parser.close()
         if self.finance_parser:
@@ -649,4 +1848,10 @@ class DataManager:
         if self.dx_parser:
             self.dx_parser.close()
         if self.age_group_parser:
-            self.age_group_parser.close()
\ No newline at end of file
+            self.age_group_parser.close()
+        if self.vintage_parser:
+            self.vintage_parser.close()
+        if self.history_parser:
+            self.history_parser.close()
+        if self.coordinates_parser:
+            self.coordinates_parser.close()
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Immutable snapshot of all parsed municipality data and its derived indexes"""
+import hashlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .timeseries import build_time_series
+from .dx_rankings import build_dx_rankings
+from .table import build_table
+from .age_pyramids import build_age_pyramids
+from .rollups import build_rollups
+from .similarity import build_similarity_index
+from .ranks import build_rank_index
+from .coverage import build_coverage
+from .query import build_query_engine
+from .distribution import build_distributions
+from .redirects import build_redirects
+from .spatial import build_spatial_index
+
+
+# Source names, in load order
+SOURCES = ("codes", "population", "finance", "mynumber", "dx", "age_group", "series", "history", "geo")
+
+# Sources joined into the per-municipality table
+TABLE_SOURCES = ("codes", "population", "finance", "mynumber", "age_group")
+
+
+def _index_by_code(records: List[Dict]) -> Dict[str, Dict]:
+    """Map jichitai_code -> record (first occurrence wins)"""
+    index = {}
+    for record in records:
+        index.setdefault(record["jichitai_code"], record)
+    return index
+
+
+def _index_list_by_key(records: List[Dict], key: str) -> Dict[str, List[Dict]]:
+    """Map record[key] -> list of records, preserving source order"""
+    index = {}
+    for record in records:
+        index.setdefault(record[key], []).append(record)
+    return index
+
+
+# Derived structures: name -> (sources it depends on, builder)
+# Builders run in this order, so a builder may read entries defined above it.
+DERIVED: Dict[str, Tuple[Tuple[str, ...], Callable[["Dataset"], Any]]] = {
+    "codes_by_code": (("codes",), lambda ds: _index_by_code(ds.records("codes"))),
+    "population_by_code": (("population",), lambda ds: _index_by_code(ds.records("population"))),
+    "finance_by_code": (("finance",), lambda ds: _index_by_code(ds.records("finance"))),
+    "mynumber_by_name": (("mynumber",), lambda ds: _index_list_by_key(ds.records("mynumber"), "municipality")),
+    "age_groups_by_code": (("age_group",), lambda ds: _index_list_by_key(ds.records("age_group"), "jichitai_code")),
+    "age_pyramids": (("age_group",), build_age_pyramids),
+    "redirects": (("history", "codes"), build_redirects),
+    "time_series": (("series", "population", "finance", "mynumber", "codes"), build_time_series),
+    "dx_rankings": (("dx", "codes"), build_dx_rankings),
+    "table": (TABLE_SOURCES, build_table),
+    "rollups": (TABLE_SOURCES, lambda ds: build_rollups(ds.derived("table"))),
+    "similarity": (TABLE_SOURCES, build_similarity_index),
+    "ranks": (TABLE_SOURCES, build_rank_index),
+    "spatial": (TABLE_SOURCES + ("geo",), build_spatial_index),
+    "coverage": (TABLE_SOURCES + ("dx",), build_coverage),
+    "query": (TABLE_SOURCES + ("dx",), build_query_engine),
+    "distributions": (TABLE_SOURCES + ("dx",), build_distributions),
+}
+
+
+class Dataset:
+    """
+    Read-only view of every loaded source plus the indexes built from them
+
+    A Dataset is never mutated after construction. Reloading a source
+    produces a new Dataset via replace(), which shares the untouched
+    sources and rebuilds only the derived structures that depend on the
+    changed ones. Callers that grab a Dataset reference keep a consistent
+    view for as long as they hold it.
+    """
+
+    def __init__(
+        self,
+        records: Dict[str, List[Dict]],
+        fingerprints: Dict[str, Tuple],
+        version: int = 1,
+        derived: Optional[Dict[str, Any]] = None
+    ):
+        self.version = version
+        self._records = dict(records)
+        self._fingerprints = dict(fingerprints)
+        self._derived = {}
+
+        for name, (_, builder) in DERIVED.items():
+            if derived is not None and name in derived:
+                self._derived[name] = derived[name]
+            else:
+                self._derived[name] = builder(self)
+
+        self.digest = self._compute_digest()
+
+    def _compute_digest(self) -> str:
+        """Stable identifier of the source files this dataset was built from"""
+        h = hashlib.sha1()
+        for source in sorted(self._fingerprints):
+            h.update(repr((source, self._fingerprints[source])).encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    def has(self, source: str) -> bool:
+        """Whether the source was available when this dataset was built"""
+        return source in self._records
+
+    def records(self, source: str) -> Any:
+        """
+        Parsed data of a source (empty list if unavailable)
+
+        This is a list of record dictionaries, except for "dx" which is
+        a DXData holding the dense DX matrices.
+        """
+        return self._records.get(source, [])
+
+    def fingerprint(self, source: str) -> Optional[Tuple]:
+        """File fingerprint recorded for a source"""
+        return self._fingerprints.get(source)
+
+    def derived(self, name: str) -> Any:
+        """Get a derived structure (index, aggregate) by name"""
+        return self._derived[name]
+
+    def replace(self, updates: Dict[str, Tuple[Optional[List[Dict]], Tuple]]) -> "Dataset":
+        """
+        Build the next dataset version with some sources replaced
+
+        Args:
+            updates: source -> (records or None if the source is gone, fingerprint)
+
+        Returns:
+            New Dataset; derived structures that do not depend on any of
+            the updated sources are carried over unchanged
+        """
+        records = dict(self._records)
+        fingerprints = dict(self._fingerprints)
+        for source, (source_records, fingerprint) in updates.items():
+            if source_records is None:
+                records.pop(source, None)
+            else:
+                records[source] = source_records
+            fingerprints[source] = fingerprint
+
+        changed = set(updates)
+        kept = {
+            name: value
+            for name, value in self._derived.items()
+            if not changed.intersection(DERIVED[name][0])
+        }
+
+        return Dataset(records, fingerprints, version=self.version + 1, derived=kept)
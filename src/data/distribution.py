@@ -0,0 +1,177 @@
+"""Summary statistics and histograms of any numeric query field"""
+import bisect
+import json
+import math
+import statistics
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .cancellation import checkpoint
+from .query import QueryEngine, QueryError
+
+
+QUANTILES = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+
+BINNINGS = ("fixed", "quantile")
+
+# Fields a distribution can be grouped by
+GROUP_FIELDS = ("prefecture", "jichitai_type")
+
+MAX_BINS = 100
+
+# Results kept per dataset version
+RESULT_CACHE_SIZE = 256
+
+
+def quantile(ordered: List[float], q: float) -> float:
+    """Linearly interpolated quantile of sorted values"""
+    position = (len(ordered) - 1) * q
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def histogram(ordered: List[float], bins: int, binning: str = "fixed") -> List[Dict]:
+    """
+    Bins over sorted values: equal width ("fixed") or equal count ("quantile")
+
+    Every bin is [lower, upper) except the last, which includes its upper
+    edge. Quantile edges that coincide (many equal values) are merged.
+    """
+    if not ordered:
+        return []
+    low, high = ordered[0], ordered[-1]
+    if binning == "quantile":
+        edges = sorted({quantile(ordered, i / bins) for i in range(bins + 1)})
+    elif high > low:
+        edges = [low + (high - low) * i / bins for i in range(bins)] + [high]
+    else:
+        edges = [low]
+    if len(edges) == 1:
+        return [{"lower": low, "upper": high, "count": len(ordered)}]
+
+    result = []
+    for i in range(len(edges) - 1):
+        start = bisect.bisect_left(ordered, edges[i])
+        last = i == len(edges) - 2
+        end = len(ordered) if last else bisect.bisect_left(ordered, edges[i + 1])
+        result.append({"lower": round(edges[i], 6), "upper": round(edges[i + 1], 6), "count": end - start})
+    return result
+
+
+def describe(values: List[float], bins: int, binning: str) -> Dict:
+    """Statistics and histogram of the present values of one group"""
+    ordered = sorted(v for v in values if v == v)
+    n = len(ordered)
+    summary = {"count": n, "missing": len(values) - n}
+    if not n:
+        return summary
+    mean = statistics.fmean(ordered)
+    summary.update(
+        mean=round(mean, 6),
+        std=round(statistics.pstdev(ordered, mean), 6) if n > 1 else 0.0,
+        min=ordered[0],
+        max=ordered[-1],
+        quantiles={f"p{round(q * 100)}": round(quantile(ordered, q), 6) for q in QUANTILES},
+        histogram=histogram(ordered, bins, binning),
+    )
+    return summary
+
+
+class MetricDistributions:
+    """
+    Distribution summaries over the query engine's fields, memoized
+
+    Values are read as whole columns through the QueryEngine (table
+    metrics, dx:, age: and has: fields) and reduced per group. Results
+    are cached by their arguments; a new dataset version builds a new
+    instance, so cached results never outlive the data they describe.
+    """
+
+    def __init__(self, engine: QueryEngine):
+        self.engine = engine
+        self._results: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_results"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def describe(
+        self,
+        field: str,
+        group_by: Optional[str] = None,
+        bins: int = 10,
+        binning: str = "fixed",
+        where: Optional[Dict] = None,
+        units_only: bool = True
+    ) -> Dict:
+        """
+        Statistics and histogram of a numeric field, overall or per group
+
+        Args:
+            field: Numeric field (any query_municipalities field)
+            group_by: "prefecture" or "jichitai_type" (default: no grouping)
+            bins: Number of histogram bins
+            binning: "fixed" (equal width) or "quantile" (equal count)
+            where: query_municipalities predicate restricting the rows
+            units_only: Exclude designated-city wards and the 特別区部 total
+
+        Returns:
+            {"field", ..., "overall": {...}, "groups": {name: {...}}, "cached"}
+
+        Raises:
+            QueryError: Unknown or non-numeric field, or invalid options
+        """
+        if self.engine.is_string(field):
+            raise QueryError(f"Not a numeric field: {field}")
+        if group_by is not None and group_by not in GROUP_FIELDS:
+            raise QueryError(f"Unknown group_by: {group_by} (expected one of {', '.join(GROUP_FIELDS)})")
+        if binning not in BINNINGS:
+            raise QueryError(f"Unknown binning: {binning} (expected one of {', '.join(BINNINGS)})")
+        if not 1 <= bins <= MAX_BINS:
+            raise QueryError(f"bins must be between 1 and {MAX_BINS}")
+
+        key = json.dumps([field, group_by, bins, binning, where, units_only], ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                return {**result, "cached": True}
+
+        column = self.engine.column(field)
+        rows, _ = self.engine.run(where, units_only=units_only)
+        result = {
+            "field": field,
+            "group_by": group_by,
+            "binning": binning,
+            "overall": describe([column[row] for row in rows], bins, binning),
+        }
+        if group_by is not None:
+            labels = self.engine.column(group_by)
+            groups: Dict[str, List[float]] = {}
+            for row in rows:
+                if labels[row] is not None:
+                    groups.setdefault(labels[row], []).append(column[row])
+            result["groups"] = {}
+            for name, values in groups.items():
+                checkpoint()
+                result["groups"][name] = describe(values, bins, binning)
+
+        with self._lock:
+            self._results[key] = result
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return {**result, "cached": False}
+
+
+def build_distributions(dataset) -> MetricDistributions:
+    """Derived-structure builder"""
+    return MetricDistributions(dataset.derived("query"))
@@ -1,131 +1,230 @@
 """Parser for Digital Agency DX Dashboard data"""
-from typing import Dict, List, Optional
+import math
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
 from pathlib import Path
-import openpyxl
 
-
-class DXParser:
-    """Parser for Digital Agency DX Dashboard data"""
-
-    def __init__(self, comparison_file: str, online_procedures_file: str):
-        self.comparison_file = Path(comparison_file)
-        self.online_procedures_file = Path(online_procedures_file)
-        self.wb_comparison = None
-        self.wb_online = None
-
-        if self.comparison_file.exists():
-            self.wb_comparison = openpyxl.load_workbook(str(self.comparison_file), data_only=True)
-
-        if self.online_procedures_file.exists():
-            self.wb_online = openpyxl.load_workbook(str(self.online_procedures_file), data_only=True)
-
-    def parse(self) -> List[Dict]:
-        """
-        Parse the DX Dashboard data files
-
-        Returns:
-            List of dictionaries containing municipality DX data
+from .xlsx import read_rows
+
+
+# Flag values used by the comparison sheet, stored as 1.0 / 0.0
+DX_FLAG_VALUES = {"実施": 1.0, "未実施": 0.0}
+
+# Kinds of matrix cells: strings decoded through the row labels, ints, floats
+LABEL_CELL, INT_CELL, FLOAT_CELL = 0, 1, 2
+
+
+class DXMatrix:
+    """
+    Dense float matrix of one wide DX sheet (rows: indicators, columns: municipalities)
+
+    Values are stored column-major in a single array('d'), so every
+    municipality is a contiguous slice and every indicator a strided one.
+    Missing cells are NaN. Cells that were strings are encoded as numbers
+    ("実施" -> 1.0, "72%" -> 72.0) and decoded back through per-row labels;
+    anything that cannot be encoded (including empty strings) is kept in a
+    sparse side table. A parallel bytearray records whether each cell was
+    an encoded string, an int or a float, so decoding gives back the
+    original type even in rows mixing them.
+    """
+
+    def __init__(
+        self,
+        row_labels: List[str],
+        col_labels: List[str],
+        values: array,
+        labels: List[Dict[float, str]],
+        kinds: bytearray,
+        raw: Dict[int, object]
+    ):
+        self.row_labels = row_labels
+        self.col_labels = col_labels
+        self.values = values
+        self.labels = labels
+        self.kinds = kinds
+        self.raw = raw
+        self.n_rows = len(row_labels)
+        self.n_cols = len(col_labels)
+
+        # Later duplicates win, as they did when rows/columns were merged into dicts
+        self.row_index = {label: i for i, label in enumerate(row_labels)}
+        self.col_index = {label: i for i, label in enumerate(col_labels)}
+
+    def column(self, col: int) -> array:
+        """All indicator values of one municipality"""
+        start = col * self.n_rows
+        return self.values[start:start + self.n_rows]
+
+    def row(self, row: int) -> array:
+        """One indicator across all municipalities"""
+        return self.values[row::self.n_rows]
+
+    def decode(self, row: int, col: int, value: float):
+        """Original cell value for an encoded matrix entry"""
+        idx = col * self.n_rows + row
+        if math.isnan(value):
+            return self.raw.get(idx)
+        kind = self.kinds[idx]
+        if kind == INT_CELL:
+            return int(value)
+        if kind == FLOAT_CELL:
+            return value
+        label = self.labels[row].get(value)
+        return label if label is not None else value
+
+    def column_dict(self, col: int) -> Dict[str, object]:
+        """Decoded {row label: value} for one municipality"""
+        values = self.column(col)
+        return {
+            self.row_labels[r]: self.decode(r, col, values[r])
+            for r in self.row_index.values()
+        }
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple], percent_strings_only: bool = False) -> "DXMatrix":
         """
-        # まず比較データから市区町村一覧を取得
-        municipalities = self._get_municipalities_from_comparison()
-
-        # オンライン申請率データを追加
-        self._add_online_procedures_data(municipalities)
-
-        return list(municipalities.values())
+        Build a matrix from sheet rows (values only)
 
-    def _get_municipalities_from_comparison(self) -> Dict[str, Dict]:
-        """
-        Parse the comparison data file (横持ちデータ)
-
-        Returns:
-            Dictionary with municipality name as key
+        Args:
+            rows: Row tuples; row 1 holds municipality names from column C,
+                column B of later rows holds the indicator / procedure name
+            percent_strings_only: Only encode "NN%" strings (online procedures
+                sheet) and keep every other string as-is
         """
-        if not self.wb_comparison:
-            return {}
-
-        ws = self.wb_comparison.active
-        municipalities = {}
-
-        # 1行目に市区町村名（C列以降）
-        for col_idx in range(3, ws.max_column + 1):
-            municipality_name = ws.cell(1, col_idx).value
-            if not municipality_name:
+        if not rows:
+            return cls([], [], array("d"), [], bytearray(), {})
+
+        header = rows[0]
+        col_positions = []
+        col_labels = []
+        for pos in range(2, len(header)):
+            name = header[pos]
+            if not name:
                 continue
+            col_positions.append(pos)
+            col_labels.append(str(name).strip())
 
-            municipality_name = str(municipality_name).strip()
-            municipalities[municipality_name] = {
-                "municipality": municipality_name,
-                "dx_indicators": {}
-            }
-
-        # 2行目以降にDX指標データ
-        for row_idx in range(2, ws.max_row + 1):
-            category = ws.cell(row_idx, 1).value  # A列: カテゴリ
-            indicator = ws.cell(row_idx, 2).value  # B列: 指標名
-
-            if not indicator:
+        data_rows = []
+        row_labels = []
+        for row in rows[1:]:
+            if len(row) < 2 or not row[1]:
                 continue
-
-            indicator_key = str(indicator).strip()
-
-            # 各市区町村のデータを取得
-            for col_idx in range(3, ws.max_column + 1):
-                municipality_name = ws.cell(1, col_idx).value
-                if not municipality_name:
+            data_rows.append(row)
+            row_labels.append(str(row[1]).strip())
+
+        n_rows = len(row_labels)
+        values = array("d", [math.nan]) * (n_rows * len(col_labels))
+        labels: List[Dict[float, str]] = [{} for _ in range(n_rows)]
+        kinds = bytearray(n_rows * len(col_labels))
+        raw: Dict[int, object] = {}
+
+        for r, row in enumerate(data_rows):
+            row_labels_map = labels[r]
+            for c, pos in enumerate(col_positions):
+                cell = row[pos] if pos < len(row) else None
+                if cell is None:
                     continue
+                idx = c * n_rows + r
+
+                if isinstance(cell, bool) or cell == "":
+                    raw[idx] = cell
+                elif isinstance(cell, (int, float)):
+                    values[idx] = float(cell)
+                    kinds[idx] = INT_CELL if isinstance(cell, int) else FLOAT_CELL
+                elif isinstance(cell, str):
+                    text = cell.strip()
+                    number = None
+                    if "%" in text:
+                        try:
+                            number = float(text.replace("%", "").strip())
+                        except ValueError:
+                            number = None
+
+                    if percent_strings_only and "%" in text:
+                        # Online procedure rates are returned as numbers (パーセンテージ文字列 -> 数値)
+                        if number is not None:
+                            values[idx] = number
+                            kinds[idx] = FLOAT_CELL
+                    elif number is not None and row_labels_map.get(number, cell) == cell:
+                        values[idx] = number
+                        row_labels_map[number] = cell
+                    elif not percent_strings_only and text in DX_FLAG_VALUES \
+                            and row_labels_map.get(DX_FLAG_VALUES[text], cell) == cell:
+                        values[idx] = DX_FLAG_VALUES[text]
+                        row_labels_map[DX_FLAG_VALUES[text]] = cell
+                    else:
+                        raw[idx] = cell
+                else:
+                    raw[idx] = cell
+
+        return cls(row_labels, col_labels, values, labels, kinds, raw)
+
+
+class DXData:
+    """Both DX sheets as dense matrices, looked up by municipality name"""
+
+    def __init__(self, comparison: DXMatrix, online: DXMatrix):
+        self.comparison = comparison
+        self.online = online
+
+    def municipalities(self) -> List[str]:
+        """Municipality names in sheet order (one per unique name)"""
+        return list(self.comparison.col_index)
 
-                municipality_name = str(municipality_name).strip()
-                value = ws.cell(row_idx, col_idx).value
-
-                if municipality_name in municipalities:
-                    municipalities[municipality_name]["dx_indicators"][indicator_key] = value
-
-        return municipalities
-
-    def _add_online_procedures_data(self, municipalities: Dict[str, Dict]):
-        """
-        Add online procedures data to municipalities
-
-        Args:
-            municipalities: Dictionary of municipalities to update
-        """
-        if not self.wb_online:
-            return
+    def get_by_name(self, municipality_name: str) -> Optional[Dict]:
+        """DX record for one municipality, decoded from two column slices"""
+        col = self.comparison.col_index.get(municipality_name)
+        if col is None:
+            return None
 
-        ws = self.wb_online.active
+        record = {
+            "municipality": municipality_name,
+            "dx_indicators": self.comparison.column_dict(col),
+        }
+        online_col = self.online.col_index.get(municipality_name)
+        if online_col is not None:
+            record["online_procedures"] = self.online.column_dict(online_col)
+        return record
 
-        # 1行目に市区町村名（C列以降）
-        for col_idx in range(3, ws.max_column + 1):
-            municipality_name = ws.cell(1, col_idx).value
-            if not municipality_name:
-                continue
+    def records(self) -> List[Dict]:
+        """All municipalities as dictionaries"""
+        return [self.get_by_name(name) for name in self.municipalities()]
 
-            municipality_name = str(municipality_name).strip()
 
-            if municipality_name not in municipalities:
-                continue
+class DXParser:
+    """Parser for Digital Agency DX Dashboard data"""
 
-            municipalities[municipality_name]["online_procedures"] = {}
+    def __init__(self, comparison_file: str, online_procedures_file: str):
+        self.comparison_file = Path(comparison_file)
+        self.online_procedures_file = Path(online_procedures_file)
+        self._data = None
 
-            # 2行目以降に手続き名とオンライン申請率
-            for row_idx in range(2, ws.max_row + 1):
-                procedure_name = ws.cell(row_idx, 2).value  # B列: 手続き名
+    def _read(self, file_path: Path) -> List[Tuple]:
+        """All rows of the first sheet (none if the file is missing)"""
+        return list(read_rows(file_path)) if file_path.exists() else []
 
-                if not procedure_name:
-                    continue
+    def load_data(self) -> DXData:
+        """
+        Load both sheets into dense matrices (once)
 
-                procedure_name = str(procedure_name).strip()
-                value = ws.cell(row_idx, col_idx).value
+        Returns:
+            DXData with the comparison (DX indicators) and online procedures matrices
+        """
+        if self._data is None:
+            self._data = DXData(
+                DXMatrix.from_rows(self._read(self.comparison_file)),
+                DXMatrix.from_rows(self._read(self.online_procedures_file), percent_strings_only=True),
+            )
+        return self._data
 
-                # パーセンテージ文字列を数値に変換（例: "88.8%" -> 88.8）
-                if value and isinstance(value, str) and "%" in value:
-                    try:
-                        value = float(value.replace("%", "").strip())
-                    except ValueError:
-                        value = None
+    def parse(self) -> List[Dict]:
+        """
+        Parse the DX Dashboard data files
 
-                municipalities[municipality_name]["online_procedures"][procedure_name] = value
+        Returns:
+            List of dictionaries containing municipality DX data
+        """
+        return self.load_data().records()
 
     def get_by_name(self, municipality_name: str) -> Optional[Dict]:
         """
@@ -137,17 +236,8 @@ class DXParser:
         Returns:
             Dictionary with DX data
         """
-        all_data = self.parse()
-
-        for record in all_data:
-            if record["municipality"] == municipality_name:
-                return record
-
-        return None
+        return self.load_data().get_by_name(municipality_name)
 
     def close(self):
-        """Close the workbooks"""
-        if self.wb_comparison:
-            self.wb_comparison.close()
-        if self.wb_online:
-            self.wb_online.close()
\ No newline at end of file
+        """Drop the loaded matrices (the workbooks are already closed)"""
+        self._data = None
@@ -0,0 +1,159 @@
+"""Nationwide rankings and group aggregates over the DX matrices"""
+import math
+import statistics
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .dx_parser import DXData, DXMatrix
+
+
+GROUP_FIELDS = ("prefecture", "jichitai_type")
+
+
+def summarize(values: List[float], total: int) -> Dict:
+    """mean / median / min / max and coverage of non-missing values"""
+    if not values:
+        return {"count": 0, "total": total, "coverage": 0.0 if total else None,
+                "mean": None, "median": None, "min": None, "max": None}
+    return {
+        "count": len(values),
+        "total": total,
+        "coverage": round(len(values) / total * 100, 2),
+        "mean": round(statistics.fmean(values), 4),
+        "median": round(statistics.median(values), 4),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+class IndicatorStats:
+    """Sorted order and aggregates of one DX indicator or procedure"""
+
+    def __init__(self, sheet: str, matrix: DXMatrix, row: int, columns: List[Dict]):
+        self.sheet = sheet
+        self.label = matrix.row_labels[row]
+        self.matrix = matrix
+        self.row = row
+        self.values = matrix.row(row)
+
+        # One pass: split present / missing and bucket values per group
+        present = []
+        buckets: Dict[str, Dict[Optional[str], List[float]]] = {field: {} for field in GROUP_FIELDS}
+        totals: Dict[str, Dict[Optional[str], int]] = {field: {} for field in GROUP_FIELDS}
+        for col, value in enumerate(self.values):
+            meta = columns[col]
+            is_present = not math.isnan(value)
+            if is_present:
+                present.append(col)
+            for field in GROUP_FIELDS:
+                key = meta[field]
+                totals[field][key] = totals[field].get(key, 0) + 1
+                if is_present:
+                    buckets[field].setdefault(key, []).append(value)
+
+        # Descending by value; ties keep sheet order
+        self.order = sorted(present, key=lambda col: -self.values[col])
+        self.national = summarize([self.values[col] for col in present], len(self.values))
+        self.groups = {
+            field: {
+                key: summarize(buckets[field].get(key, []), total)
+                for key, total in totals[field].items()
+                if key is not None
+            }
+            for field in GROUP_FIELDS
+        }
+
+        # Competition ranking ("1224") over the national order
+        self.national_rank: Dict[int, int] = {}
+        prev_value = None
+        for position, col in enumerate(self.order, start=1):
+            value = self.values[col]
+            if value != prev_value:
+                rank = position
+                prev_value = value
+            self.national_rank[col] = rank
+
+
+class DXRankings:
+    """
+    Leaderboards for every DX indicator and online procedure
+
+    DX sheets identify municipalities by name only; each column is joined
+    to the code list once (names shared by several municipalities stay
+    unresolved). Per-indicator statistics are computed on first use and
+    cached for the lifetime of the dataset version.
+    """
+
+    def __init__(self, dx: DXData, code_records: List[Dict]):
+        self.dx = dx
+
+        by_name: Dict[str, List[Dict]] = {}
+        for record in code_records:
+            if record["municipality"] is not None:
+                by_name.setdefault(record["municipality"], []).append(record)
+
+        self.columns = {
+            "dx_indicators": self._join(dx.comparison, by_name),
+            "online_procedures": self._join(dx.online, by_name),
+        }
+        self._cache: Dict[Tuple[str, int], IndicatorStats] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _join(self, matrix: DXMatrix, by_name: Dict[str, List[Dict]]) -> List[Dict]:
+        columns = []
+        for name in matrix.col_labels:
+            matches = by_name.get(name, [])
+            code = matches[0] if len(matches) == 1 else None
+            columns.append({
+                "jichitai_name": name,
+                "jichitai_code": code["jichitai_code"] if code else None,
+                "prefecture": code["prefecture"] if code else None,
+                "jichitai_type": code["jichitai_type"] if code else None,
+            })
+        return columns
+
+    def indicators(self) -> Dict[str, List[str]]:
+        """Available indicator / procedure names per sheet"""
+        return {
+            "dx_indicators": list(self.dx.comparison.row_index),
+            "online_procedures": list(self.dx.online.row_index),
+        }
+
+    def precompute(self):
+        """Compute statistics for every indicator (e.g. before writing a bundle)"""
+        for names in self.indicators().values():
+            for name in names:
+                self.stats(name)
+
+    def stats(self, indicator: str) -> Optional[IndicatorStats]:
+        """Cached statistics for an indicator or procedure name"""
+        for sheet, matrix in (("dx_indicators", self.dx.comparison), ("online_procedures", self.dx.online)):
+            row = matrix.row_index.get(indicator)
+            if row is None:
+                continue
+            key = (sheet, row)
+            stats = self._cache.get(key)
+            if stats is None:
+                with self._lock:
+                    stats = self._cache.get(key)
+                    if stats is None:
+                        stats = IndicatorStats(sheet, matrix, row, self.columns[sheet])
+                        self._cache[key] = stats
+            return stats
+        return None
+
+
+def build_dx_rankings(dataset) -> Optional[DXRankings]:
+    """Derived-structure builder (None when DX data is unavailable)"""
+    if not dataset.has("dx"):
+        return None
+    return DXRankings(dataset.records("dx"), dataset.records("codes"))
@@ -0,0 +1,283 @@
+"""
+Bulk export helpers
+
+Writers stream rows from an iterator straight into the (optionally
+compressed) output file, so an export is produced in one pass without
+building the whole file in memory or on disk uncompressed.
+
+Every export writes a manifest sidecar (<output>.manifest.json) recording
+what the file was generated from: the dataset digest, the export
+parameters and the output checksum. An export whose manifest still
+matches, and whose file is intact, is not regenerated.
+"""
+import contextlib
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import secrets
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+from .cancellation import checkpoint
+
+
+# Bump when the content written for the same parameters changes
+EXPORT_FORMAT = 1
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+# Serializes replacing an export and its manifest, so that concurrent exports
+# to one path (written in parallel) leave the file its manifest describes
+PUBLISH_LOCK = threading.Lock()
+
+# Columns of export_all_municipalities_csv when none are requested
+EXPORT_COLUMNS = [
+    "jichitai_code", "jichitai_name", "prefecture", "jichitai_type",
+    "population_total", "population_male", "population_female", "households",
+    "financial_capability_index", "current_balance_ratio",
+    "real_debt_service_ratio", "future_burden_ratio", "laspeyres_index",
+    "mynumber_card_issuance_rate",
+    "youth_ratio", "working_age_ratio", "elderly_ratio",
+]
+
+
+FORMATS = ("csv", "jsonl")
+COMPRESSIONS = ("gzip", "zstd")
+
+
+class ExportError(ValueError):
+    """Unsupported export format or compression"""
+
+
+def check_options(format: str, compression: Optional[str]):
+    """Raise ExportError for an unknown format or an unavailable compression"""
+    if format not in FORMATS:
+        raise ExportError(f"Unknown format: {format} (expected one of {', '.join(FORMATS)})")
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ExportError(f"Unknown compression: {compression} (expected one of {', '.join(COMPRESSIONS)})")
+    if compression == "zstd":
+        _zstd_writer()
+
+
+def _zstd_writer():
+    """Factory of zstd stream writers: the zstandard package, or compression.zstd on Python 3.14+"""
+    try:
+        import zstandard
+        return lambda raw: zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    except ImportError:
+        pass
+    try:
+        from compression import zstd
+        return lambda raw: zstd.ZstdFile(raw, "wb")
+    except ImportError:
+        raise ExportError("zstd compression requires the zstandard package (pip install '.[zstd]')") from None
+
+
+@contextlib.contextmanager
+def open_text(path: Union[str, Path], compression: Optional[str] = None, encoding: str = "utf-8") -> Iterator[TextIO]:
+    """Text stream writing to path, compressed on the fly"""
+    with open(path, "wb") as raw:
+        if compression == "gzip":
+            # Fixed mtime so identical data gives an identical file (and checksum)
+            binary = gzip.GzipFile(fileobj=raw, mode="wb", mtime=0)
+        elif compression == "zstd":
+            binary = _zstd_writer()(raw)
+        else:
+            binary = raw
+        text = io.TextIOWrapper(binary, encoding=encoding, newline="")
+        yield text
+        # Flushes the compressor's trailer; the raw file is closed by the with block
+        text.close()
+
+
+def write_csv(stream: TextIO, rows: Iterable[Dict], columns: List[str]) -> int:
+    writer = csv.DictWriter(stream, fieldnames=columns)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        checkpoint()
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(stream: TextIO, rows: Iterable[Dict], columns: Optional[List[str]] = None) -> int:
+    count = 0
+    for row in rows:
+        checkpoint()
+        stream.write(json.dumps(row, ensure_ascii=False))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+WRITERS = {
+    "csv": (write_csv, "utf-8-sig"),
+    "jsonl": (write_jsonl, "utf-8"),
+}
+
+
+def stream_export(
+    path: Union[str, Path],
+    rows: Iterable[Dict],
+    format: str = "csv",
+    compression: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> int:
+    """Write rows in one pass with the writer for format; returns the row count"""
+    writer, encoding = WRITERS[format]
+    with open_text(path, compression, encoding) as stream:
+        return writer(stream, rows, columns)
+
+
+def export_predicate(
+    prefecture: Optional[List[str]] = None,
+    jichitai_type: Optional[List[str]] = None,
+    population_min: Optional[int] = None,
+    population_max: Optional[int] = None,
+    financial_capability_min: Optional[float] = None,
+    where: Optional[Dict] = None
+) -> Optional[Dict]:
+    """Search-style filters as one query_municipalities predicate"""
+    leaves = []
+    if prefecture:
+        leaves.append({"field": "prefecture", "op": "in", "value": list(prefecture)})
+    if jichitai_type:
+        leaves.append({"field": "jichitai_type", "op": "in", "value": list(jichitai_type)})
+    if population_min is not None:
+        leaves.append({"field": "population_total", "op": ">=", "value": population_min})
+    if population_max is not None:
+        leaves.append({"field": "population_total", "op": "<=", "value": population_max})
+    if financial_capability_min is not None:
+        leaves.append({"field": "financial_capability_index", "op": ">=", "value": financial_capability_min})
+    if where:
+        leaves.append(where)
+    if not leaves:
+        return None
+    return leaves[0] if len(leaves) == 1 else {"and": leaves}
+
+
+def manifest_path(output_path: Union[str, Path]) -> Path:
+    output_path = Path(output_path)
+    return output_path.with_name(output_path.name + MANIFEST_SUFFIX)
+
+
+def temp_path(target: Path) -> Path:
+    """
+    New empty file next to target, to be renamed over it when complete
+
+    Unique per call, so concurrent exports to the same path (with different
+    parameters, which single-flight does not merge) never share a file.
+    Created exclusively with mode 0o666 so the process umask applies, as it
+    would to a plain open() of the target.
+    """
+    while True:
+        path = target.with_name(f"{target.name}.{secrets.token_hex(8)}.tmp")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+        except FileExistsError:
+            continue
+        return path
+
+
+def write_manifest(output_path: Path, manifest: Dict):
+    """Replace the manifest of an export atomically"""
+    path = manifest_path(output_path)
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(output_path: Union[str, Path]) -> Optional[Dict]:
+    """Manifest of a previous export, or None if missing or unreadable"""
+    try:
+        with open(manifest_path(output_path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def current_manifest(output_path: Union[str, Path], digest: str, params: Dict) -> Optional[Dict]:
+    """
+    Manifest of the existing export if it can be reused as is
+
+    The export is current when it was written from the same dataset with
+    the same parameters and the file still has the recorded checksum.
+    """
+    manifest = read_manifest(output_path)
+    if (
+        manifest is None
+        or manifest.get("format") != EXPORT_FORMAT
+        or manifest.get("dataset_digest") != digest
+        or manifest.get("params") != params
+    ):
+        return None
+    try:
+        if os.path.getsize(output_path) != manifest.get("size") or file_sha256(output_path) != manifest.get("sha256"):
+            return None
+    except OSError:
+        return None
+    return manifest
+
+
+def write_export(
+    output_path: Union[str, Path],
+    digest: str,
+    params: Dict,
+    write: Callable[[Path], int],
+) -> Dict:
+    """
+    Write an export and its manifest, unless the existing export is current
+
+    Args:
+        output_path: File to write
+        digest: Digest of the dataset the export is generated from
+        params: Export parameters (columns, filters, ...) as JSON-able values
+        write: Writes the export to the given path and returns the row count
+
+    Returns:
+        The manifest, with "unchanged": True if the file was reused
+    """
+    manifest = current_manifest(output_path, digest, params)
+    if manifest is not None:
+        return {**manifest, "unchanged": True}
+
+    output_path = Path(output_path)
+    tmp_path = temp_path(output_path)
+    try:
+        rows = write(tmp_path)
+        manifest = {
+            "format": EXPORT_FORMAT,
+            "dataset_digest": digest,
+            "params": params,
+            "rows": rows,
+            "size": tmp_path.stat().st_size,
+            "sha256": file_sha256(tmp_path),
+        }
+        with PUBLISH_LOCK:
+            # Drop the old manifest first: a crash before the new one is in
+            # place leaves an export without a manifest, never a stale one
+            manifest_path(output_path).unlink(missing_ok=True)
+            tmp_path.replace(output_path)
+            write_manifest(output_path, manifest)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return {**manifest, "unchanged": False}
@@ -1,40 +1,22 @@
 """Parser for finance data from Excel files"""
-import openpyxl
 from typing import Dict, List, Optional
 from pathlib import Path
 
+from .xlsx import intern, read_rows
+
 
 class FinanceParser:
     """Parse municipal finance data from Excel files"""
 
     def __init__(self, file_path: str):
         self.file_path = Path(file_path)
-        self.workbook = None
-        self.worksheet = None
+        self._records = None
 
     def load(self):
-        """Load the Excel file"""
+        """Read the Excel file into records and release the workbook"""
         if not self.file_path.exists():
             raise FileNotFoundError(f"Finance data file not found: {self.file_path}")
 
-        self.workbook = openpyxl.load_workbook(self.file_path, data_only=True)
-        # Get first sheet
-        self.worksheet = self.workbook[self.workbook.sheetnames[0]]
-
-    def parse(self) -> List[Dict]:
-        """
-        Parse finance summary data from Excel file
-
-        Data source: 全市町村の主要財政指標（令和5年度）
-        Coverage: All municipalities (cities, towns, villages, special wards)
-
-        Returns:
-            List of dictionaries with finance data for each municipality
-        """
-        if self.worksheet is None:
-            self.load()
-
-        ws = self.worksheet
         data = []
 
         # Data starts at row 3 (row 2 is header)
@@ -54,8 +36,8 @@ class FinanceParser:
                 return None
             return val
 
-        for row_idx in range(3, ws.max_row + 1):
-            jichitai_code = ws.cell(row_idx, 1).value
+        for row in read_rows(self.file_path, min_row=3, width=8):
+            jichitai_code = row[0]
 
             # Skip if no code
             if not jichitai_code or not str(jichitai_code).strip():
@@ -65,17 +47,13 @@ class FinanceParser:
             if not str(jichitai_code).isdigit() or len(str(jichitai_code)) != 6:
                 continue
 
-            prefecture_name = ws.cell(row_idx, 2).value
-            municipality_name = ws.cell(row_idx, 3).value
-            financial_capability_index = ws.cell(row_idx, 4).value
-            current_balance_ratio = ws.cell(row_idx, 5).value
-            real_debt_service_ratio = ws.cell(row_idx, 6).value
-            future_burden_ratio = ws.cell(row_idx, 7).value
-            laspeyres_index = ws.cell(row_idx, 8).value
+            prefecture_name, municipality_name = row[1], row[2]
+            (financial_capability_index, current_balance_ratio, real_debt_service_ratio,
+             future_burden_ratio, laspeyres_index) = row[3:8]
 
             record = {
-                "jichitai_code": str(jichitai_code).zfill(6),
-                "prefecture_name": prefecture_name,
+                "jichitai_code": intern(str(jichitai_code).zfill(6)),
+                "prefecture_name": intern(prefecture_name),
                 "municipality_name": municipality_name,
                 "finance": {
                     "financial_capability_index": normalize_value(financial_capability_index),  # 財政力指数
@@ -88,7 +66,21 @@ class FinanceParser:
 
             data.append(record)
 
-        return data
+        self._records = data
+
+    def parse(self) -> List[Dict]:
+        """
+        Parse finance summary data from Excel file
+
+        Data source: 全市町村の主要財政指標（令和5年度）
+        Coverage: All municipalities (cities, towns, villages, special wards)
+
+        Returns:
+            List of dictionaries with finance data for each municipality
+        """
+        if self._records is None:
+            self.load()
+        return self._records
 
     def get_by_code(self, jichitai_code: str) -> Optional[Dict]:
         """Get finance data for a specific municipality by code"""
@@ -102,6 +94,5 @@ class FinanceParser:
         return None
 
     def close(self):
-        """Close the workbook"""
-        if self.workbook:
-            self.workbook.close()
\ No newline at end of file
+        """Drop the parsed records (the workbook is already closed)"""
+        self._records = None
\ No newline at end of file
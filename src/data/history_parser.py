@@ -0,0 +1,63 @@
+"""Parser for the municipal merger (廃置分合) history of code changes"""
+import csv
+from pathlib import Path
+from typing import Dict, List
+
+from .xlsx import intern
+
+
+# Header of the history CSV: one row per retired code (or name) and its successor
+HISTORY_COLUMNS = ("old_code", "old_name", "prefecture", "new_code", "new_name", "date", "reason")
+
+
+class HistoryParser:
+    """
+    Parse the code history CSV (codes/municipal_code_history.csv)
+
+    Columns: old_code, old_name, prefecture, new_code, new_name, date,
+    reason (e.g. 編入, 新設合併, 市制施行). Either old_code or old_name may
+    be empty; rows without new_code are skipped.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = Path(file_path)
+        self._records = None
+
+    def load(self):
+        """Read the CSV into records"""
+        if not self.file_path.exists():
+            raise FileNotFoundError(f"Code history file not found: {self.file_path}")
+
+        data = []
+        with open(self.file_path, encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                new_code = (row.get("new_code") or "").strip()
+                if not new_code:
+                    continue
+                old_code = (row.get("old_code") or "").strip()
+                data.append({
+                    "old_code": intern(old_code.zfill(6)) if old_code else None,
+                    "old_name": (row.get("old_name") or "").strip() or None,
+                    "prefecture": intern((row.get("prefecture") or "").strip() or None),
+                    "new_code": intern(new_code.zfill(6)),
+                    "new_name": (row.get("new_name") or "").strip() or None,
+                    "date": (row.get("date") or "").strip() or None,
+                    "reason": (row.get("reason") or "").strip() or None,
+                })
+
+        self._records = data
+
+    def parse(self) -> List[Dict]:
+        """
+        Parse the code history
+
+        Returns:
+            List of dictionaries, one per retired code or name
+        """
+        if self._records is None:
+            self.load()
+        return self._records
+
+    def close(self):
+        """Release parsed records"""
+        self._records = None
@@ -1,7 +1,17 @@
 """Parser for My Number Card issuance rate data from MIC"""
+import re
+import unicodedata
 from typing import Dict, List, Optional
 from pathlib import Path
-import openpyxl
+
+from .xlsx import intern, read_rows
+
+
+# First data row of the 公表用 sheet; the rows above are titles and the national total
+FIRST_DATA_ROW = 119
+
+# As-of date in the sheet titles, e.g. 「令和7年8月末時点」
+_AS_OF_RE = re.compile(r"令和\s*(\d+|元)\s*年\s*(\d+)\s*月")
 
 
 class MyNumberParser:
@@ -9,36 +19,20 @@ class MyNumberParser:
 
     def __init__(self, file_path: str):
         self.file_path = Path(file_path)
-        self.wb = None
-        self.ws = None
-
-        if self.file_path.exists():
-            self.wb = openpyxl.load_workbook(str(self.file_path), data_only=True)
-            # シート名は「公表用」
-            if "公表用" in self.wb.sheetnames:
-                self.ws = self.wb["公表用"]
-            else:
-                self.ws = self.wb.active
-
-    def parse(self) -> List[Dict]:
-        """
-        Parse the My Number Card data file
-
-        Returns:
-            List of dictionaries containing municipality data
-        """
-        if not self.ws:
-            return []
+        self._records = None
 
+    def load(self):
+        """Read the Excel file into records and release the workbook"""
         results = []
 
+        # シート名は「公表用」
         # データは119行目から開始（118行目は全国集計）
-        for row_idx in range(119, self.ws.max_row + 1):
-            prefecture = self.ws.cell(row_idx, 1).value  # A列: 都道府県名
-            municipality = self.ws.cell(row_idx, 2).value  # B列: 市区町村名
-            population = self.ws.cell(row_idx, 3).value  # C列: 人口
-            issued_cards = self.ws.cell(row_idx, 4).value  # D列: 保有枚数
-            issuance_rate = self.ws.cell(row_idx, 5).value  # E列: 交付率
+        for row in read_rows(self.file_path, sheet="公表用", min_row=FIRST_DATA_ROW, width=5):
+            prefecture = row[0]  # A列: 都道府県名
+            municipality = row[1]  # B列: 市区町村名
+            population = row[2]  # C列: 人口
+            issued_cards = row[3]  # D列: 保有枚数
+            issuance_rate = row[4]  # E列: 交付率
 
             # 空行をスキップ
             if not prefecture or not municipality:
@@ -50,8 +44,8 @@ class MyNumberParser:
                 rate = rate * 100  # Convert to percentage
 
             record = {
-                "prefecture": str(prefecture).strip() if prefecture else None,
-                "municipality": str(municipality).strip() if municipality else None,
+                "prefecture": intern(str(prefecture).strip()),
+                "municipality": str(municipality).strip(),
                 "mynumber_card": {
                     "population": self._safe_int(population),
                     "issued_cards": self._safe_int(issued_cards),
@@ -61,7 +55,40 @@ class MyNumberParser:
 
             results.append(record)
 
-        return results
+        self._records = results
+
+    def parse(self) -> List[Dict]:
+        """
+        Parse the My Number Card data file
+
+        Returns:
+            List of dictionaries containing municipality data
+        """
+        if self._records is None:
+            if not self.file_path.exists():
+                return []
+            self.load()
+        return self._records
+
+    def vintage(self) -> Optional[str]:
+        """
+        Vintage label ('rNN_MM') of the as-of date in the sheet titles, or None
+
+        Used for the current file, whose name carries no vintage label.
+        """
+        if not self.file_path.exists():
+            return None
+        for i, row in enumerate(read_rows(self.file_path, sheet="公表用")):
+            if i >= FIRST_DATA_ROW - 1:
+                break
+            for value in row:
+                if not isinstance(value, str):
+                    continue
+                match = _AS_OF_RE.search(unicodedata.normalize("NFKC", value))
+                if match:
+                    year = 1 if match.group(1) == "元" else int(match.group(1))
+                    return f"r{year:02d}_{int(match.group(2)):02d}"
+        return None
 
     def get_by_name(self, municipality_name: str, prefecture: Optional[str] = None) -> Optional[Dict]:
         """
@@ -102,6 +129,5 @@ class MyNumberParser:
             return None
 
     def close(self):
-        """Close the workbook"""
-        if self.wb:
-            self.wb.close()
\ No newline at end of file
+        """Drop the parsed records (the workbook is already closed)"""
+        self._records = None
\ No newline at end of file
@@ -0,0 +1,383 @@
+"""Structured filter/sort queries over every per-municipality metric"""
+import json
+import math
+import operator
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .age_group_parser import AGE_GROUP_NAMES
+from .age_pyramids import GENDERS
+from .cancellation import checkpoint
+from .coverage import COVERAGE_SOURCES
+from .table import MunicipalityTable
+
+
+# Prefix of fields that refer to a DX indicator or online procedure
+DX_PREFIX = "dx:"
+
+# Prefix of fields that refer to an age band: "age:0-4歳" (total), "age:男:0-4歳", "age:女:0-4歳"
+AGE_PREFIX = "age:"
+AGE_GENDERS = GENDERS
+
+# Prefix of fields that give males per 100 females in an age band ("sex_ratio:65-69歳")
+SEX_RATIO_PREFIX = "sex_ratio:"
+
+# Prefix of fields that are 1 when a source has data for the municipality, else 0 ("has:finance")
+COVERAGE_PREFIX = "has:"
+
+COMPARISONS = {
+    "=": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+OPERATORS = (*COMPARISONS, "!=", "between", "in", "is_null", "not_null")
+
+SORT_ORDERS = ("asc", "desc")
+
+# Compiled plans kept per dataset version
+PLAN_CACHE_SIZE = 256
+
+Plan = Callable[[List[Any], List[int]], List[int]]
+
+
+class QueryError(ValueError):
+    """Malformed query or unknown field"""
+
+
+# Strings use None for missing values, numeric columns NaN (x != x)
+def _present_string(value) -> bool:
+    return value is not None
+
+
+def _present_number(value) -> bool:
+    return value == value
+
+
+class QueryEngine:
+    """
+    Evaluates predicate trees over the municipality table, DX sheets and age bands
+
+    A predicate is either a leaf {"field", "op", "value"} or a combinator
+    {"and": [...]}, {"or": [...]}, {"not": {...}}. A query is split into
+    its shape (structure, fields and operators) and its literal values;
+    each shape is compiled once into a chain of column scans that narrow
+    a list of candidate rows, and reused for any values.
+    """
+
+    def __init__(self, table: MunicipalityTable, dx_rankings=None, age_pyramids=None, coverage=None):
+        self.table = table
+        self.dx_rankings = dx_rankings
+        self.age_pyramids = age_pyramids
+        self.coverage = coverage
+        self._joined_columns: Dict[str, array] = {}
+        self._plans: "OrderedDict[str, Plan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Compiled plans are closures; they are rebuilt on demand
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_plans"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # Fields
+
+    def fields(self) -> Dict[str, List[str]]:
+        """Queryable field names"""
+        dx_fields = []
+        if self.dx_rankings is not None:
+            for names in self.dx_rankings.indicators().values():
+                dx_fields.extend(DX_PREFIX + name for name in names)
+        age_fields = []
+        if self.age_pyramids:
+            for gender in AGE_GENDERS:
+                prefix = AGE_PREFIX if gender == "計" else f"{AGE_PREFIX}{gender}:"
+                age_fields.extend(prefix + band for band in AGE_GROUP_NAMES)
+            age_fields.extend(SEX_RATIO_PREFIX + band for band in AGE_GROUP_NAMES)
+        coverage_fields = []
+        if self.coverage is not None:
+            coverage_fields = [COVERAGE_PREFIX + source for source in COVERAGE_SOURCES]
+        return {
+            "string": list(self.table.strings),
+            "numeric": list(self.table.numeric),
+            "dx": dx_fields,
+            "age": age_fields,
+            "coverage": coverage_fields,
+        }
+
+    def is_string(self, field: str) -> bool:
+        return field in self.table.strings
+
+    def column(self, field: str):
+        """Row-aligned values of a field (list of str or array('d'))"""
+        if field in self.table.strings:
+            return self.table.strings[field]
+        if field in self.table.numeric:
+            return self.table.numeric[field]
+        column = self._joined_columns.get(field)
+        if column is None:
+            if field.startswith(DX_PREFIX) and self.dx_rankings is not None:
+                column = self._dx_column(field[len(DX_PREFIX):])
+            elif field.startswith(AGE_PREFIX) and self.age_pyramids:
+                column = self._age_column(field[len(AGE_PREFIX):])
+            elif field.startswith(SEX_RATIO_PREFIX) and self.age_pyramids:
+                column = self._sex_ratio_column(field[len(SEX_RATIO_PREFIX):])
+            elif field.startswith(COVERAGE_PREFIX) and self.coverage is not None:
+                column = self._coverage_column(field[len(COVERAGE_PREFIX):])
+            if column is None:
+                raise QueryError(f"Unknown field: {field}")
+            with self._lock:
+                self._joined_columns[field] = column
+        return column
+
+    def _dx_column(self, indicator: str) -> Optional[array]:
+        """DX values joined onto table rows (NaN where unknown or ambiguous)"""
+        stats = self.dx_rankings.stats(indicator)
+        if stats is None:
+            return None
+        column = array("d", [math.nan]) * self.table.n_rows
+        for col, meta in enumerate(self.dx_rankings.columns[stats.sheet]):
+            row = self.table.row_of.get(meta["jichitai_code"])
+            if row is not None:
+                column[row] = stats.values[col]
+        return column
+
+    def _age_column(self, name: str) -> Optional[array]:
+        """Population of one age band and gender joined onto table rows"""
+        gender, _, band = name.rpartition(":")
+        gender = gender or "計"
+        if gender not in AGE_GENDERS or band not in AGE_GROUP_NAMES:
+            return None
+        column = array("d", [math.nan]) * self.table.n_rows
+        for code, value in self.age_pyramids.band(AGE_GENDERS.index(gender), AGE_GROUP_NAMES.index(band)):
+            row = self.table.row_of.get(code)
+            if row is not None:
+                column[row] = value
+        return column
+
+    def _sex_ratio_column(self, band: str) -> Optional[array]:
+        """Males per 100 females in one age band, joined onto table rows"""
+        if band not in AGE_GROUP_NAMES:
+            return None
+        index = AGE_GROUP_NAMES.index(band)
+        males = dict(self.age_pyramids.band(AGE_GENDERS.index("男"), index))
+        column = array("d", [math.nan]) * self.table.n_rows
+        for code, females in self.age_pyramids.band(AGE_GENDERS.index("女"), index):
+            row = self.table.row_of.get(code)
+            if row is not None and females > 0 and code in males:
+                column[row] = round(males[code] / females * 100, 1)
+        return column
+
+    def _coverage_column(self, source: str) -> Optional[array]:
+        """1.0 where the source has data for the row's code, else 0.0"""
+        if source not in COVERAGE_SOURCES:
+            return None
+        return array("d", (self.coverage.covers(code, source) for code in self.table.codes))
+
+    def value(self, row: int, field: str):
+        """JSON-friendly value of a field"""
+        if field in self.table.strings or field in self.table.numeric:
+            return self.table.value(row, field)
+        value = self.column(field)[row]
+        if math.isnan(value):
+            return None
+        # Age bands are head counts, coverage flags 0/1
+        return int(value) if field.startswith((AGE_PREFIX, COVERAGE_PREFIX)) else value
+
+    # Compilation
+
+    def _shape(self, node, params: List[Any]):
+        """Replace literal values by parameter slots, validating as we go"""
+        if not isinstance(node, dict):
+            raise QueryError(f"Predicate must be an object: {node!r}")
+        for combinator in ("and", "or"):
+            if combinator in node:
+                children = node[combinator]
+                if not isinstance(children, list) or not children:
+                    raise QueryError(f"'{combinator}' needs a non-empty list of predicates")
+                return {combinator: [self._shape(child, params) for child in children]}
+        if "not" in node:
+            return {"not": self._shape(node["not"], params)}
+
+        field, op = node.get("field"), node.get("op")
+        if not isinstance(field, str):
+            raise QueryError(f"Predicate needs a field: {node!r}")
+        if op not in OPERATORS:
+            raise QueryError(f"Unsupported op: {op!r} (supported: {', '.join(OPERATORS)})")
+        self.column(field)
+        if op in ("is_null", "not_null"):
+            return {"field": field, "op": op}
+
+        value = node.get("value")
+        if op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise QueryError(f"'between' needs [low, high]: {field}")
+            literals = value
+        elif op == "in":
+            if not isinstance(value, list):
+                raise QueryError(f"'in' needs a list: {field}")
+            literals = value
+        else:
+            literals = [value]
+        expected = str if self.is_string(field) else (int, float)
+        for literal in literals:
+            if isinstance(literal, bool) or not isinstance(literal, expected):
+                raise QueryError(f"Invalid value for {field}: {literal!r}")
+
+        params.append(value)
+        return {"field": field, "op": op, "value": len(params) - 1}
+
+    def _compile(self, shape) -> Plan:
+        """Turn a shape into a function (params, candidate rows) -> matching rows"""
+        if "and" in shape:
+            children = [self._compile(child) for child in shape["and"]]
+
+            def conjunction(params, rows):
+                for child in children:
+                    if not rows:
+                        break
+                    checkpoint()
+                    rows = child(params, rows)
+                return rows
+            return conjunction
+
+        if "or" in shape:
+            children = [self._compile(child) for child in shape["or"]]
+
+            def disjunction(params, rows):
+                matched = set()
+                for child in children:
+                    checkpoint()
+                    matched.update(child(params, rows))
+                return [r for r in rows if r in matched]
+            return disjunction
+
+        if "not" in shape:
+            child = self._compile(shape["not"])
+
+            def negation(params, rows):
+                excluded = set(child(params, rows))
+                return [r for r in rows if r not in excluded]
+            return negation
+
+        column = self.column(shape["field"])
+        op = shape["op"]
+        slot = shape.get("value")
+
+        present = _present_string if self.is_string(shape["field"]) else _present_number
+
+        if op == "is_null":
+            return lambda params, rows: [r for r in rows if not present(column[r])]
+        if op == "not_null":
+            return lambda params, rows: [r for r in rows if present(column[r])]
+        if op == "in":
+            def membership(params, rows):
+                values = set(params[slot])
+                return [r for r in rows if column[r] in values]
+            return membership
+        if op == "between":
+            def interval(params, rows):
+                low, high = params[slot]
+                return [r for r in rows if present(column[r]) and low <= column[r] <= high]
+            return interval
+        if op == "!=":
+            def inequality(params, rows):
+                value = params[slot]
+                return [r for r in rows if present(column[r]) and column[r] != value]
+            return inequality
+
+        compare = COMPARISONS[op]
+
+        def comparison(params, rows):
+            value = params[slot]
+            return [r for r in rows if present(column[r]) and compare(column[r], value)]
+        return comparison
+
+    def plan(self, where) -> Tuple[Plan, List[Any], bool]:
+        """
+        Compiled plan and parameters for a predicate tree
+
+        Returns:
+            (plan, params, whether the plan came from the cache)
+        """
+        params: List[Any] = []
+        shape = self._shape(where, params)
+        key = json.dumps(shape, ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan, params, True
+        plan = self._compile(shape)
+        with self._lock:
+            self._plans[key] = plan
+            if len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return plan, params, False
+
+    # Execution
+
+    def run(
+        self,
+        where: Optional[Dict] = None,
+        sort_by: Optional[str] = None,
+        sort_order: str = "desc",
+        units_only: bool = False
+    ) -> Tuple[List[int], bool]:
+        """
+        Matching rows, optionally sorted (missing values last)
+
+        Returns:
+            (rows, whether the plan came from the cache)
+
+        Raises:
+            QueryError: Invalid predicate, unknown field or sort order
+        """
+        if sort_order not in SORT_ORDERS:
+            raise QueryError(f"Unsupported sort_order: {sort_order}")
+        rows = list(range(self.table.n_rows))
+        if units_only:
+            rows = [r for r in rows if self.table.is_unit[r]]
+
+        cached = False
+        if where:
+            plan, params, cached = self.plan(where)
+            rows = plan(params, rows)
+
+        if sort_by:
+            checkpoint()
+            column = self.column(sort_by)
+            is_present = _present_string if self.is_string(sort_by) else _present_number
+            present = [r for r in rows if is_present(column[r])]
+            missing = [r for r in rows if not is_present(column[r])]
+            present.sort(key=column.__getitem__, reverse=(sort_order == "desc"))
+            rows = present + missing
+        return rows, cached
+
+
+def predicate_fields(where) -> List[str]:
+    """Fields referenced by a predicate tree, in order of appearance"""
+    if not isinstance(where, dict):
+        return []
+    fields = []
+    for child in where.get("and", []) + where.get("or", []) + ([where["not"]] if "not" in where else []):
+        fields.extend(predicate_fields(child))
+    if isinstance(where.get("field"), str):
+        fields.append(where["field"])
+    return fields
+
+
+def build_query_engine(dataset) -> QueryEngine:
+    """Derived-structure builder"""
+    return QueryEngine(
+        dataset.derived("table"), dataset.derived("dx_rankings"), dataset.derived("age_pyramids"),
+        dataset.derived("coverage")
+    )
@@ -0,0 +1,115 @@
+"""National, in-prefecture and in-type ranks of every numeric metric"""
+import math
+from array import array
+from typing import Callable, Dict, List, Optional
+
+from .table import MunicipalityTable
+
+
+# Comparison groups: name -> key of a row's group (None: everyone is in one group)
+SCOPES: Dict[str, Optional[str]] = {
+    "national": None,
+    "prefecture": "prefecture",
+    "type": "jichitai_type",
+}
+
+
+class RankIndex:
+    """
+    Rank, group size and percentile of every row in every numeric column
+
+    Computed once per dataset: for each column and scope, each group's
+    present values are sorted once and every row gets its position. Only
+    rows that partition a prefecture (MunicipalityTable.is_unit) are
+    ranked, so designated-city wards do not compete with their own city.
+
+    rank 1 is the largest value and ties share the best rank. The
+    percentile is the share of the group below the value, counting ties
+    as half (50 is the median), so it does not depend on the direction.
+    """
+
+    def __init__(self, table: MunicipalityTable):
+        self.table = table
+        self.columns = list(table.numeric)
+        # column -> scope -> array per row (rank 0: not ranked)
+        self.ranks: Dict[str, Dict[str, array]] = {}
+        self.sizes: Dict[str, Dict[str, array]] = {}
+        self.percentiles: Dict[str, Dict[str, array]] = {}
+
+        units = [row for row in range(table.n_rows) if table.is_unit[row]]
+        for column in self.columns:
+            values = table.numeric[column]
+            present = [row for row in units if not math.isnan(values[row])]
+            self.ranks[column] = {}
+            self.sizes[column] = {}
+            self.percentiles[column] = {}
+            for scope, key in SCOPES.items():
+                ranks = array("l", [0]) * table.n_rows
+                sizes = array("l", [0]) * table.n_rows
+                percentiles = array("d", [math.nan]) * table.n_rows
+                for group in self._groups(present, key):
+                    self._rank_group(group, values.__getitem__, ranks, sizes, percentiles)
+                self.ranks[column][scope] = ranks
+                self.sizes[column][scope] = sizes
+                self.percentiles[column][scope] = percentiles
+
+    def _groups(self, rows: List[int], key: Optional[str]) -> List[List[int]]:
+        if key is None:
+            return [rows]
+        labels = self.table.strings[key]
+        groups: Dict[Optional[str], List[int]] = {}
+        for row in rows:
+            if labels[row] is not None:
+                groups.setdefault(labels[row], []).append(row)
+        return list(groups.values())
+
+    @staticmethod
+    def _rank_group(
+        rows: List[int],
+        value: Callable[[int], float],
+        ranks: array,
+        sizes: array,
+        percentiles: array
+    ):
+        n = len(rows)
+        ordered = sorted(rows, key=value, reverse=True)
+        start = 0
+        while start < n:
+            end = start
+            while end < n and value(ordered[end]) == value(ordered[start]):
+                end += 1
+            # ordered[start:end] tie; start rows are larger, n - end smaller
+            percentile = round((n - end + (end - start) / 2) / n * 100, 1)
+            for row in ordered[start:end]:
+                ranks[row] = start + 1
+                sizes[row] = n
+                percentiles[row] = percentile
+            start = end
+
+    def row_ranks(self, row: int, columns: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Ranks of one row: {column: {scope: {"rank", "of", "percentile"}}}
+
+        Columns where the row is not ranked (missing value or not a
+        partitioning municipality) are left out.
+        """
+        result = {}
+        for column in columns or self.columns:
+            ranks = self.ranks[column]
+            if not ranks["national"][row]:
+                continue
+            result[column] = {
+                scope: {
+                    "rank": ranks[scope][row],
+                    "of": self.sizes[column][scope][row],
+                    "percentile": self.percentiles[column][scope][row],
+                }
+                for scope in SCOPES
+                if ranks[scope][row]
+            }
+        return result
+
+
+def build_rank_index(dataset) -> RankIndex:
+    """Derived-structure builder"""
+    return RankIndex(dataset.derived("table"))
@@ -0,0 +1,101 @@
+"""Redirects from retired municipality codes and names to current ones"""
+from typing import Dict, List, Optional
+
+
+class RedirectIndex:
+    """
+    Hash lookups from a retired code or name to the current municipality
+
+    Chains of changes (A merged into B, B later merged into C) are
+    followed at build time, so every lookup is a single dict access.
+    History entries whose successor cannot be traced to a code in the
+    current code list are dropped.
+    """
+
+    def __init__(self, history: List[Dict], codes_by_code: Dict[str, Dict]):
+        self.current_by_name: Dict[str, List[Dict]] = {}
+        for record in codes_by_code.values():
+            if record["municipality"] is not None:
+                self.current_by_name.setdefault(record["municipality"], []).append(record)
+
+        successor = {}
+        for record in history:
+            if record["old_code"] and record["old_code"] != record["new_code"]:
+                successor.setdefault(record["old_code"], record["new_code"])
+
+        def trace(code: str) -> Optional[str]:
+            seen = set()
+            while code not in codes_by_code or codes_by_code[code]["municipality"] is None:
+                if code in seen or code not in successor:
+                    return None
+                seen.add(code)
+                code = successor[code]
+            return code
+
+        self.by_code: Dict[str, Dict] = {}
+        self.by_name: Dict[str, List[Dict]] = {}
+        for record in history:
+            target = trace(record["new_code"])
+            if target is None:
+                continue
+            redirect = {
+                "from_code": record["old_code"],
+                "from_name": record["old_name"],
+                # The retired municipality's own prefecture, which differs
+                # from the successor's after a transfer across prefectures
+                "from_prefecture": record["prefecture"] or codes_by_code[target]["prefecture"],
+                "to_code": target,
+                "to_name": codes_by_code[target]["municipality"],
+                "to_prefecture": codes_by_code[target]["prefecture"],
+                "date": record["date"],
+                "reason": record["reason"],
+            }
+            if record["old_code"] and record["old_code"] not in codes_by_code:
+                self.by_code.setdefault(record["old_code"], redirect)
+            if record["old_name"]:
+                self.by_name.setdefault(record["old_name"], []).append(redirect)
+
+    def __len__(self) -> int:
+        return len(self.by_code) + len(self.by_name)
+
+    def resolve_code(self, jichitai_code: str) -> Optional[Dict]:
+        """Redirect for a retired code, or None"""
+        return self.by_code.get(str(jichitai_code).zfill(6))
+
+    def current(self, name: str, prefecture: Optional[str] = None) -> List[Dict]:
+        """Code records of current municipalities with exactly this name"""
+        records = self.current_by_name.get(name, [])
+        if prefecture is not None:
+            records = [r for r in records if r["prefecture"] == prefecture]
+        return records
+
+    def resolve_name(self, name: str, prefecture: Optional[str] = None) -> Optional[Dict]:
+        """
+        Redirect for a retired name, or None
+
+        Names still in use (in the given prefecture, if any) are never
+        redirected. A retired name shared by municipalities that went to
+        different successors needs the prefecture to be resolved.
+        """
+        if self.current(name, prefecture):
+            return None
+        candidates = self.name_candidates(name, prefecture)
+        return candidates[0] if len(candidates) == 1 else None
+
+    def name_candidates(self, name: str, prefecture: Optional[str] = None) -> List[Dict]:
+        """
+        Redirects of a retired name, one per distinct successor
+
+        The prefecture is matched against the prefecture the retired
+        municipality belonged to, not its successor's.
+        """
+        candidates = {}
+        for redirect in self.by_name.get(name, ()):
+            if prefecture is None or redirect["from_prefecture"] == prefecture:
+                candidates.setdefault(redirect["to_code"], redirect)
+        return list(candidates.values())
+
+
+def build_redirects(dataset) -> RedirectIndex:
+    """Derived-structure builder"""
+    return RedirectIndex(dataset.records("history"), dataset.derived("codes_by_code"))
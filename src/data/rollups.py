@@ -0,0 +1,122 @@
+"""Prefecture and national rollups of the municipality table"""
+import math
+from typing import Dict, Optional
+
+from .table import FINANCE_COLUMNS, MunicipalityTable
+
+
+NATIONAL = "全国"
+
+SUM_COLUMNS = [
+    "population_total", "population_male", "population_female", "households",
+    "transfer_in_total", "births",
+    "mynumber_population", "mynumber_issued_cards",
+    "age_population_total", "youth_population", "working_age_population", "elderly_population",
+]
+
+
+class _Accumulator:
+    """Running sums for one group"""
+
+    __slots__ = ("count", "sums", "weighted", "weights", "card_population", "card_issued")
+
+    def __init__(self):
+        self.count = 0
+        self.sums = dict.fromkeys(SUM_COLUMNS, 0.0)
+        self.weighted = dict.fromkeys(FINANCE_COLUMNS, 0.0)
+        self.weights = dict.fromkeys(FINANCE_COLUMNS, 0.0)
+        # My Number rate only over municipalities with both figures
+        self.card_population = 0.0
+        self.card_issued = 0.0
+
+
+def _ratio(numerator: float, denominator: float, digits: int = 2) -> Optional[float]:
+    return round(numerator / denominator * 100, digits) if denominator else None
+
+
+def _finish(name: str, acc: _Accumulator) -> Dict:
+    sums = {column: int(value) for column, value in acc.sums.items()}
+    return {
+        "prefecture": name,
+        "municipality_count": acc.count,
+        "population": {
+            "total": sums["population_total"],
+            "male": sums["population_male"],
+            "female": sums["population_female"],
+        },
+        "households": sums["households"],
+        "population_dynamics": {
+            "transfer_in_total": sums["transfer_in_total"],
+            "births": sums["births"],
+        },
+        # Population-weighted means over municipalities that report the indicator
+        "finance": {
+            column: round(acc.weighted[column] / acc.weights[column], 3) if acc.weights[column] else None
+            for column in FINANCE_COLUMNS
+        },
+        "mynumber_card": {
+            "population": sums["mynumber_population"],
+            "issued_cards": sums["mynumber_issued_cards"],
+            "issuance_rate": _ratio(acc.card_issued, acc.card_population),
+        },
+        "demographic_summary": {
+            "youth_population": sums["youth_population"],
+            "youth_ratio": _ratio(sums["youth_population"], sums["age_population_total"]),
+            "working_age_population": sums["working_age_population"],
+            "working_age_ratio": _ratio(sums["working_age_population"], sums["age_population_total"]),
+            "elderly_population": sums["elderly_population"],
+            "elderly_ratio": _ratio(sums["elderly_population"], sums["age_population_total"]),
+        },
+    }
+
+
+def build_rollups(table: MunicipalityTable) -> Dict:
+    """
+    Reduce the table to per-prefecture and national aggregates in one pass
+
+    Only rows that partition a prefecture (MunicipalityTable.is_unit) are
+    counted, so designated-city wards are not added on top of their city.
+
+    Returns:
+        {"national": summary, "prefectures": {prefecture: summary}}
+    """
+    groups: Dict[str, _Accumulator] = {}
+    national = _Accumulator()
+    prefectures = table.strings["prefecture"]
+    numeric = table.numeric
+    population = numeric["population_total"]
+
+    sum_columns = [(column, numeric[column]) for column in SUM_COLUMNS]
+    finance_columns = [(column, numeric[column]) for column in FINANCE_COLUMNS]
+    card_population = numeric["mynumber_population"]
+    card_issued = numeric["mynumber_issued_cards"]
+
+    for row in range(table.n_rows):
+        if not table.is_unit[row] or prefectures[row] is None:
+            continue
+        targets = (groups.setdefault(prefectures[row], _Accumulator()), national)
+        weight = population[row]
+
+        for acc in targets:
+            acc.count += 1
+        for column, values in sum_columns:
+            value = values[row]
+            if not math.isnan(value):
+                for acc in targets:
+                    acc.sums[column] += value
+        if not math.isnan(weight):
+            for column, values in finance_columns:
+                value = values[row]
+                if not math.isnan(value):
+                    for acc in targets:
+                        acc.weighted[column] += value * weight
+                        acc.weights[column] += weight
+        if not math.isnan(card_population[row]) and not math.isnan(card_issued[row]):
+            for acc in targets:
+                acc.card_population += card_population[row]
+                acc.card_issued += card_issued[row]
+
+    return {
+        "national": _finish(NATIONAL, national),
+        "prefectures": {name: _finish(name, acc) for name, acc in groups.items()},
+    }
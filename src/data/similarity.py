@@ -0,0 +1,123 @@
+"""k-nearest-neighbour search over standardized municipality profiles"""
+import heapq
+import math
+import statistics
+from array import array
+from typing import Dict, List, Optional
+
+from .cancellation import checkpoint
+from .table import MunicipalityTable
+
+
+# Profile features; heavy-tailed counts are compared on a log scale
+SIMILARITY_FEATURES = {
+    "population_total": "log",
+    "households": "log",
+    "youth_ratio": "linear",
+    "working_age_ratio": "linear",
+    "elderly_ratio": "linear",
+    "financial_capability_index": "linear",
+    "current_balance_ratio": "linear",
+    "real_debt_service_ratio": "linear",
+    "future_burden_ratio": "linear",
+    "laspeyres_index": "linear",
+    "mynumber_card_issuance_rate": "linear",
+}
+
+
+class SimilarityIndex:
+    """
+    Standardized feature columns for every municipality
+
+    Each feature is z-scored over all municipalities once at load time and
+    stored as its own array('d'); a missing value becomes 0 (the mean), so
+    it neither attracts nor repels. A query accumulates weighted squared
+    differences column by column over all candidate rows.
+    """
+
+    def __init__(self, table: MunicipalityTable):
+        self.table = table
+        # Candidates: municipalities with population data (not designated-city wards)
+        population = table.numeric["population_total"]
+        self.candidates = [
+            row for row in range(table.n_rows)
+            if table.is_unit[row] and not math.isnan(population[row])
+        ]
+
+        self.features: Dict[str, array] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        for feature, scale in SIMILARITY_FEATURES.items():
+            raw = table.numeric[feature]
+            transformed = [self._transform(value, scale) for value in raw]
+            present = [transformed[row] for row in self.candidates if not math.isnan(transformed[row])]
+            mean = statistics.fmean(present) if present else 0.0
+            std = statistics.pstdev(present, mean) if len(present) > 1 else 0.0
+            self.stats[feature] = {"mean": mean, "std": std}
+            self.features[feature] = array("d", [
+                0.0 if math.isnan(value) or not std else (value - mean) / std
+                for value in transformed
+            ])
+
+    @staticmethod
+    def _transform(value: float, scale: str) -> float:
+        if math.isnan(value):
+            return value
+        if scale == "log":
+            return math.log1p(value) if value >= 0 else math.nan
+        return value
+
+    def query(
+        self,
+        row: int,
+        k: int = 10,
+        weights: Optional[Dict[str, float]] = None,
+        prefecture: Optional[List[str]] = None,
+        jichitai_type: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Nearest municipalities to a table row
+
+        Args:
+            row: Table row of the reference municipality
+            k: Number of neighbours
+            weights: Feature -> weight (default 1.0 each; 0 disables a feature)
+            prefecture: Restrict candidates to these prefectures
+            jichitai_type: Restrict candidates to these municipality types
+
+        Returns:
+            Neighbours sorted by distance, excluding the reference itself
+
+        Raises:
+            ValueError: k less than 1
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1: {k}")
+        prefectures = self.table.strings["prefecture"]
+        types = self.table.strings["jichitai_type"]
+        candidates = [
+            c for c in self.candidates
+            if c != row
+            and (not prefecture or prefectures[c] in prefecture)
+            and (not jichitai_type or types[c] in jichitai_type)
+        ]
+
+        distances = [0.0] * len(candidates)
+        for feature, column in self.features.items():
+            checkpoint()
+            weight = 1.0 if weights is None else weights.get(feature, 1.0)
+            if not weight:
+                continue
+            target = column[row]
+            values = [column[c] for c in candidates]
+            distances = [d + weight * (v - target) ** 2 for d, v in zip(distances, values)]
+
+        nearest = heapq.nsmallest(k, range(len(candidates)), key=distances.__getitem__)
+        return [
+            {"row": candidates[i], "distance": round(math.sqrt(distances[i]), 4)}
+            for i in nearest
+        ]
+
+
+def build_similarity_index(dataset) -> SimilarityIndex:
+    """Derived-structure builder"""
+    return SimilarityIndex(dataset.derived("table"))
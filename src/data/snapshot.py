@@ -0,0 +1,298 @@
+"""
+Versioned, checksummed data bundle built offline from the source workbooks
+
+A bundle holds the parsed records of every source together with all
+derived structures (joined table, indexes, rollups, rankings), so a
+server started from it needs neither the xlsx files nor openpyxl and does
+no parsing or joining at startup.
+
+File layout:
+    MAGIC
+    one line of JSON header (format, versions, sizes, sha256s, coverage)
+    pickled payload (records and derived structures)
+    joined municipality table as a fixed-width column section (column_file)
+
+The bundle is memory-mapped on load and the joined table is read in place
+from the column section, so servers started from the same bundle share
+the table's pages through the page cache instead of each holding a
+private copy. Only the table is shared this way: the pickled payload
+(source records and the other derived structures) is still unpickled into
+each process's own memory on load, and both sections are checked against
+their sha256 first, which reads the whole file. Derived structures that
+reference the table are pickled with a reference to it and bound to the
+mapped table when unpickled.
+"""
+import hashlib
+import io
+import json
+import math
+import mmap
+import pickle
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Union
+
+from .column_file import MappedTable, encode_table
+from .dataset import DERIVED, Dataset, SOURCES
+from .table import FINANCE_COLUMNS
+
+
+MAGIC = b"JICHITAI-BUNDLE\n"
+
+# Bump when the record or derived layout changes so stale bundles are rejected
+SNAPSHOT_FORMAT = 8
+
+# Sources a bundle cannot be built without
+REQUIRED_SOURCES = ("codes", "population")
+
+# Minimum share of municipalities each available source must cover
+DEFAULT_MIN_COVERAGE = 0.9
+
+
+# Persistent id the joined table is pickled as
+_TABLE_ID = "table"
+
+
+class SnapshotError(ValueError):
+    """Bundle is unreadable, corrupted or was written by an incompatible version"""
+
+
+class _Pickler(pickle.Pickler):
+    """Pickles the table as a reference; it is stored in the column section"""
+
+    def __init__(self, file, table):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.table = table
+
+    def persistent_id(self, obj):
+        return _TABLE_ID if obj is self.table and obj is not None else None
+
+
+class _Unpickler(pickle.Unpickler):
+    """Resolves the table reference to the mapped table"""
+
+    def __init__(self, file, table):
+        super().__init__(file)
+        self.table = table
+
+    def persistent_load(self, pid):
+        if pid != _TABLE_ID:
+            raise pickle.UnpicklingError(f"Unknown reference {pid!r}")
+        return self.table
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def coverage_report(dataset: Dataset) -> Dict:
+    """
+    How much of the municipality list each source covers
+
+    Coverage is measured over municipalities in the code list, excluding
+    designated-city wards (which finance data does not report).
+    """
+    table = dataset.derived("table")
+    listed = {r["jichitai_code"] for r in dataset.records("codes") if r["municipality"] is not None}
+    rows = [row for row in range(table.n_rows) if table.is_unit[row] and table.codes[row] in listed]
+
+    def share(present: Iterable[bool]) -> float:
+        return round(sum(present) / len(rows), 4) if rows else 0.0
+
+    def has_value(*columns: str):
+        values = [table.numeric[column] for column in columns]
+        return (any(not math.isnan(v[row]) for v in values) for row in rows)
+
+    coverage = {
+        "population": share(has_value("population_total")),
+        "finance": share(has_value(*FINANCE_COLUMNS)),
+        "mynumber": share(has_value("mynumber_card_issuance_rate")),
+        "age_group": share(has_value("age_population_total")),
+    }
+    rankings = dataset.derived("dx_rankings")
+    if rankings is not None:
+        joined = {column["jichitai_code"] for column in rankings.columns["dx_indicators"]}
+        coverage["dx"] = share(table.codes[row] in joined for row in rows)
+
+    return {
+        "municipalities": len(rows),
+        "sources": {
+            source: len(dataset.records(source)) if source != "dx" else len(dataset.records(source).municipalities())
+            for source in SOURCES if dataset.has(source)
+        },
+        "coverage": {source: value for source, value in coverage.items() if dataset.has(source)},
+    }
+
+
+def validate(dataset: Dataset, min_coverage: float = DEFAULT_MIN_COVERAGE) -> Dict:
+    """
+    Coverage report, raising if the data is not fit to ship
+
+    Raises:
+        SnapshotError: a required source is missing or a source covers
+            less than min_coverage of the municipalities
+    """
+    report = coverage_report(dataset)
+    problems = [f"missing source: {source}" for source in REQUIRED_SOURCES if not dataset.has(source)]
+    problems += [
+        f"{source} covers {value:.1%} of municipalities (minimum {min_coverage:.0%})"
+        for source, value in report["coverage"].items()
+        if value < min_coverage
+    ]
+    if problems:
+        raise SnapshotError("; ".join(problems))
+    return report
+
+
+def save_snapshot(dataset: Dataset, path: Union[str, Path], report: Dict = None) -> Path:
+    """
+    Write a dataset, including every derived structure, as one bundle file
+
+    Args:
+        dataset: Dataset to write
+        path: Bundle file (written to a temporary file and renamed)
+        report: Coverage report to record in the header (default: computed)
+    """
+    from .. import __version__
+
+    rankings = dataset.derived("dx_rankings")
+    if rankings is not None:
+        rankings.precompute()
+
+    table = dataset.derived("table")
+    buffer = io.BytesIO()
+    _Pickler(buffer, table).dump({
+        "records": {source: dataset.records(source) for source in SOURCES if dataset.has(source)},
+        "fingerprints": {source: dataset.fingerprint(source) for source in SOURCES},
+        "derived": {name: dataset.derived(name) for name in DERIVED},
+    })
+    payload = buffer.getvalue()
+    columns = encode_table(table)
+
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "package_version": __version__,
+        "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "digest": dataset.digest,
+        "payload_size": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "columns_size": len(columns),
+        "columns_sha256": hashlib.sha256(columns).hexdigest(),
+        "report": report if report is not None else coverage_report(dataset),
+    }
+    head = MAGIC + json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(head)
+        f.write(payload)
+        # The column section starts 8-byte aligned so numeric columns can be viewed in place
+        end = len(head) + len(payload)
+        f.write(b"\0" * (_align(end) - end))
+        f.write(columns)
+    tmp_path.replace(path)
+    return path
+
+
+def _read_header(f, path) -> Dict:
+    if f.readline() != MAGIC:
+        raise SnapshotError(f"Not a data bundle: {path}")
+    try:
+        header = json.loads(f.readline())
+    except ValueError as e:
+        raise SnapshotError(f"Corrupted bundle header in {path}: {e}") from e
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"Unsupported bundle format {header.get('format')} in {path}")
+    return header
+
+
+def read_header(path: Union[str, Path]) -> Dict:
+    """Header of a bundle (versions, checksums, coverage) without loading the data"""
+    try:
+        with open(path, "rb") as f:
+            return _read_header(f, path)
+    except OSError as e:
+        raise SnapshotError(f"Cannot read bundle {path}: {e}") from e
+
+
+def load_snapshot(path: Union[str, Path]) -> Dataset:
+    """
+    Load a dataset from a bundle after verifying its checksums
+
+    The joined table stays in the mapped file; records and the other
+    derived structures are unpickled into memory. Bundles are trusted build
+    artifacts (the payload is unpickled); only load files produced by
+    save_snapshot.
+    """
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f, path)
+            start = f.tell()
+            # The mapping stays valid after the file is closed
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot read bundle {path}: {e}") from e
+
+    view = memoryview(mapped)
+    payload = view[start:start + header["payload_size"]]
+    columns_start = _align(start + header["payload_size"])
+    columns = view[columns_start:columns_start + header["columns_size"]]
+    if (
+        len(payload) != header["payload_size"]
+        or len(columns) != header["columns_size"]
+        or hashlib.sha256(payload).hexdigest() != header["sha256"]
+        or hashlib.sha256(columns).hexdigest() != header["columns_sha256"]
+    ):
+        raise SnapshotError(f"Checksum mismatch in {path}")
+
+    table = MappedTable(columns)
+    data = _Unpickler(io.BytesIO(payload), table).load()
+    # Derived structures added since the bundle was built are computed on load
+    return Dataset(data["records"], data["fingerprints"], derived=data["derived"])
+
+
+def main(argv=None):
+    """Build or inspect a data bundle"""
+    import argparse
+    import sys
+    from .data_manager import DataManager
+
+    parser = argparse.ArgumentParser(description="Build a data bundle from the source workbooks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Parse all sources, validate coverage and write a bundle")
+    build.add_argument("output", help="Bundle file to write")
+    build.add_argument("--data-dir", help="Source data directory (default: data/source)")
+    build.add_argument("--min-coverage", type=float, default=DEFAULT_MIN_COVERAGE,
+                       help=f"Minimum share of municipalities per source (default: {DEFAULT_MIN_COVERAGE})")
+    verify = commands.add_parser("verify", help="Check a bundle's checksum and print its header")
+    verify.add_argument("bundle", help="Bundle file to check")
+    args = parser.parse_args(argv)
+
+    if args.command == "verify":
+        try:
+            load_snapshot(args.bundle)
+        except SnapshotError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 1
+        print(json.dumps(read_header(args.bundle), ensure_ascii=False, indent=2))
+        return 0
+
+    dm = DataManager(args.data_dir)
+    try:
+        dataset = dm.dataset
+        report = validate(dataset, args.min_coverage)
+        path = save_snapshot(dataset, args.output, report)
+    except SnapshotError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        dm.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,187 @@
+"""Radius and nearest-neighbour search over municipal office locations"""
+import heapq
+import math
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+from .table import MunicipalityTable
+
+
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+
+def check_point(latitude: float, longitude: float):
+    """Raise ValueError unless latitude/longitude are degrees in range"""
+    if not -90.0 <= latitude <= 90.0:
+        raise ValueError(f"latitude must be between -90 and 90: {latitude}")
+    if not -180.0 <= longitude <= 180.0:
+        raise ValueError(f"longitude must be between -180 and 180: {longitude}")
+
+
+def unit_vector(latitude: float, longitude: float) -> Tuple[float, float, float]:
+    """Point on the unit sphere for a latitude/longitude in degrees"""
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(chord: float) -> float:
+    """Great-circle distance of a straight-line distance between unit vectors"""
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+class SpatialIndex:
+    """
+    k-d tree over the table rows that have office coordinates
+
+    Points are stored as unit vectors, so the straight-line distance
+    between two points orders them exactly like the great-circle distance
+    and a radius in km is a fixed threshold. The tree is implicit: rows
+    are arranged so that the median of every slice [lo, hi) is its node,
+    split on axis depth % 3, and the coordinates are kept in three
+    array('d') in the same order.
+    """
+
+    def __init__(self, coordinates: List[Dict], table: MunicipalityTable):
+        self.table = table
+        self.locations: Dict[int, Tuple[float, float]] = {}
+        for record in coordinates:
+            row = table.row_of.get(record["jichitai_code"])
+            if row is not None:
+                self.locations.setdefault(row, (record["latitude"], record["longitude"]))
+
+        points = [(unit_vector(*location), row) for row, location in self.locations.items()]
+        self._arrange(points, 0, len(points), 0)
+        self.rows = array("l", [row for _, row in points])
+        self.axes = [array("d", [vector[axis] for vector, _ in points]) for axis in range(3)]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def _arrange(cls, points: List, lo: int, hi: int, depth: int):
+        """Order points[lo:hi] in place so every slice's median is its node"""
+        if hi - lo <= 1:
+            return
+        axis = depth % 3
+        points[lo:hi] = sorted(points[lo:hi], key=lambda point: point[0][axis])
+        mid = (lo + hi) // 2
+        cls._arrange(points, lo, mid, depth + 1)
+        cls._arrange(points, mid + 1, hi, depth + 1)
+
+    def location(self, row: int) -> Optional[Tuple[float, float]]:
+        """(latitude, longitude) of a table row, or None"""
+        return self.locations.get(row)
+
+    def _distance2(self, query: Tuple[float, float, float], node: int) -> float:
+        x, y, z = self.axes
+        return (x[node] - query[0]) ** 2 + (y[node] - query[1]) ** 2 + (z[node] - query[2]) ** 2
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        rows: Optional[Set[int]] = None
+    ) -> List[Dict]:
+        """
+        Rows within radius_km of a point
+
+        Args:
+            latitude, longitude: Centre in degrees
+            radius_km: Great-circle radius
+            rows: Only consider these table rows (default: all)
+
+        Returns:
+            [{"row", "distance_km"}] sorted by distance
+
+        Raises:
+            ValueError: Point out of range or radius not positive
+        """
+        check_point(latitude, longitude)
+        if not radius_km > 0:
+            raise ValueError(f"radius_km must be positive: {radius_km}")
+        query = unit_vector(latitude, longitude)
+        radius = km_to_chord(radius_km)
+        radius2 = radius * radius
+        found = []
+        stack = [(0, len(self.rows), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            distance2 = self._distance2(query, mid)
+            if distance2 <= radius2 and (rows is None or self.rows[mid] in rows):
+                found.append((distance2, self.rows[mid]))
+            diff = query[depth % 3] - self.axes[depth % 3][mid]
+            if diff <= radius:
+                stack.append((lo, mid, depth + 1))
+            if diff >= -radius:
+                stack.append((mid + 1, hi, depth + 1))
+
+        found.sort()
+        return [{"row": row, "distance_km": round(chord_to_km(math.sqrt(d2)), 3)} for d2, row in found]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 10,
+        rows: Optional[Set[int]] = None
+    ) -> List[Dict]:
+        """
+        The k rows closest to a point
+
+        Args:
+            latitude, longitude: Point in degrees
+            k: Number of rows
+            rows: Only consider these table rows (default: all)
+
+        Returns:
+            [{"row", "distance_km"}] sorted by distance
+
+        Raises:
+            ValueError: Point out of range or k less than 1
+        """
+        check_point(latitude, longitude)
+        if k < 1:
+            raise ValueError(f"k must be at least 1: {k}")
+        query = unit_vector(latitude, longitude)
+        # Max-heap of the best k so far, as (-distance2, row)
+        best: List[Tuple[float, int]] = []
+
+        def visit(lo: int, hi: int, depth: int):
+            if lo >= hi:
+                return
+            mid = (lo + hi) // 2
+            row = self.rows[mid]
+            if rows is None or row in rows:
+                distance2 = self._distance2(query, mid)
+                if len(best) < k:
+                    heapq.heappush(best, (-distance2, row))
+                elif distance2 < -best[0][0]:
+                    heapq.heapreplace(best, (-distance2, row))
+            diff = query[depth % 3] - self.axes[depth % 3][mid]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff <= 0 else ((mid + 1, hi), (lo, mid))
+            visit(*near, depth + 1)
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(*far, depth + 1)
+
+        visit(0, len(self.rows), 0)
+        return [
+            {"row": row, "distance_km": round(chord_to_km(math.sqrt(-d2)), 3)}
+            for d2, row in sorted(best, reverse=True)
+        ]
+
+
+def build_spatial_index(dataset) -> Optional[SpatialIndex]:
+    """Derived-structure builder (None without a coordinates source)"""
+    if not dataset.has("geo"):
+        return None
+    return SpatialIndex(dataset.records("geo"), dataset.derived("table"))
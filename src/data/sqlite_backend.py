@@ -0,0 +1,315 @@
+"""Optional SQLite materialization of a dataset for indexed and ad-hoc SQL queries"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .age_group_parser import AGE_GROUP_NAMES
+from .cancellation import aborted
+from .table import FINANCE_COLUMNS, INTEGER_COLUMNS, NUMERIC_COLUMNS, STRING_COLUMNS
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the table layout changes so existing files are rebuilt
+SCHEMA_VERSION = "2"
+
+# SQLite VM instructions between cancellation checks
+PROGRESS_STEPS = 10000
+
+SCHEMA = [
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+    """CREATE TABLE codes (
+        jichitai_code TEXT PRIMARY KEY, prefecture TEXT, municipality TEXT,
+        prefecture_kana TEXT, municipality_kana TEXT, jichitai_type TEXT)""",
+    """CREATE TABLE population (
+        jichitai_code TEXT, prefecture TEXT, municipality TEXT,
+        total INTEGER, male INTEGER, female INTEGER, households INTEGER,
+        transfer_in_domestic INTEGER, transfer_in_foreign INTEGER, transfer_in_total INTEGER, births INTEGER)""",
+    f"""CREATE TABLE finance (
+        jichitai_code TEXT PRIMARY KEY, prefecture TEXT, municipality TEXT,
+        {", ".join(f"{column} REAL" for column in FINANCE_COLUMNS)})""",
+    """CREATE TABLE mynumber (
+        prefecture TEXT, municipality TEXT, population INTEGER, issued_cards INTEGER, issuance_rate REAL)""",
+    """CREATE TABLE age_groups (
+        jichitai_code TEXT, prefecture TEXT, municipality TEXT, gender TEXT,
+        age_group TEXT, band INTEGER, population INTEGER)""",
+    """CREATE TABLE dx_values (
+        category TEXT, indicator TEXT, jichitai_name TEXT, jichitai_code TEXT, value REAL, raw_value TEXT)""",
+    f"""CREATE TABLE municipalities (
+        {", ".join(f"{column} TEXT" for column in STRING_COLUMNS)},
+        {", ".join(f"{column} {'INTEGER' if column in INTEGER_COLUMNS else 'REAL'}" for column in NUMERIC_COLUMNS)},
+        is_unit INTEGER)""",
+]
+
+INDEXES = [
+    "CREATE INDEX codes_prefecture ON codes (prefecture)",
+    "CREATE INDEX codes_type ON codes (jichitai_type)",
+    "CREATE INDEX codes_name ON codes (municipality)",
+    "CREATE INDEX population_code ON population (jichitai_code)",
+    "CREATE INDEX population_prefecture ON population (prefecture)",
+    "CREATE INDEX population_total ON population (total)",
+    *[f"CREATE INDEX finance_{column} ON finance ({column})" for column in FINANCE_COLUMNS],
+    "CREATE INDEX mynumber_name ON mynumber (municipality, prefecture)",
+    "CREATE INDEX age_groups_code ON age_groups (jichitai_code, gender)",
+    "CREATE INDEX dx_values_indicator ON dx_values (indicator, value)",
+    "CREATE INDEX dx_values_code ON dx_values (jichitai_code)",
+    "CREATE UNIQUE INDEX municipalities_code ON municipalities (jichitai_code)",
+    "CREATE INDEX municipalities_prefecture ON municipalities (prefecture)",
+    "CREATE INDEX municipalities_type ON municipalities (jichitai_type)",
+    *[f"CREATE INDEX municipalities_{column} ON municipalities ({column})" for column in NUMERIC_COLUMNS],
+]
+
+
+def _sql_number(value):
+    """Parser value as an SQL number (NULL for markers that are not numbers)"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if isinstance(value, float) and math.isnan(value) else value
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _placeholders(values: Sequence) -> str:
+    return ", ".join("?" * len(values))
+
+
+class SQLiteBackend:
+    """
+    Dataset materialized into a local SQLite file
+
+    The file is rebuilt only when its stored dataset digest differs from
+    the dataset being synced, so it survives restarts and can be shared
+    by several processes. Rebuilds write a temporary file and rename it
+    over the old one; every query opens its own read-only connection and
+    therefore always sees one complete version.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.digest = self._stored_digest()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+        # Interrupt statements of a call that was cancelled or ran past its deadline
+        conn.set_progress_handler(aborted, PROGRESS_STEPS)
+        return conn
+
+    def _stored_digest(self) -> Optional[str]:
+        """Digest of the dataset in the existing file (None if absent or outdated)"""
+        if not self.path.exists():
+            return None
+        try:
+            with closing(self._connect()) as conn:
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+        except sqlite3.Error:
+            return None
+        if meta.get("schema_version") != SCHEMA_VERSION:
+            return None
+        return meta.get("digest")
+
+    def matches(self, dataset) -> bool:
+        """Whether the file holds exactly this dataset"""
+        return self.digest == dataset.digest
+
+    def sync(self, dataset) -> bool:
+        """
+        Materialize a dataset unless the file already holds it
+
+        Returns:
+            True if the file was rebuilt
+        """
+        with self._lock:
+            if self.matches(dataset):
+                return False
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp_path.unlink(missing_ok=True)
+            conn = sqlite3.connect(tmp_path)
+            try:
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                self._populate(conn, dataset)
+                for statement in INDEXES:
+                    conn.execute(statement)
+                conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                    ("schema_version", SCHEMA_VERSION),
+                    ("digest", dataset.digest),
+                    ("version", str(dataset.version)),
+                ])
+                conn.commit()
+                conn.execute("ANALYZE")
+            finally:
+                conn.close()
+            os.replace(tmp_path, self.path)
+
+            self.digest = dataset.digest
+            logger.info("Materialized dataset version %d into %s", dataset.version, self.path)
+            return True
+
+    def _populate(self, conn: sqlite3.Connection, dataset):
+        conn.executemany("INSERT OR IGNORE INTO codes VALUES (?, ?, ?, ?, ?, ?)", (
+            (r["jichitai_code"], r["prefecture"], r["municipality"],
+             r["prefecture_kana"], r["municipality_kana"], r["jichitai_type"])
+            for r in dataset.records("codes")
+        ))
+
+        conn.executemany("INSERT INTO population VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+            (r["jichitai_code"], r["prefecture"], r["municipality"],
+             r["population"]["total"], r["population"]["male"], r["population"]["female"], r["households"],
+             r["population_dynamics"]["transfer_in_domestic"], r["population_dynamics"]["transfer_in_foreign"],
+             r["population_dynamics"]["transfer_in_total"], r["population_dynamics"]["births"])
+            for r in dataset.records("population")
+        ))
+
+        conn.executemany(f"INSERT OR IGNORE INTO finance VALUES (?, ?, ?, {_placeholders(FINANCE_COLUMNS)})", (
+            (r["jichitai_code"], r["prefecture_name"], r["municipality_name"],
+             *[_sql_number(r["finance"].get(column)) for column in FINANCE_COLUMNS])
+            for r in dataset.records("finance")
+        ))
+
+        conn.executemany("INSERT INTO mynumber VALUES (?, ?, ?, ?, ?)", (
+            (r["prefecture"], r["municipality"], r["mynumber_card"]["population"],
+             r["mynumber_card"]["issued_cards"], r["mynumber_card"]["issuance_rate"])
+            for r in dataset.records("mynumber")
+        ))
+
+        conn.executemany("INSERT INTO age_groups VALUES (?, ?, ?, ?, ?, ?, ?)", (
+            (r["jichitai_code"], r["prefecture"], r["municipality"], r["gender"],
+             name, band, r["age_groups"].get(name))
+            for r in dataset.records("age_group")
+            for band, name in enumerate(AGE_GROUP_NAMES)
+        ))
+
+        rankings = dataset.derived("dx_rankings")
+        if rankings is not None:
+            for category, matrix in (("dx_indicators", rankings.dx.comparison),
+                                     ("online_procedures", rankings.dx.online)):
+                columns = rankings.columns[category]
+                conn.executemany("INSERT INTO dx_values VALUES (?, ?, ?, ?, ?, ?)", (
+                    (category, matrix.row_labels[row], matrix.col_labels[col], columns[col]["jichitai_code"],
+                     *self._dx_cell(matrix, row, col))
+                    for row in matrix.row_index.values()
+                    for col in matrix.col_index.values()
+                ))
+
+        table = dataset.derived("table")
+        columns = [*STRING_COLUMNS, *NUMERIC_COLUMNS]
+        conn.executemany(f"INSERT INTO municipalities VALUES ({_placeholders(columns)}, ?)", (
+            (*[table.value(row, column) for column in columns], int(table.is_unit[row]))
+            for row in range(table.n_rows)
+        ))
+
+    @staticmethod
+    def _dx_cell(matrix, row: int, col: int):
+        value = matrix.values[col * matrix.n_rows + row]
+        original = matrix.decode(row, col, value)
+        return (
+            None if math.isnan(value) else value,
+            original if isinstance(original, str) else None,
+        )
+
+    def search(
+        self,
+        population_min: Optional[int] = None,
+        population_max: Optional[int] = None,
+        prefecture: Optional[List[str]] = None,
+        jichitai_type: Optional[List[str]] = None,
+        financial_capability_min: Optional[float] = None,
+        sort_by: str = "population",
+        sort_order: str = "desc",
+        limit: Optional[int] = None
+    ) -> Dict:
+        """search_jichitai_by_criteria as a single indexed SQL query"""
+        use_finance = financial_capability_min is not None or sort_by == "financial_capability"
+        conditions = ["p.total IS NOT NULL"]
+        params: List = []
+        if population_min is not None:
+            conditions.append("p.total >= ?")
+            params.append(population_min)
+        if population_max is not None:
+            conditions.append("p.total <= ?")
+            params.append(population_max)
+        if prefecture:
+            conditions.append(f"p.prefecture IN ({_placeholders(prefecture)})")
+            params.extend(prefecture)
+        if jichitai_type:
+            conditions.append(f"c.jichitai_type IN ({_placeholders(jichitai_type)})")
+            params.extend(jichitai_type)
+        if financial_capability_min is not None:
+            conditions.append("f.financial_capability_index >= ?")
+            params.append(financial_capability_min)
+
+        direction = "DESC" if sort_order == "desc" else "ASC"
+        if sort_by == "population":
+            order = f"COALESCE(p.total, 0) {direction}, p.rowid"
+        elif sort_by == "financial_capability":
+            order = f"COALESCE(f.financial_capability_index, 0) {direction}, p.rowid"
+        else:
+            order = "p.rowid"
+
+        sql = f"""
+            SELECT p.jichitai_code, p.municipality, p.prefecture, c.jichitai_type, p.total,
+                   {"f.financial_capability_index" if use_finance else "NULL"},
+                   COUNT(*) OVER ()
+            FROM population p
+            LEFT JOIN codes c ON c.jichitai_code = p.jichitai_code
+            LEFT JOIN finance f ON f.jichitai_code = p.jichitai_code
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {order}
+        """
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        results = [
+            {
+                "jichitai_code": code,
+                "jichitai_name": name,
+                "prefecture": pref,
+                "jichitai_type": muni_type,
+                "population": population,
+                "financial_capability_index": fin_cap_index,
+            }
+            for code, name, pref, muni_type, population, fin_cap_index, _ in rows
+        ]
+        return {
+            "jichitai_list": results,
+            "total_count": rows[0][-1] if rows else 0,
+            "filtered_count": len(results),
+        }
+
+    def query(self, sql: str, params: Optional[Sequence] = None, limit: int = 1000) -> Dict:
+        """
+        Run one read-only SQL statement
+
+        Args:
+            sql: A single SELECT (or other read-only) statement
+            params: Positional parameters for ? placeholders
+            limit: Maximum number of rows to return
+
+        Returns:
+            Dictionary with column names and rows
+        """
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(sql, params or [])
+            columns = [d[0] for d in cursor.description or []]
+            rows = cursor.fetchmany(limit + 1)
+        return {
+            "columns": columns,
+            "rows": [list(row) for row in rows[:limit]],
+            "row_count": min(len(rows), limit),
+            "truncated": len(rows) > limit,
+        }
@@ -0,0 +1,171 @@
+"""Joined, column-oriented table of every per-municipality metric"""
+import math
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from .codes_parser import jichitai_type_of, name_resolver
+from .age_pyramids import DEMOGRAPHIC_COLUMNS, demographic_indices
+
+
+STRING_COLUMNS = ["jichitai_code", "jichitai_name", "prefecture", "jichitai_type"]
+
+FINANCE_COLUMNS = [
+    "financial_capability_index", "current_balance_ratio",
+    "real_debt_service_ratio", "future_burden_ratio", "laspeyres_index",
+]
+
+NUMERIC_COLUMNS = [
+    "population_total", "population_male", "population_female", "households",
+    "transfer_in_total", "births",
+    *FINANCE_COLUMNS,
+    "mynumber_population", "mynumber_issued_cards", "mynumber_card_issuance_rate",
+    "age_population_total", "youth_population", "working_age_population", "elderly_population",
+    "youth_ratio", "working_age_ratio", "elderly_ratio",
+    *DEMOGRAPHIC_COLUMNS,
+]
+
+# Counts returned as int rather than float
+INTEGER_COLUMNS = {
+    "population_total", "population_male", "population_female", "households",
+    "transfer_in_total", "births",
+    "mynumber_population", "mynumber_issued_cards",
+    "age_population_total", "youth_population", "working_age_population", "elderly_population",
+    "late_elderly_population",
+}
+
+
+def _number(val) -> float:
+    """Cell value as float, NaN for blanks and markers like '-'"""
+    if val is None or isinstance(val, bool):
+        return math.nan
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        return math.nan
+
+
+def is_designated_ward(name: Optional[str]) -> bool:
+    """Ward of a designated city (e.g. '札幌市中央区'), counted within its city"""
+    return bool(name) and "市" in name and name.endswith("区")
+
+
+class MunicipalityTable:
+    """
+    One row per municipality, one array per metric
+
+    Rows come from the code list, plus any municipality that only appears
+    in population or finance data (e.g. wards of designated cities).
+    Numeric columns are array('d') with NaN for missing values, so whole
+    columns can be scanned without touching per-record dictionaries.
+
+    `is_unit` marks rows that partition a prefecture (municipalities and
+    Tokyo special wards, not designated-city wards or the 特別区部 total),
+    which is what sums and weighted means must be computed over.
+    """
+
+    def __init__(self, codes: List[str]):
+        self.codes = codes
+        self.row_of = {code: row for row, code in enumerate(codes)}
+        self.n_rows = len(codes)
+        self.strings: Dict[str, List[Optional[str]]] = {
+            column: [None] * self.n_rows for column in STRING_COLUMNS
+        }
+        self.strings["jichitai_code"] = list(codes)
+        self.numeric: Dict[str, array] = {
+            column: array("d", [math.nan]) * self.n_rows for column in NUMERIC_COLUMNS
+        }
+        self.is_unit: List[bool] = [True] * self.n_rows
+
+    @property
+    def columns(self) -> List[str]:
+        """All column names (strings first)"""
+        return [*self.strings, *self.numeric]
+
+    def value(self, row: int, column: str):
+        """Single value in JSON-friendly form (None for missing)"""
+        if column in self.strings:
+            return self.strings[column][row]
+        value = self.numeric[column][row]
+        if math.isnan(value):
+            return None
+        if column in INTEGER_COLUMNS:
+            return int(value)
+        return value
+
+    def row_dict(self, row: int, columns: Optional[Iterable[str]] = None) -> Dict:
+        """One row as {column: value}"""
+        return {column: self.value(row, column) for column in (columns or self.columns)}
+
+
+def build_table(dataset) -> MunicipalityTable:
+    """Join codes, population, finance, My Number and age data by jichitai_code"""
+    code_records = [r for r in dataset.records("codes") if r["municipality"] is not None]
+    population_by_code = dataset.derived("population_by_code")
+    finance_by_code = dataset.derived("finance_by_code")
+    pyramids = dataset.derived("age_pyramids")
+
+    codes = [r["jichitai_code"] for r in code_records]
+    seen = set(codes)
+    for extra in (population_by_code, finance_by_code):
+        for code in extra:
+            if code not in seen:
+                seen.add(code)
+                codes.append(code)
+
+    table = MunicipalityTable(codes)
+    names = table.strings["jichitai_name"]
+    prefectures = table.strings["prefecture"]
+    types = table.strings["jichitai_type"]
+    col = table.numeric
+
+    for record in code_records:
+        row = table.row_of[record["jichitai_code"]]
+        names[row] = record["municipality"]
+        prefectures[row] = record["prefecture"]
+        types[row] = record["jichitai_type"]
+
+    for code, record in population_by_code.items():
+        row = table.row_of[code]
+        if names[row] is None:
+            names[row] = record["municipality"]
+            prefectures[row] = record["prefecture"]
+            types[row] = jichitai_type_of(record["municipality"])
+        col["population_total"][row] = _number(record["population"]["total"])
+        col["population_male"][row] = _number(record["population"]["male"])
+        col["population_female"][row] = _number(record["population"]["female"])
+        col["households"][row] = _number(record["households"])
+        col["transfer_in_total"][row] = _number(record["population_dynamics"]["transfer_in_total"])
+        col["births"][row] = _number(record["population_dynamics"]["births"])
+
+    for code, record in finance_by_code.items():
+        row = table.row_of[code]
+        if names[row] is None:
+            names[row] = record["municipality_name"]
+            prefectures[row] = record["prefecture_name"]
+            types[row] = jichitai_type_of(record["municipality_name"])
+        for column in FINANCE_COLUMNS:
+            col[column][row] = _number(record["finance"].get(column))
+
+    resolve = name_resolver(code_records)
+    for record in dataset.records("mynumber"):
+        row = table.row_of.get(resolve(record["municipality"], record["prefecture"]))
+        if row is None or not math.isnan(col["mynumber_population"][row]):
+            continue
+        card = record["mynumber_card"]
+        col["mynumber_population"][row] = _number(card["population"])
+        col["mynumber_issued_cards"][row] = _number(card["issued_cards"])
+        col["mynumber_card_issuance_rate"][row] = _number(card["issuance_rate"])
+
+    indices = demographic_indices(pyramids)
+    for age_row, code in enumerate(pyramids.codes):
+        row = table.row_of.get(code)
+        if row is None:
+            continue
+        for column, values in indices.items():
+            col[column][row] = values[age_row]
+
+    table.is_unit = [
+        not is_designated_ward(name) and name != "特別区部"
+        for name in names
+    ]
+    return table
@@ -0,0 +1,252 @@
+"""Multi-vintage time-series storage for population, finance and My Number data"""
+import math
+import re
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .population_parser import PopulationParser
+from .finance_parser import FinanceParser
+from .mynumber_parser import MyNumberParser
+from .codes_parser import name_resolver
+
+
+# Vintage files per source, relative to the data directory. The leading
+# "rNN" (Reiwa year, optionally "_MM" for month) is the vintage label.
+SERIES_PATTERNS = {
+    "population": "population/r*_municipal_population.xlsx",
+    "finance": "finance/r*_finance_all_municipalities.xlsx",
+    "mynumber": "mynumber/r*_mynumber_card_rate.xlsx",
+}
+
+SERIES_PARSERS = {
+    "population": PopulationParser,
+    "finance": FinanceParser,
+    "mynumber": MyNumberParser,
+}
+
+# get_time_series modes: values per vintage, or changes between consecutive vintages
+SERIES_MODES = ("series", "delta")
+
+_VINTAGE_RE = re.compile(r"^(r\d{2}(?:_\d{2})?)_")
+
+
+def vintage_of(file_name: str) -> Optional[str]:
+    """Vintage label of a source file name (e.g. 'r06'), or None"""
+    match = _VINTAGE_RE.match(file_name)
+    return match.group(1) if match else None
+
+
+def header_vintage(parser) -> Optional[str]:
+    """Vintage label from a file's contents, for parsers that can read one"""
+    vintage = getattr(parser, "vintage", None)
+    return vintage() if vintage is not None else None
+
+
+def _number(val) -> Optional[float]:
+    """Numeric cell value as float, None for blanks and markers like '-'"""
+    if val is None or isinstance(val, bool):
+        return None
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        return None
+
+
+# Metric extractors per source: metric name -> record -> value
+SERIES_METRICS: Dict[str, Dict[str, Callable[[Dict], object]]] = {
+    "population": {
+        "population_total": lambda r: r["population"]["total"],
+        "population_male": lambda r: r["population"]["male"],
+        "population_female": lambda r: r["population"]["female"],
+        "households": lambda r: r["households"],
+        "transfer_in_total": lambda r: r["population_dynamics"]["transfer_in_total"],
+        "births": lambda r: r["population_dynamics"]["births"],
+    },
+    "finance": {
+        key: (lambda k: lambda r: r["finance"][k])(key)
+        for key in (
+            "financial_capability_index", "current_balance_ratio",
+            "real_debt_service_ratio", "future_burden_ratio", "laspeyres_index",
+        )
+    },
+    "mynumber": {
+        "mynumber_population": lambda r: r["mynumber_card"]["population"],
+        "issued_cards": lambda r: r["mynumber_card"]["issued_cards"],
+        "issuance_rate": lambda r: r["mynumber_card"]["issuance_rate"],
+    },
+}
+
+
+class VintageParser:
+    """Parse the past vintages of the sources that support time series"""
+
+    def __init__(self, files: List[Tuple[str, str]]):
+        """
+        Args:
+            files: (source, file path) pairs
+        """
+        self.files = files
+
+    def parse(self) -> List[Dict]:
+        """
+        Parse every vintage file
+
+        Returns:
+            One entry per file: source, vintage label and the parsed records
+        """
+        results = []
+        for source, path in self.files:
+            parser = SERIES_PARSERS[source](path)
+            try:
+                vintage = vintage_of(Path(path).name) or header_vintage(parser)
+                if vintage is None:
+                    continue
+                records = parser.parse()
+            finally:
+                parser.close()
+            results.append({
+                "source": source,
+                "vintage": vintage,
+                "records": records,
+            })
+        return results
+
+    def close(self):
+        """Nothing is held open between parses"""
+
+
+class SeriesTable:
+    """
+    One source across several vintages, stored column-wise
+
+    Rows are municipalities (union over all vintages), and each metric
+    holds one float array per vintage with NaN where the municipality is
+    absent or the value is not available. Name and prefecture are stored
+    once per row; a vintage only gets its own entry if it differs.
+    """
+
+    def __init__(self, source: str, vintages: List[str]):
+        self.source = source
+        self.vintages = vintages
+        self.codes: List[str] = []
+        self.row_of: Dict[str, int] = {}
+        self.names: List[Optional[str]] = []
+        self.prefectures: List[Optional[str]] = []
+        self.name_history: Dict[int, Dict[str, str]] = {}
+        self.columns: Dict[str, List[array]] = {
+            metric: [] for metric in SERIES_METRICS[source]
+        }
+
+    def _add_row(self, code: str, name: Optional[str], prefecture: Optional[str]) -> int:
+        row = len(self.codes)
+        self.codes.append(code)
+        self.row_of[code] = row
+        self.names.append(name)
+        self.prefectures.append(prefecture)
+        return row
+
+    def series(self, code: str, metric: str) -> Optional[List[Optional[float]]]:
+        """Values of one metric over all vintages (None where missing)"""
+        row = self.row_of.get(code)
+        if row is None:
+            return None
+        return [None if math.isnan(col[row]) else col[row] for col in self.columns[metric]]
+
+
+def _record_key(source: str, record: Dict, codes_lookup: Callable) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """(jichitai_code, name, prefecture) of a record from any series source"""
+    if source == "population":
+        return record["jichitai_code"], record["municipality"], record["prefecture"]
+    if source == "finance":
+        return record["jichitai_code"], record["municipality_name"], record["prefecture_name"]
+    name, prefecture = record["municipality"], record["prefecture"]
+    return codes_lookup(name, prefecture), name, prefecture
+
+
+def build_series_table(
+    source: str,
+    vintages: List[Tuple[str, List[Dict]]],
+    codes_lookup: Callable
+) -> SeriesTable:
+    """
+    Build a SeriesTable from (vintage, records) pairs
+
+    Args:
+        source: 'population', 'finance' or 'mynumber'
+        vintages: (vintage label, parsed records), in any order
+        codes_lookup: Resolver used for sources without codes
+
+    Returns:
+        SeriesTable with vintages sorted oldest first
+    """
+    vintages = sorted(vintages, key=lambda v: v[0])
+    table = SeriesTable(source, [label for label, _ in vintages])
+    metrics = SERIES_METRICS[source]
+
+    # Collect rows first so every column can be allocated at full length
+    keyed = []
+    for label, records in vintages:
+        rows = {}
+        for record in records:
+            code, name, prefecture = _record_key(source, record, codes_lookup)
+            if not code or code in rows:
+                continue
+            row = table.row_of.get(code)
+            if row is None:
+                row = table._add_row(code, name, prefecture)
+            rows[code] = (row, record)
+
+            # Later vintages win for static attributes; keep older names as history
+            if name and table.names[row] != name:
+                history = table.name_history.setdefault(row, {})
+                for past_label, _ in keyed:
+                    history.setdefault(past_label, table.names[row])
+                table.names[row] = name
+            if prefecture:
+                table.prefectures[row] = prefecture
+        keyed.append((label, rows))
+
+    n_rows = len(table.codes)
+    for label, rows in keyed:
+        for metric, extract in metrics.items():
+            column = array("d", [math.nan]) * n_rows
+            for row, record in rows.values():
+                value = _number(extract(record))
+                if value is not None:
+                    column[row] = value
+            table.columns[metric].append(column)
+
+    return table
+
+
+def build_time_series(dataset) -> Dict[str, SeriesTable]:
+    """
+    Build one SeriesTable per source from the current and past vintages
+
+    The current file of each source (already parsed for the main dataset)
+    is reused as its own vintage if its name carries a vintage label. A
+    current file without one (mynumber_card_rate.xlsx) is parsed as part
+    of the series source, labelled with the as-of date of its sheet
+    titles, and left out if it has none.
+    """
+    grouped: Dict[str, List[Tuple[str, List[Dict]]]] = {source: [] for source in SERIES_PATTERNS}
+
+    for entry in dataset.records("series"):
+        vintages = grouped[entry["source"]]
+        if entry["vintage"] and entry["vintage"] not in {v for v, _ in vintages}:
+            vintages.append((entry["vintage"], entry["records"]))
+
+    for source in SERIES_PATTERNS:
+        fingerprint = dataset.fingerprint(source)
+        if dataset.has(source) and fingerprint:
+            label = vintage_of(fingerprint[0][0])
+            if label and label not in {v for v, _ in grouped[source]}:
+                grouped[source].append((label, dataset.records(source)))
+
+    codes_lookup = name_resolver(dataset.records("codes"))
+    return {
+        source: build_series_table(source, vintages, codes_lookup)
+        for source, vintages in grouped.items()
+        if vintages
+    }
@@ -0,0 +1,59 @@
+"""Background watcher that hot-reloads changed source files"""
+import logging
+import threading
+from typing import Dict, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class SourceWatcher(threading.Thread):
+    """
+    Poll the source files of a DataManager and reload the ones that changed
+
+    A change is only acted on once the file fingerprint has been stable for
+    one full poll interval, so a workbook that is still being copied into
+    place is not ingested half-written.
+    """
+
+    def __init__(self, data_manager, interval: float = 60.0):
+        super().__init__(name="jichitai-source-watcher", daemon=True)
+        self.data_manager = data_manager
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._pending: Dict[str, Tuple] = {}
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Source reload failed; keeping current dataset")
+
+    def poll(self) -> bool:
+        """
+        Check source files once and reload sources whose change has settled
+
+        Returns:
+            True if a new dataset version was swapped in
+        """
+        changed = self.data_manager.changed_sources()
+
+        settled = [
+            source for source, fingerprint in changed.items()
+            if self._pending.get(source) == fingerprint
+        ]
+        self._pending = {
+            source: fingerprint for source, fingerprint in changed.items()
+            if source not in settled
+        }
+
+        if not settled:
+            return False
+
+        logger.info("Reloading changed sources: %s", ", ".join(settled))
+        return self.data_manager.reload(settled) is not None
+
+    def stop(self):
+        """Stop polling (does not wait for the thread to exit)"""
+        self._stop_event.set()
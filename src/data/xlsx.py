@@ -0,0 +1,44 @@
+"""Streaming access to source workbooks"""
+import sys
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+
+
+def read_rows(
+    file_path: Union[str, Path],
+    sheet: Optional[str] = None,
+    min_row: int = 1,
+    width: int = 0
+) -> Iterator[Tuple]:
+    """
+    Cell values of every row, read in streaming mode
+
+    The workbook is opened read-only, so openpyxl never builds its cell
+    graph, and it is closed as soon as the last row has been read. Nothing
+    of the workbook outlives parsing.
+
+    Args:
+        file_path: Excel file
+        sheet: Sheet name (default, or if missing: the first sheet)
+        min_row: First row to return (1-based)
+        width: Pad shorter rows with None up to this many columns
+    """
+    # Imported here so that serving from a snapshot never loads openpyxl
+    import openpyxl
+
+    wb = openpyxl.load_workbook(str(file_path), read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet in wb.sheetnames else wb.worksheets[0]
+        # Some published files declare a wrong sheet size; read to the real end
+        ws.reset_dimensions()
+        for row in ws.iter_rows(min_row=min_row, values_only=True):
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            yield row
+    finally:
+        wb.close()
+
+
+def intern(value):
+    """Share one copy of frequently repeated strings (prefectures, types, codes)"""
+    return sys.intern(value) if isinstance(value, str) else value
@@ -1,16 +1,132 @@
 """MCP Server for Japanese Municipality Basic Information"""
 import asyncio
+import contextlib
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
 
 from .data.data_manager import DataManager
+from .data.cancellation import CallBudget, CallCancelled, DeadlineExceeded, budget_scope
 
 
-# Initialize data manager
-data_manager = DataManager()
+# Initialize data manager. Nothing is parsed until the first tool call.
+# JICHITAI_SNAPSHOT_PATH serves from a prebuilt snapshot (no xlsx parsing, no openpyxl),
+# JICHITAI_SQLITE_PATH enables the SQLite backend.
+data_manager = DataManager(
+    sqlite_path=os.environ.get("JICHITAI_SQLITE_PATH") or None,
+    snapshot_path=os.environ.get("JICHITAI_SNAPSHOT_PATH") or None,
+)
+
+# Seconds between checks for updated source files (0 disables hot reload)
+RELOAD_INTERVAL = float(os.environ.get("JICHITAI_RELOAD_INTERVAL", "60"))
+
+# "stdio" (one client per process) or "http" (streamable HTTP, many clients per process)
+TRANSPORT = os.environ.get("JICHITAI_TRANSPORT", "stdio")
+HTTP_HOST = os.environ.get("JICHITAI_HTTP_HOST", "127.0.0.1")
+HTTP_PORT = int(os.environ.get("JICHITAI_HTTP_PORT", "8000"))
+
+# Threads that run tool calls, so concurrent clients do not wait on each other
+WORKERS = int(os.environ.get("JICHITAI_WORKERS", "4"))
+
+# Seconds in-flight requests get to finish after a shutdown signal
+SHUTDOWN_TIMEOUT = float(os.environ.get("JICHITAI_SHUTDOWN_TIMEOUT", "30"))
+
+
+def parse_timeouts(spec: str) -> dict[str, float]:
+    """Per-tool timeouts from "tool=seconds,tool=seconds" """
+    timeouts = {}
+    for item in spec.split(","):
+        name, sep, seconds = item.partition("=")
+        if sep:
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
+# Seconds a tool call may run before it is aborted with a timeout error (0 disables).
+# JICHITAI_TOOL_TIMEOUTS overrides it per tool, e.g. "export_all_municipalities_csv=900,query_municipalities=10".
+TOOL_TIMEOUT = float(os.environ.get("JICHITAI_TOOL_TIMEOUT", "60"))
+TOOL_TIMEOUTS = {
+    "export_all_municipalities_csv": 600.0,
+    **parse_timeouts(os.environ.get("JICHITAI_TOOL_TIMEOUTS", "")),
+}
+
+
+def tool_timeout(name: str) -> float:
+    return TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT)
+
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="jichitai-tool")
+
+
+class InFlightCall:
+    """A running tool call, its budget and the number of callers awaiting it"""
+
+    def __init__(self, future: asyncio.Future, budget: CallBudget):
+        self.future = future
+        self.budget = budget
+        self.waiters = 0
+
+
+# Tool calls currently running, by call_key. Identical concurrent calls await the same future.
+in_flight: dict[str, InFlightCall] = {}
+
+# Centre and filter arguments shared by the radius and nearest searches
+SPATIAL_PROPERTIES = {
+    "jichitai_code": {
+        "type": "string",
+        "description": "6-digit code of the centre municipality (its office location is used)",
+    },
+    "jichitai_name": {
+        "type": "string",
+        "description": "Name of the centre municipality (e.g., '横浜市')",
+    },
+    "prefecture": {
+        "type": "string",
+        "description": "Prefecture name for disambiguation of jichitai_name",
+    },
+    "latitude": {
+        "type": "number",
+        "minimum": -90,
+        "maximum": 90,
+        "description": "Latitude of the centre in degrees (with longitude, instead of a municipality)",
+    },
+    "longitude": {
+        "type": "number",
+        "minimum": -180,
+        "maximum": 180,
+        "description": "Longitude of the centre in degrees",
+    },
+    "target_prefecture": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Only return municipalities in these prefectures",
+    },
+    "target_jichitai_type": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Only return municipalities of these types (e.g., ['市'])",
+    },
+    "population_min": {
+        "type": "number",
+        "description": "Minimum population",
+    },
+    "population_max": {
+        "type": "number",
+        "description": "Maximum population",
+    },
+    "financial_capability_min": {
+        "type": "number",
+        "description": "Minimum financial capability index",
+    },
+    "where": {
+        "type": "object",
+        "description": "Additional query_municipalities predicate (e.g., {'field': 'elderly_ratio', 'op': '>=', 'value': 35})",
+    },
+}
 
 # Create MCP server
 app = Server("jichitai-basic-information-server")
@@ -43,6 +159,14 @@ async def list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "Prefecture name for disambiguation (e.g., '北海道', '神奈川県')",
                     },
+                    "include_ranks": {
+                        "type": "boolean",
+                        "description": (
+                            "Also return, for every metric, the rank (1 = largest), group size and percentile "
+                            "nationally, within the prefecture and within the municipality type (default: false)"
+                        ),
+                        "default": False,
+                    },
                 },
             },
         ),
@@ -176,6 +300,52 @@ async def list_tools() -> list[Tool]:
                 },
             },
         ),
+        Tool(
+            name="get_dx_leaderboard",
+            description=(
+                "Rank all municipalities on one DX indicator or online procedure and aggregate by prefecture or type. "
+                "Returns the ranking plus national and per-group mean, median, min, max and coverage. "
+                "Flag indicators ('実施'/'未実施') are ranked as 1/0, percentages as numbers. "
+                "Data source: デジタル庁「自治体DX推進状況ダッシュボード」2024.7.12更新, 15指標+52手続, 1,742自治体."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "indicator": {
+                        "type": "string",
+                        "description": "DX indicator or online procedure name (e.g., 'AIの導入状況', '転入届')",
+                    },
+                    "prefecture": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of prefecture names to restrict the ranking to",
+                    },
+                    "jichitai_type": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of municipality types to restrict the ranking to (e.g., ['市'])",
+                    },
+                    "group_by": {
+                        "type": "string",
+                        "enum": ["prefecture", "jichitai_type"],
+                        "description": "Add aggregates per prefecture or municipality type",
+                    },
+                    "sort_order": {
+                        "type": "string",
+                        "enum": ["asc", "desc"],
+                        "description": "Sort order (default: 'desc')",
+                        "default": "desc",
+                    },
+                    "limit": {
+                        "type": ["number", "null"],
+                        "minimum": 1,
+                        "description": "Maximum number of ranked municipalities to return (default: 20, null: all)",
+                        "default": 20,
+                    },
+                },
+                "required": ["indicator"],
+            },
+        ),
         Tool(
             name="get_age_group_population",
             description=(
@@ -200,17 +370,396 @@ async def list_tools() -> list[Tool]:
                 },
             },
         ),
+        Tool(
+            name="get_age_pyramids",
+            description=(
+                "Get the age pyramids (21 five-year bands by gender) of many municipalities in one call, e.g. every "
+                "municipality of a prefecture, as compact nested arrays: populations[municipality][gender][band]. "
+                "Use share=true to compare shapes across municipalities of different sizes."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "jichitai_codes": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "6-digit municipality codes",
+                    },
+                    "prefecture": {
+                        "type": "string",
+                        "description": "Return every municipality of this prefecture (when no codes are given)",
+                    },
+                    "genders": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": ["計", "男", "女"]},
+                        "description": "Genders to return (default: ['男', '女'])",
+                    },
+                    "share": {
+                        "type": "boolean",
+                        "description": "Return % of each municipality's total population instead of head counts (default: false)",
+                        "default": False,
+                    },
+                },
+            },
+        ),
+        Tool(
+            name="get_prefecture_summary",
+            description=(
+                "Get prefecture-level or national aggregates of all municipality metrics: "
+                "population and household sums, population-weighted finance indicators, "
+                "My Number Card issuance rate and age structure ratios. "
+                "Designated-city wards are not double counted."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "prefecture": {
+                        "type": "string",
+                        "description": "Prefecture name (e.g., '神奈川県') or '全国'. Omit to get the national total and all prefectures",
+                    },
+                },
+            },
+        ),
+        Tool(
+            name="get_data_coverage",
+            description=(
+                "Check which data sources (codes, population, finance, mynumber, age_group, dx) have data for a "
+                "municipality, or get per-source coverage counts for all municipalities or one prefecture. "
+                "Use it to skip calls that would return no data. Coverage can also be filtered in "
+                "query_municipalities with fields like 'has:finance' (1/0)."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "jichitai_code": {
+                        "type": "string",
+                        "description": "6-digit municipality code (e.g., '142018' for Yokosuka)",
+                    },
+                    "jichitai_name": {
+                        "type": "string",
+                        "description": "Municipality name (e.g., '横須賀市')",
+                    },
+                    "prefecture": {
+                        "type": "string",
+                        "description": "Prefecture name: disambiguates jichitai_name, or restricts the summary",
+                    },
+                },
+            },
+        ),
+        Tool(
+            name="resolve_jichitai_identifiers",
+            description=(
+                "Resolve many municipality codes or names at once, including retired ones from past mergers "
+                "(e.g., '大野町' → 北斗市). Each identifier gets a status: current, redirected (with the merger "
+                "record), ambiguous (with candidates) or not_found. Other tools redirect retired identifiers "
+                "automatically and report it under 'redirect'."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "identifiers": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "6-digit municipality codes or municipality names",
+                    },
+                    "prefecture": {
+                        "type": "string",
+                        "description": "Prefecture name to disambiguate names",
+                    },
+                },
+                "required": ["identifiers"],
+            },
+        ),
+        Tool(
+            name="find_similar_municipalities",
+            description=(
+                "Find the municipalities whose profile is most similar to a given municipality "
+                "(k-nearest neighbours over standardized features: population and households on a log scale, "
+                "age structure ratios, finance indicators and My Number Card issuance rate). "
+                "Features can be weighted and results restricted by prefecture or municipality type."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "jichitai_code": {
+                        "type": "string",
+                        "description": "6-digit municipality code (e.g., '142018' for Yokosuka)",
+                    },
+                    "jichitai_name": {
+                        "type": "string",
+                        "description": "Municipality name (e.g., '横須賀市')",
+                    },
+                    "prefecture": {
+                        "type": "string",
+                        "description": "Prefecture name for disambiguation (e.g., '神奈川県')",
+                    },
+                    "k": {
+                        "type": "number",
+                        "minimum": 1,
+                        "description": "Number of similar municipalities to return (default: 10)",
+                        "default": 10,
+                    },
+                    "weights": {
+                        "type": "object",
+                        "additionalProperties": {"type": "number", "minimum": 0},
+                        "description": (
+                            "Feature weights (default 1.0, 0 ignores a feature). Features: population_total, households, "
+                            "youth_ratio, working_age_ratio, elderly_ratio, financial_capability_index, "
+                            "current_balance_ratio, real_debt_service_ratio, future_burden_ratio, laspeyres_index, "
+                            "mynumber_card_issuance_rate"
+                        ),
+                    },
+                    "target_prefecture": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Only return municipalities in these prefectures",
+                    },
+                    "target_jichitai_type": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Only return municipalities of these types (e.g., ['市'])",
+                    },
+                },
+            },
+        ),
+        Tool(
+            name="find_municipalities_within_radius",
+            description=(
+                "Find municipalities whose office lies within a radius (great-circle km) of a municipality's "
+                "office or a latitude/longitude, sorted by distance. Combine with population, finance, "
+                "prefecture and type filters or any query_municipalities predicate. "
+                "Requires the optional office coordinates file."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "radius_km": {
+                        "type": "number",
+                        "exclusiveMinimum": 0,
+                        "description": "Radius in km (e.g., 30)",
+                    },
+                    **SPATIAL_PROPERTIES,
+                    "limit": {
+                        "type": "number",
+                        "minimum": 1,
+                        "description": "Maximum number of results",
+                    },
+                },
+                "required": ["radius_km"],
+            },
+        ),
+        Tool(
+            name="find_nearest_municipalities",
+            description=(
+                "Find the k municipalities whose offices are closest to a municipality's office or a "
+                "latitude/longitude, with distances in km. Accepts the same filters as "
+                "find_municipalities_within_radius. Requires the optional office coordinates file."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "k": {
+                        "type": "number",
+                        "minimum": 1,
+                        "description": "Number of municipalities to return (default: 10)",
+                        "default": 10,
+                    },
+                    **SPATIAL_PROPERTIES,
+                },
+            },
+        ),
+        Tool(
+            name="query_municipalities",
+            description=(
+                "Filter and sort all municipalities with structured predicates over any metric: population, households, "
+                "the five finance indicators, My Number Card issuance rate, age structure ratios, demographic indices "
+                "(late_elderly_ratio, young/old/total_dependency_ratio, aging_index, median_age, sex_ratio), "
+                "DX indicators / online procedures (as 'dx:<name>', e.g. 'dx:転入届'; '実施'/'未実施' are 1/0), "
+                "age band populations (as 'age:0-4歳', or 'age:男:0-4歳' / 'age:女:0-4歳' by gender), "
+                "males per 100 females in a band (as 'sex_ratio:65-69歳') "
+                "and source coverage flags (as 'has:<source>', 1/0). "
+                "Leaf predicate: {\"field\", \"op\", \"value\"} with op one of =, !=, <, <=, >, >=, between, in, is_null, not_null. "
+                "Combine with {\"and\": [...]}, {\"or\": [...]}, {\"not\": {...}}."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "where": {
+                        "type": "object",
+                        "description": (
+                            "Predicate tree, e.g. {\"and\": [{\"field\": \"elderly_ratio\", \"op\": \">=\", \"value\": 35}, "
+                            "{\"field\": \"financial_capability_index\", \"op\": \"between\", \"value\": [0.3, 0.5]}]}"
+                        ),
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Fields to return (default: code, name, prefecture, type and every field used in the query)",
+                    },
+                    "sort_by": {
+                        "type": "string",
+                        "description": "Field to sort by (missing values last)",
+                    },
+                    "sort_order": {
+                        "type": "string",
+                        "enum": ["asc", "desc"],
+                        "description": "Sort order (default: 'desc')",
+                        "default": "desc",
+                    },
+                    "limit": {
+                        "type": ["number", "null"],
+                        "minimum": 1,
+                        "description": "Maximum number of results (default: 50, null: all)",
+                        "default": 50,
+                    },
+                    "units_only": {
+                        "type": "boolean",
+                        "description": "Exclude wards of designated cities (default: false)",
+                        "default": False,
+                    },
+                },
+            },
+        ),
+        Tool(
+            name="describe_metric",
+            description=(
+                "Get the distribution of any numeric metric across municipalities without downloading them: "
+                "count, mean, standard deviation, min/max, quantiles (p5-p95) and a histogram with equal-width "
+                "('fixed') or equal-count ('quantile') bins. Optionally per prefecture or municipality type, "
+                "and restricted by a query_municipalities predicate. Fields are the query_municipalities ones."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "field": {
+                        "type": "string",
+                        "description": "Numeric field (e.g., 'financial_capability_index', 'elderly_ratio', 'dx:転入届')",
+                    },
+                    "group_by": {
+                        "type": "string",
+                        "enum": ["prefecture", "jichitai_type"],
+                        "description": "Also return statistics for each prefecture or municipality type",
+                    },
+                    "bins": {
+                        "type": "number",
+                        "description": "Number of histogram bins (1-100, default: 10)",
+                        "default": 10,
+                    },
+                    "binning": {
+                        "type": "string",
+                        "enum": ["fixed", "quantile"],
+                        "description": "Equal-width (fixed) or equal-count (quantile) bins (default: fixed)",
+                        "default": "fixed",
+                    },
+                    "where": {
+                        "type": "object",
+                        "description": "query_municipalities predicate restricting the municipalities described",
+                    },
+                    "units_only": {
+                        "type": "boolean",
+                        "description": "Exclude designated-city wards and the 特別区部 total (default: true)",
+                        "default": True,
+                    },
+                },
+                "required": ["field"],
+            },
+        ),
+        Tool(
+            name="run_sql_query",
+            description=(
+                "Run a read-only SQL query (SQLite) over all loaded data. "
+                "Only available when the server is started with JICHITAI_SQLITE_PATH. "
+                "Tables: municipalities (joined per-municipality metrics: population_total, households, "
+                "finance indicators, mynumber_card_issuance_rate, youth/working_age/elderly ratios, is_unit), "
+                "codes, population, finance, mynumber, age_groups (long format: jichitai_code, gender, age_group, band, population), "
+                "dx_values (category, indicator, jichitai_name, jichitai_code, value, raw_value)."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "sql": {
+                        "type": "string",
+                        "description": "A single SELECT statement (e.g., 'SELECT prefecture, AVG(elderly_ratio) FROM municipalities WHERE is_unit GROUP BY prefecture')",
+                    },
+                    "params": {
+                        "type": "array",
+                        "description": "Positional parameters for ? placeholders",
+                    },
+                    "limit": {
+                        "type": "number",
+                        "description": "Maximum number of rows to return (default: 1000)",
+                        "default": 1000,
+                    },
+                },
+                "required": ["sql"],
+            },
+        ),
+        Tool(
+            name="get_time_series",
+            description=(
+                "Get values across data vintages (fiscal years) for one or many municipalities, "
+                "as a series or as year-over-year changes. "
+                "Sources: population (住民基本台帳), finance (主要財政指標), mynumber (マイナンバーカード交付状況). "
+                "Vintages are the rNN_* files available under data/source; the current My Number Card "
+                "file is included under the as-of month in its sheet title (e.g. r07_08), or left out "
+                "if the title has none."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "source": {
+                        "type": "string",
+                        "enum": ["population", "finance", "mynumber"],
+                        "description": "Data source (default: 'population')",
+                        "default": "population",
+                    },
+                    "jichitai_codes": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of 6-digit municipality codes",
+                    },
+                    "jichitai_name": {
+                        "type": "string",
+                        "description": "Municipality name (used if jichitai_codes is not given)",
+                    },
+                    "prefecture": {
+                        "type": "string",
+                        "description": "Prefecture name; without codes or name, returns every municipality in it",
+                    },
+                    "metrics": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Metrics to return (e.g., ['population_total', 'households']); all if omitted",
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["series", "delta"],
+                        "description": "'series' for values per vintage, 'delta' for year-over-year changes (default: 'series')",
+                        "default": "series",
+                    },
+                },
+            },
+        ),
         Tool(
             name="export_all_municipalities_csv",
             description=(
                 "Export all municipalities data to CSV file. "
                 "Includes: basic info, population, finance, MyNumber Card rate, demographic summary. "
-                "CSV columns: jichitai_code, jichitai_name, prefecture, jichitai_type, "
+                "Default CSV columns: jichitai_code, jichitai_name, prefecture, jichitai_type, "
                 "population_total, population_male, population_female, households, "
                 "financial_capability_index, current_balance_ratio, real_debt_service_ratio, "
                 "future_burden_ratio, laspeyres_index, mynumber_card_issuance_rate, "
                 "youth_ratio, working_age_ratio, elderly_ratio. "
-                "Coverage: ~1,795 municipalities."
+                "Coverage: ~1,795 municipalities. "
+                "Optionally filter rows (same filters as search_jichitai_by_criteria, plus a query_municipalities "
+                "'where' predicate) and choose columns, including DX indicators ('dx:<name>') and age bands "
+                "('age:0-4歳', 'age:男:0-4歳', 'age:女:0-4歳'); filtered exports contain municipalities only, "
+                "without prefecture rows. "
+                "Set format='jsonl' for JSON Lines (without columns: one nested record per municipality with "
+                "population, finance, My Number Card, age groups and DX data) and compression='gzip' or 'zstd' "
+                "to compress while writing. "
+                "A manifest (<output_path>.manifest.json) records the data version and checksum; "
+                "if the data has not changed since the last export to the same path, the file is reused (unchanged: true)."
             ),
             inputSchema={
                 "type": "object",
@@ -219,6 +768,47 @@ async def list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "Path to save the CSV file (e.g., '/path/to/municipalities.csv')",
                     },
+                    "format": {
+                        "type": "string",
+                        "enum": ["csv", "jsonl"],
+                        "description": "Output format (default: csv)",
+                    },
+                    "compression": {
+                        "type": "string",
+                        "enum": ["gzip", "zstd"],
+                        "description": "Compress the output on the fly (default: none)",
+                    },
+                    "columns": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Columns to export, in order (any query_municipalities field)",
+                    },
+                    "prefecture": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of prefecture names (e.g., ['東京都', '神奈川県'])",
+                    },
+                    "jichitai_type": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of municipality types (e.g., ['市', '町'])",
+                    },
+                    "population_min": {
+                        "type": "integer",
+                        "description": "Minimum population",
+                    },
+                    "population_max": {
+                        "type": "integer",
+                        "description": "Maximum population",
+                    },
+                    "financial_capability_min": {
+                        "type": "number",
+                        "description": "Minimum financial capability index",
+                    },
+                    "where": {
+                        "type": "object",
+                        "description": "Additional predicate in the query_municipalities format",
+                    },
                 },
                 "required": ["output_path"],
             },
@@ -226,9 +816,77 @@ async def list_tools() -> list[Tool]:
     ]
 
 
+def call_key(name: str, arguments: Any) -> str:
+    """Canonical form of a tool call (argument order and whitespace do not matter)"""
+    return json.dumps([name, arguments or {}], sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    """Handle tool calls"""
+    """
+    Handle tool calls on the worker pool, keeping the event loop free for other clients
+
+    Calls identical to one already running are not executed again: they wait
+    for the running call and share its result (for exports, this also keeps
+    two calls from writing the same output_path at once).
+
+    Each call runs under a time budget (tool_timeout), counted from when a
+    worker has the dataset: time queued for a worker and the first (cold)
+    dataset load are not part of it. When the last caller waiting for it is
+    cancelled (MCP cancellation or a client that went away), the computation
+    is cancelled too and stops at its next checkpoint.
+    """
+    key = call_key(name, arguments)
+    call = in_flight.get(key)
+    if call is None:
+        budget = CallBudget(tool_timeout(name))
+        loop = asyncio.get_running_loop()
+        call = InFlightCall(loop.run_in_executor(executor, run_call, name, arguments, budget), budget)
+        in_flight[key] = call
+        call.future.add_done_callback(lambda done: in_flight.pop(key, None) if in_flight.get(key) is call else None)
+
+    call.waiters += 1
+    try:
+        # A cancelled caller must not cancel the computation the others are waiting for
+        return await asyncio.shield(call.future)
+    except asyncio.CancelledError:
+        if call.waiters == 1:
+            call.budget.cancel()
+            # A later identical call starts afresh instead of joining the cancelled one
+            if in_flight.get(key) is call:
+                del in_flight[key]
+        raise
+    finally:
+        call.waiters -= 1
+
+
+def run_call(name: str, arguments: Any, budget: CallBudget) -> list[TextContent]:
+    """Run dispatch_tool under a budget, turning an abort into a structured error"""
+    # The clock starts once the dataset is available: the lazy first load is
+    # shared by every call and cannot be interrupted, so it is not charged
+    # to the call that happened to trigger it
+    data_manager.dataset
+    budget.start()
+    with budget_scope(budget):
+        try:
+            # The call may have been cancelled while it was queued or loading
+            budget.check()
+            return dispatch_tool(name, arguments)
+        except DeadlineExceeded:
+            error = {
+                "error": "Tool call exceeded its time budget",
+                "error_type": "timeout",
+                "tool": name,
+                "timeout_seconds": budget.timeout,
+                "elapsed_seconds": round(budget.elapsed(), 3),
+            }
+        except CallCancelled:
+            error = {"error": "Tool call was cancelled", "error_type": "cancelled", "tool": name}
+    return [TextContent(type="text", text=json.dumps(error, ensure_ascii=False))]
+
+
+def dispatch_tool(name: str, arguments: Any) -> list[TextContent]:
+    """Run one tool call"""
 
     if name == "get_jichitai_basic_info":
         jichitai_code = arguments.get("jichitai_code")
@@ -238,7 +896,8 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
         result = data_manager.get_jichitai_basic_info(
             jichitai_code=jichitai_code,
             jichitai_name=jichitai_name,
-            prefecture=prefecture
+            prefecture=prefecture,
+            include_ranks=bool(arguments.get("include_ranks", False))
         )
 
         if result:
@@ -328,6 +987,18 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
                 "jichitai_name": jichitai_name
             }, ensure_ascii=False))]
 
+    elif name == "get_dx_leaderboard":
+        result = data_manager.get_dx_leaderboard(
+            indicator=arguments.get("indicator"),
+            prefecture=arguments.get("prefecture"),
+            jichitai_type=arguments.get("jichitai_type"),
+            group_by=arguments.get("group_by"),
+            sort_order=arguments.get("sort_order", "desc"),
+            limit=arguments.get("limit", 20)
+        )
+
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+
     elif name == "get_age_group_population":
         jichitai_code = arguments.get("jichitai_code")
         jichitai_name = arguments.get("jichitai_name")
@@ -348,11 +1019,173 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
                 "jichitai_name": jichitai_name
             }, ensure_ascii=False))]
 
+    elif name == "get_age_pyramids":
+        result = data_manager.get_age_pyramids(
+            jichitai_codes=arguments.get("jichitai_codes"),
+            prefecture=arguments.get("prefecture"),
+            genders=arguments.get("genders"),
+            share=bool(arguments.get("share", False))
+        )
+
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+
+    elif name == "get_prefecture_summary":
+        prefecture = arguments.get("prefecture")
+
+        result = data_manager.get_prefecture_summary(prefecture=prefecture)
+
+        if result:
+            return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+        else:
+            return [TextContent(type="text", text=json.dumps({
+                "error": "Prefecture not found",
+                "prefecture": prefecture
+            }, ensure_ascii=False))]
+
+    elif name == "get_data_coverage":
+        jichitai_code = arguments.get("jichitai_code")
+        jichitai_name = arguments.get("jichitai_name")
+
+        result = data_manager.get_data_coverage(
+            jichitai_code=jichitai_code,
+            jichitai_name=jichitai_name,
+            prefecture=arguments.get("prefecture")
+        )
+
+        if result:
+            return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+        else:
+            return [TextContent(type="text", text=json.dumps({
+                "error": "Municipality not found",
+                "jichitai_code": jichitai_code,
+                "jichitai_name": jichitai_name
+            }, ensure_ascii=False))]
+
+    elif name == "resolve_jichitai_identifiers":
+        result = data_manager.resolve_jichitai_identifiers(
+            identifiers=arguments["identifiers"],
+            prefecture=arguments.get("prefecture")
+        )
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+
+    elif name == "find_similar_municipalities":
+        jichitai_code = arguments.get("jichitai_code")
+        jichitai_name = arguments.get("jichitai_name")
+
+        result = data_manager.find_similar_municipalities(
+            jichitai_code=jichitai_code,
+            jichitai_name=jichitai_name,
+            prefecture=arguments.get("prefecture"),
+            k=int(arguments.get("k", 10)),
+            weights=arguments.get("weights"),
+            target_prefecture=arguments.get("target_prefecture"),
+            target_jichitai_type=arguments.get("target_jichitai_type")
+        )
+
+        if result:
+            return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+        else:
+            return [TextContent(type="text", text=json.dumps({
+                "error": "Municipality not found",
+                "jichitai_code": jichitai_code,
+                "jichitai_name": jichitai_name
+            }, ensure_ascii=False))]
+
+    elif name in ("find_municipalities_within_radius", "find_nearest_municipalities"):
+        jichitai_code = arguments.get("jichitai_code")
+        jichitai_name = arguments.get("jichitai_name")
+        filters = dict(
+            jichitai_code=jichitai_code,
+            jichitai_name=jichitai_name,
+            prefecture=arguments.get("prefecture"),
+            latitude=arguments.get("latitude"),
+            longitude=arguments.get("longitude"),
+            target_prefecture=arguments.get("target_prefecture"),
+            target_jichitai_type=arguments.get("target_jichitai_type"),
+            population_min=arguments.get("population_min"),
+            population_max=arguments.get("population_max"),
+            financial_capability_min=arguments.get("financial_capability_min"),
+            where=arguments.get("where")
+        )
+
+        if name == "find_municipalities_within_radius":
+            limit = arguments.get("limit")
+            result = data_manager.find_municipalities_within_radius(
+                radius_km=float(arguments["radius_km"]),
+                limit=int(limit) if limit is not None else None,
+                **filters
+            )
+        else:
+            result = data_manager.find_nearest_municipalities(k=int(arguments.get("k", 10)), **filters)
+
+        if result:
+            return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+        else:
+            return [TextContent(type="text", text=json.dumps({
+                "error": "Municipality not found",
+                "jichitai_code": jichitai_code,
+                "jichitai_name": jichitai_name
+            }, ensure_ascii=False))]
+
+    elif name == "query_municipalities":
+        result = data_manager.query_municipalities(
+            where=arguments.get("where"),
+            fields=arguments.get("fields"),
+            sort_by=arguments.get("sort_by"),
+            sort_order=arguments.get("sort_order", "desc"),
+            limit=arguments.get("limit", 50),
+            units_only=arguments.get("units_only", False)
+        )
+
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+
+    elif name == "describe_metric":
+        result = data_manager.describe_metric(
+            field=arguments["field"],
+            group_by=arguments.get("group_by"),
+            bins=int(arguments.get("bins", 10)),
+            binning=arguments.get("binning", "fixed"),
+            where=arguments.get("where"),
+            units_only=bool(arguments.get("units_only", True))
+        )
+
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+
+    elif name == "run_sql_query":
+        result = data_manager.run_sql_query(
+            sql=arguments.get("sql"),
+            params=arguments.get("params"),
+            limit=int(arguments.get("limit", 1000))
+        )
+
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+
+    elif name == "get_time_series":
+        result = data_manager.get_time_series(
+            source=arguments.get("source", "population"),
+            jichitai_codes=arguments.get("jichitai_codes"),
+            jichitai_name=arguments.get("jichitai_name"),
+            prefecture=arguments.get("prefecture"),
+            metrics=arguments.get("metrics"),
+            mode=arguments.get("mode", "series")
+        )
+
+        return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
+
     elif name == "export_all_municipalities_csv":
         output_path = arguments.get("output_path")
 
-        result = data_manager.export_all_municipalities_to_csv(
-            output_path=output_path
+        result = data_manager.export_municipalities(
+            output_path=output_path,
+            format=arguments.get("format", "csv"),
+            compression=arguments.get("compression"),
+            columns=arguments.get("columns"),
+            prefecture=arguments.get("prefecture"),
+            jichitai_type=arguments.get("jichitai_type"),
+            population_min=arguments.get("population_min"),
+            population_max=arguments.get("population_max"),
+            financial_capability_min=arguments.get("financial_capability_min"),
+            where=arguments.get("where")
         )
 
         return [TextContent(type="text", text=json.dumps(result, ensure_ascii=False, indent=2))]
@@ -361,8 +1194,48 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
 
-async def main():
-    """Main entry point"""
+def create_http_app():
+    """
+    Starlette app serving the MCP server over streamable HTTP at /mcp
+
+    All sessions share the process's DataManager, so the dataset is loaded
+    once for every connected client.
+    """
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    session_manager = StreamableHTTPSessionManager(app=app)
+
+    async def handle_mcp(scope, receive, send):
+        await session_manager.handle_request(scope, receive, send)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_):
+        async with session_manager.run():
+            yield
+        # Runs during uvicorn's graceful shutdown, which re-raises SIGTERM afterwards
+        shutdown()
+
+    return Starlette(routes=[Mount("/mcp", app=handle_mcp)], lifespan=lifespan)
+
+
+async def serve_http(host: str = HTTP_HOST, port: int = HTTP_PORT):
+    """Serve over streamable HTTP until SIGINT/SIGTERM, letting in-flight calls finish"""
+    import uvicorn
+
+    config = uvicorn.Config(
+        create_http_app(),
+        host=host,
+        port=port,
+        timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+        log_level="warning",
+    )
+    await uvicorn.Server(config).serve()
+
+
+async def serve_stdio():
+    """Serve one client over stdin/stdout"""
     async with stdio_server() as (read_stream, write_stream):
         await app.run(
             read_stream,
@@ -371,5 +1244,27 @@ async def main():
         )
 
 
+def shutdown():
+    """Wait for running tool calls, then stop the reload watcher"""
+    executor.shutdown(wait=True)
+    data_manager.close()
+
+
+async def main():
+    """Main entry point"""
+    if RELOAD_INTERVAL > 0 and data_manager.snapshot_path is None:
+        data_manager.watch(RELOAD_INTERVAL)
+
+    try:
+        if TRANSPORT == "http":
+            await serve_http()
+        elif TRANSPORT == "stdio":
+            await serve_stdio()
+        else:
+            raise SystemExit(f"Unknown JICHITAI_TRANSPORT: {TRANSPORT} (expected 'stdio' or 'http')")
+    finally:
+        shutdown()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+"""Shared fixtures: small synthetic source workbooks in the real file layouts"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+# (code, prefecture, municipality, population, households, finance indicators)
+MUNICIPALITIES = [
+    ("011002", "北海道", "札幌市", 1956928, 1104953, (0.71, 95.4, 2.9, 18.2, 99.4)),
+    ("012025", "北海道", "函館市", 241602, 145072, (0.45, 93.1, 8.1, 92.5, 98.8)),
+    ("013048", "北海道", "新篠津村", 2805, 1209, (0.18, 84.0, 10.2, None, 95.1)),
+    ("032018", "岩手県", "盛岡市", 281916, 141510, (0.69, 91.9, 7.3, 50.0, 99.0)),
+    ("033227", "岩手県", "矢巾町", 26676, 11271, (0.52, 88.6, 9.9, 30.5, 97.2)),
+    ("131121", "東京都", "世田谷区", 917486, 487356, (None, 82.0, None, None, 100.4)),
+    ("141003", "神奈川県", "横浜市", 3752969, 1830226, (0.97, 97.9, 10.6, 120.4, 101.1)),
+    ("142018", "神奈川県", "横須賀市", 380154, 177301, (0.79, 99.2, 6.1, 28.0, 99.9)),
+]
+
+PREFECTURES = [
+    ("010006", "北海道"),
+    ("030007", "岩手県"),
+    ("130001", "東京都"),
+    ("140007", "神奈川県"),
+]
+
+DX_INDICATORS = ["CIOの任命", "マイナンバーカードの保有状況", "よく使う32手続のオンライン化状況_実施されている手続総数（分母）"]
+DX_PROCEDURES = ["転入届", "児童手当の認定請求"]
+
+AGE_BANDS = 21
+
+
+def _save(wb, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+
+
+def write_codes(data_dir: Path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["団体コード", "都道府県名（漢字）", "市区町村名（漢字）", "都道府県名（カナ）", "市区町村名（カナ）"])
+    for code, pref in PREFECTURES:
+        ws.append([code, pref, None, "カナ", None])
+    for code, pref, name, *_ in MUNICIPALITIES:
+        ws.append([code, pref, name, "カナ", "カナ"])
+    _save(wb, data_dir / "codes" / "municipal_codes_2019.xlsx")
+
+
+def write_population(data_dir: Path, scale: float = 1.0, file_name: str = "r06_municipal_population.xlsx"):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for _ in range(8):
+        ws.append(["header"])
+    for code, pref in PREFECTURES:
+        ws.append([code, pref, "-", 0, 0, 0, 0])
+    for code, pref, name, population, households, _ in MUNICIPALITIES:
+        total = int(population * scale)
+        male = total // 2
+        ws.append([code, pref, name, male, total - male, total, households, 100, 10, 110, 50])
+    _save(wb, data_dir / "population" / file_name)
+
+
+def write_finance(data_dir: Path, file_name: str = "r05_finance_all_municipalities.xlsx", delta: float = 0.0):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["title"])
+    ws.append(["団体コード", "都道府県名", "団体名", "財政力指数", "経常収支比率", "実質公債費比率", "将来負担比率", "ラスパイレス指数"])
+    for code, pref, name, _, _, indicators in MUNICIPALITIES:
+        values = ["-" if v is None else round(v + delta, 2) for v in indicators]
+        ws.append([code, pref, name, *values])
+    _save(wb, data_dir / "finance" / file_name)
+
+
+def write_mynumber(data_dir: Path, rate_offset: float = 0.0, title: str = "header",
+                   file_name: str = "mynumber_card_rate.xlsx"):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "公表用"
+    ws.append([None, title])
+    for _ in range(117):
+        ws.append(["header"])
+    for i, (code, pref, name, population, *_rest) in enumerate(MUNICIPALITIES):
+        rate = 0.70 + 0.02 * i + rate_offset
+        ws.append([pref, name, population, int(population * rate), rate])
+    _save(wb, data_dir / "mynumber" / file_name)
+
+
+def dx_indicator_value(row: int, municipality: int):
+    """Comparison sheet cell: flag strings, percent strings and counts"""
+    if municipality == 2:
+        return None
+    if row == 0:
+        return "実施" if municipality % 2 == 0 else "未実施"
+    if row == 1:
+        return f"{70 + municipality}%"
+    return 20 + municipality
+
+
+def dx_procedure_value(row: int, municipality: int):
+    """Online procedures sheet cell: percent strings, numbers and blanks"""
+    if municipality == 3:
+        return None
+    if row == 1:
+        return 40.5 + municipality
+    return f"{50 + 5 * municipality}%"
+
+
+def write_dx(data_dir: Path):
+    extracted = data_dir / "dx_dashboard" / "extracted"
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["カテゴリ", "指標", *[m[2] for m in MUNICIPALITIES]])
+    for r, indicator in enumerate(DX_INDICATORS):
+        values = [dx_indicator_value(r, i) for i in range(len(MUNICIPALITIES))]
+        ws.append(["体制", indicator, *values])
+    _save(wb, extracted / "市区町村毎のDX進捗状況_市区町村比較.xlsx")
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["分類", "手続", *[m[2] for m in MUNICIPALITIES]])
+    for r, procedure in enumerate(DX_PROCEDURES):
+        values = [dx_procedure_value(r, i) for i in range(len(MUNICIPALITIES))]
+        ws.append(["住民", procedure, *values])
+    _save(wb, extracted / "市区町村毎のDX進捗状況_行政手続のオンライン申請率.xlsx")
+
+
+def age_band_values(population: int, gender_share: float):
+    """Deterministic age pyramid that sums exactly to population * share"""
+    total = int(population * gender_share)
+    weights = [AGE_BANDS - abs(10 - band) for band in range(AGE_BANDS)]
+    bands = [total * w // sum(weights) for w in weights]
+    bands[10] += total - sum(bands)
+    return total, bands
+
+
+def write_age_groups(data_dir: Path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for _ in range(3):
+        ws.append(["header"])
+    for code, pref, name, population, *_rest in MUNICIPALITIES:
+        for gender, share in (("計", 1.0), ("男", 0.5), ("女", 0.5)):
+            total, bands = age_band_values(population, share)
+            ws.append([code, pref, name, gender, total, *bands])
+    _save(wb, data_dir / "population" / "age_group_population.xlsx")
+
+
+def write_all(data_dir: Path):
+    write_codes(data_dir)
+    write_population(data_dir)
+    write_finance(data_dir)
+    write_mynumber(data_dir)
+    write_dx(data_dir)
+    write_age_groups(data_dir)
+
+
+@pytest.fixture
+def synthetic_data_dir(tmp_path) -> Path:
+    """Data directory populated with every source in its expected layout"""
+    data_dir = tmp_path / "source"
+    write_all(data_dir)
+    return data_dir
@@ -0,0 +1,44 @@
+"""Test for the age pyramid tensor and batch pyramid retrieval"""
+from src.data.age_group_parser import AGE_GROUP_NAMES
+from src.data.data_manager import DataManager
+
+
+def test_tensor_matches_records(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    pyramids = dm.dataset.derived("age_pyramids")
+    assert len(pyramids) == 8
+    assert pyramids.codes == sorted(pyramids.codes)
+
+    for record in dm.dataset.records("age_group"):
+        row = pyramids.row_of[record["jichitai_code"]]
+        gender = ("計", "男", "女").index(record["gender"])
+        assert pyramids.pyramid(row, gender) == [record["age_groups"][name] for name in AGE_GROUP_NAMES]
+        assert pyramids.total(row, gender) == record["total"]
+
+    # A prefecture is one contiguous range of rows
+    assert [pyramids.codes[row] for row in pyramids.rows("岩手県")] == ["032018", "033227"]
+    assert list(pyramids.rows("沖縄県")) == []
+    dm.close()
+
+
+def test_batch_pyramids(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.get_age_pyramids(prefecture="北海道")
+    assert [m["jichitai_name"] for m in result["municipalities"]] == ["札幌市", "函館市", "新篠津村"]
+    assert result["genders"] == ["男", "女"]
+    assert len(result["populations"]) == 3
+    assert all(len(p) == 2 and len(p[0]) == len(AGE_GROUP_NAMES) for p in result["populations"])
+
+    ages = dm.get_age_group_population(jichitai_code="142018")["age_groups"]
+    result = dm.get_age_pyramids(jichitai_codes=["142018", "999999"], genders=["計"])
+    assert result["populations"][0][0] == [ages["計"]["breakdown"][name] for name in AGE_GROUP_NAMES]
+    assert result["not_found"] == ["999999"]
+
+    shares = dm.get_age_pyramids(jichitai_codes=["142018"], genders=["計"], share=True)
+    assert shares["unit"] == "percent_of_total"
+    assert abs(sum(shares["populations"][0][0]) - 100) < 0.5
+
+    assert "error" in dm.get_age_pyramids()
+    assert "error" in dm.get_age_pyramids(prefecture="北海道", genders=["X"])
+    dm.close()
@@ -0,0 +1,60 @@
+"""Test for the offline data bundle build"""
+import json
+
+import pytest
+
+from conftest import openpyxl
+
+from src.data.data_manager import DataManager
+from src.data.snapshot import SnapshotError, load_snapshot, main, read_header
+
+
+def test_build_and_verify(synthetic_data_dir, tmp_path, capsys):
+    bundle = tmp_path / "jichitai.bundle"
+    assert main(["build", str(bundle), "--data-dir", str(synthetic_data_dir)]) == 0
+
+    header = read_header(bundle)
+    assert header["format"] == 8
+    assert header["report"]["municipalities"] == 8
+    assert header["report"]["coverage"] == {
+        "population": 1.0, "finance": 1.0, "mynumber": 1.0, "age_group": 1.0, "dx": 1.0
+    }
+
+    # Derived structures come from the bundle, not rebuilt
+    dataset = load_snapshot(bundle)
+    assert dataset.derived("table").n_rows == 8
+    assert dataset.derived("dx_rankings")._cache
+
+    dm = DataManager(str(tmp_path / "empty"), snapshot_path=str(bundle))
+    assert dm.get_prefecture_summary("北海道")["municipality_count"] == 3
+    assert dm.query_municipalities(where={"field": "dx:転入届", "op": ">", "value": 60})["total_count"] > 0
+    dm.close()
+
+    capsys.readouterr()
+    assert main(["verify", str(bundle)]) == 0
+    assert json.loads(capsys.readouterr().out)["sha256"] == header["sha256"]
+
+
+def test_corrupted_bundle_is_rejected(synthetic_data_dir, tmp_path):
+    bundle = tmp_path / "jichitai.bundle"
+    DataManager(str(synthetic_data_dir)).save_snapshot(str(bundle))
+
+    data = bytearray(bundle.read_bytes())
+    data[-10] ^= 0xFF
+    bundle.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError, match="Checksum"):
+        load_snapshot(bundle)
+    assert main(["verify", str(bundle)]) == 1
+
+
+def test_build_fails_on_low_coverage(synthetic_data_dir, tmp_path, capsys):
+    # Finance file without any municipality rows
+    finance = synthetic_data_dir / "finance" / "r05_finance_all_municipalities.xlsx"
+    wb = openpyxl.load_workbook(finance)
+    wb.active.delete_rows(3, 100)
+    wb.save(finance)
+
+    bundle = tmp_path / "jichitai.bundle"
+    assert main(["build", str(bundle), "--data-dir", str(synthetic_data_dir)]) == 1
+    assert "finance covers 0.0%" in capsys.readouterr().err
+    assert not bundle.exists()
@@ -0,0 +1,117 @@
+"""Test for tool call time budgets and cancellation of abandoned calls"""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from mcp.types import TextContent
+
+from src import server
+from src.data.cancellation import CallBudget, CallCancelled, DeadlineExceeded, budget_scope, checkpoint
+from src.data.data_manager import DataManager
+
+
+def looping_dispatch(stopped: threading.Event):
+    def dispatch(name, arguments):
+        try:
+            while True:
+                checkpoint()
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+    return dispatch
+
+
+def test_call_past_its_budget_returns_timeout_error(monkeypatch):
+    stopped = threading.Event()
+    monkeypatch.setattr(server, "dispatch_tool", looping_dispatch(stopped))
+    monkeypatch.setattr(server, "TOOL_TIMEOUTS", {"query_municipalities": 0.1})
+
+    result = asyncio.run(server.call_tool("query_municipalities", {}))
+    error = json.loads(result[0].text)
+    assert error["error_type"] == "timeout"
+    assert error["tool"] == "query_municipalities"
+    assert error["timeout_seconds"] == 0.1
+    assert error["elapsed_seconds"] >= 0.1
+    assert stopped.is_set()
+    assert server.in_flight == {}
+
+
+def test_cold_load_is_not_charged_to_the_budget(monkeypatch):
+    class SlowLoad:
+        @property
+        def dataset(self):
+            time.sleep(0.3)
+
+    def dispatch(name, arguments):
+        checkpoint()
+        return [TextContent(type="text", text="done")]
+
+    monkeypatch.setattr(server, "data_manager", SlowLoad())
+    monkeypatch.setattr(server, "dispatch_tool", dispatch)
+    monkeypatch.setattr(server, "TOOL_TIMEOUTS", {"query_municipalities": 0.1})
+
+    assert asyncio.run(server.call_tool("query_municipalities", {}))[0].text == "done"
+
+
+def test_cancelling_the_only_caller_stops_the_computation(monkeypatch):
+    stopped = threading.Event()
+    monkeypatch.setattr(server, "dispatch_tool", looping_dispatch(stopped))
+
+    async def run():
+        task = asyncio.ensure_future(server.call_tool("find_similar_municipalities", {"jichitai_code": "011002"}))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert stopped.wait(1)
+
+
+def test_shared_call_survives_a_cancelled_waiter(monkeypatch):
+    def dispatch(name, arguments):
+        for _ in range(20):
+            checkpoint()
+            time.sleep(0.01)
+        return [TextContent(type="text", text="done")]
+
+    monkeypatch.setattr(server, "dispatch_tool", dispatch)
+
+    async def run():
+        first = asyncio.ensure_future(server.call_tool("describe_metric", {"field": "population"}))
+        second = asyncio.ensure_future(server.call_tool("describe_metric", {"field": "population"}))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run())[0].text == "done"
+
+
+def test_parse_timeouts():
+    assert server.parse_timeouts("") == {}
+    assert server.parse_timeouts("a=1.5, b = 10") == {"a": 1.5, "b": 10.0}
+
+
+def test_aborted_export_leaves_no_file(synthetic_data_dir, tmp_path):
+    dm = DataManager(str(synthetic_data_dir))
+    out = tmp_path / "out"
+    out.mkdir()
+    path = out / "all.csv"
+
+    expired = CallBudget(0.001)
+    time.sleep(0.01)
+    with budget_scope(expired), pytest.raises(DeadlineExceeded):
+        dm.export_municipalities(str(path))
+
+    cancelled = CallBudget()
+    cancelled.cancel()
+    with budget_scope(cancelled), pytest.raises(CallCancelled):
+        dm.export_municipalities(str(path))
+
+    assert list(out.iterdir()) == []
+
+    # Outside a budget, checkpoints do nothing
+    assert dm.export_municipalities(str(path))["success"]
+    dm.close()
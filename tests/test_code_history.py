@@ -0,0 +1,84 @@
+"""Test for redirecting retired municipality codes and names"""
+import pytest
+
+from src.data.data_manager import DataManager
+
+
+HISTORY = """old_code,old_name,prefecture,new_code,new_name,date,reason
+032034,都南村,岩手県,032018,盛岡市,1992-04-01,編入
+012050,旧戸井町,北海道,012998,旧亀田市,1970-01-01,編入
+012998,旧亀田市,北海道,012025,函館市,1973-12-01,編入
+,大野町,北海道,012025,函館市,2004-12-01,編入
+,大野町,岩手県,033227,矢巾町,2004-12-01,編入
+099999,消えた村,北海道,098888,消えた町,2000-01-01,新設合併
+"""
+
+
+@pytest.fixture
+def history_data_dir(synthetic_data_dir):
+    (synthetic_data_dir / "codes" / "municipal_code_history.csv").write_text(HISTORY, encoding="utf-8")
+    return synthetic_data_dir
+
+
+def test_retired_code_and_name_redirect(history_data_dir):
+    dm = DataManager(str(history_data_dir))
+
+    info = dm.get_jichitai_basic_info(jichitai_code="032034")
+    assert info["jichitai_name"] == "盛岡市"
+    assert info["redirect"]["from_code"] == "032034"
+    assert info["redirect"]["reason"] == "編入"
+
+    # Chains are followed to the current code
+    assert dm.get_jichitai_basic_info(jichitai_code="012050")["jichitai_code"] == "012025"
+
+    # Names: by prefecture when the retired name is ambiguous
+    assert dm.get_jichitai_code("都南村")["matches"][0]["jichitai_code"] == "032018"
+    assert "redirect" not in dm.get_jichitai_code("大野町")
+    assert dm.get_mynumber_card_rate(jichitai_name="大野町", prefecture="岩手県")["jichitai_code"] == "033227"
+
+    # Current identifiers are untouched
+    assert "redirect" not in dm.get_jichitai_basic_info(jichitai_code="032018")
+    assert "redirect" not in dm.get_age_group_population(jichitai_name="盛岡市")
+    dm.close()
+
+
+def test_bulk_resolution(history_data_dir):
+    dm = DataManager(str(history_data_dir))
+    result = dm.resolve_jichitai_identifiers(["011002", "都南村", "12050", "大野町", "099999", "府中町"])
+    statuses = [entry["status"] for entry in result["results"]]
+    assert statuses == ["current", "redirected", "redirected", "ambiguous", "not_found", "not_found"]
+    assert result["results"][2]["jichitai_name"] == "函館市"
+    assert {c["jichitai_code"] for c in result["results"][3]["candidates"]} == {"012025", "033227"}
+    assert result["counts"] == {"current": 1, "redirected": 2, "ambiguous": 1, "not_found": 2}
+
+    by_prefecture = dm.resolve_jichitai_identifiers(["大野町"], prefecture="北海道")
+    assert by_prefecture["results"][0]["jichitai_code"] == "012025"
+    dm.close()
+
+
+def test_without_history_file(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    assert dm.history_parser is None
+    assert dm.get_jichitai_basic_info(jichitai_code="032034") is None
+    assert dm.resolve_jichitai_identifiers(["032034"])["counts"]["not_found"] == 1
+    dm.close()
+
+
+def test_transfer_across_prefectures(history_data_dir):
+    # A village in 青森県 transferred into a municipality of 岩手県
+    history = history_data_dir / "codes" / "municipal_code_history.csv"
+    history.write_text(HISTORY + "022222,越境村,青森県,033227,矢巾町,2005-01-01,編入\n", encoding="utf-8")
+    dm = DataManager(str(history_data_dir))
+
+    info = dm.get_jichitai_basic_info(jichitai_name="越境村", prefecture="青森県")
+    assert info["jichitai_code"] == "033227"
+    assert info["redirect"]["from_prefecture"] == "青森県"
+    assert info["redirect"]["to_prefecture"] == "岩手県"
+
+    # The successor's prefecture is not the retired name's
+    assert dm.get_jichitai_basic_info(jichitai_name="越境村", prefecture="岩手県") is None
+
+    result = dm.resolve_jichitai_identifiers(["越境村"], prefecture="青森県")["results"][0]
+    assert result["status"] == "redirected"
+    assert result["prefecture"] == "岩手県"
+    dm.close()
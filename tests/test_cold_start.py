@@ -0,0 +1,87 @@
+"""
+Test for lazy imports of the data layer and serving from a prebuilt snapshot
+
+Only the data layer (src.data) has an import-time budget. Importing
+src.server also imports the mcp package, whose own import (about 0.5 s,
+mostly mcp/__init__ loading the client and FastMCP modules) is needed
+before the server can answer anything and is not covered here. For the
+server, the test only checks that it skips openpyxl.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.data.data_manager import DataManager
+from src.data.snapshot import SnapshotError, load_snapshot
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Cumulative import time allowed for src.data.data_manager (microseconds);
+# the mcp package imported by src.server is outside this budget
+DATA_LAYER_IMPORT_BUDGET_US = 150_000
+
+
+def import_times(module: str):
+    """module -> cumulative import time in microseconds, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_data_layer_import_is_fast_and_skips_openpyxl():
+    times = import_times("src.data.data_manager")
+    assert not any(name.startswith("openpyxl") for name in times)
+    assert not any(name == "sqlite3" for name in times)
+    assert times["src.data.data_manager"] < DATA_LAYER_IMPORT_BUDGET_US
+
+
+def test_server_import_skips_openpyxl():
+    times = import_times("src.server")
+    assert "src.server" in times
+    assert not any(name.startswith("openpyxl") for name in times)
+
+
+def test_serve_from_snapshot(synthetic_data_dir, tmp_path):
+    snapshot = tmp_path / "jichitai.snapshot"
+    source = DataManager(str(synthetic_data_dir))
+    source.save_snapshot(str(snapshot))
+
+    # No workbooks needed at all
+    dm = DataManager(str(tmp_path / "empty"), snapshot_path=str(snapshot))
+    assert dm.population_parser is None
+    assert dm.get_jichitai_basic_info(jichitai_code="142018") == source.get_jichitai_basic_info(jichitai_code="142018")
+    assert dm.get_prefecture_summary() == source.get_prefecture_summary()
+    assert dm.get_digital_agency_dx_data(jichitai_name="札幌市") == source.get_digital_agency_dx_data(jichitai_name="札幌市")
+    assert dm.dataset.digest == source.dataset.digest
+    assert dm.changed_sources() == {}
+    assert dm.reload() is None
+    dm.close()
+    source.close()
+
+    # A fresh process answers queries without ever importing openpyxl
+    code = (
+        "import sys; from src.data.data_manager import DataManager; "
+        f"dm = DataManager(snapshot_path={str(snapshot)!r}); "
+        "assert dm.get_jichitai_basic_info(jichitai_code='142018')['jichitai_name'] == '横須賀市'; "
+        "assert 'openpyxl' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True)
+
+
+def test_invalid_snapshot(tmp_path):
+    bad = tmp_path / "bad.snapshot"
+    bad.write_bytes(b"not a snapshot")
+    with pytest.raises(SnapshotError):
+        load_snapshot(bad)
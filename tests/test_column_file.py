@@ -0,0 +1,53 @@
+"""Test for the memory-mapped column section of data bundles"""
+import math
+
+from src.data.column_file import MappedTable, encode_table
+from src.data.data_manager import DataManager
+from src.data.snapshot import load_snapshot
+from src.data.table import MunicipalityTable
+
+
+def test_roundtrip_keeps_missing_values():
+    table = MunicipalityTable(["011002", "011011", "999999"])
+    table.strings["jichitai_name"][:2] = ["札幌市", "札幌市中央区"]
+    table.numeric["population_total"][0] = 1950000
+    table.numeric["elderly_ratio"][1] = 0.25
+    table.is_unit[1] = False
+
+    mapped = MappedTable(memoryview(encode_table(table)))
+    assert mapped.n_rows == 3
+    assert list(mapped.codes) == table.codes
+    assert mapped.row_of == table.row_of
+    assert mapped.columns == table.columns
+    assert [bool(flag) for flag in mapped.is_unit] == [True, False, True]
+    for row in range(table.n_rows):
+        assert mapped.row_dict(row) == table.row_dict(row)
+    assert mapped.strings["jichitai_name"][2] is None
+    assert math.isnan(mapped.numeric["population_total"][2])
+
+
+def test_bundle_table_is_mapped_and_shared(synthetic_data_dir, tmp_path):
+    bundle = tmp_path / "jichitai.bundle"
+    source = DataManager(str(synthetic_data_dir))
+    source.save_snapshot(str(bundle))
+    built = source.dataset.derived("table")
+
+    dataset = load_snapshot(bundle)
+    table = dataset.derived("table")
+    assert isinstance(table, MappedTable)
+    # Numeric columns are views of the mapping, not copies
+    assert isinstance(table.numeric["population_total"], memoryview)
+    for row in range(built.n_rows):
+        assert table.row_dict(row) == built.row_dict(row)
+
+    # Derived structures are bound to the mapped table rather than a private copy
+    assert dataset.derived("query").table is table
+    assert dataset.derived("similarity").table is table
+
+    dm = DataManager(str(tmp_path / "empty"), snapshot_path=str(bundle))
+    where = {"field": "elderly_ratio", "op": ">", "value": 0.2}
+    assert dm.query_municipalities(where=where) == source.query_municipalities(where=where)
+    assert dm.find_similar_municipalities(jichitai_code="142018") == source.find_similar_municipalities(jichitai_code="142018")
+    assert dm.search_jichitai_by_criteria(prefecture="北海道") == source.search_jichitai_by_criteria(prefecture="北海道")
+    dm.close()
+    source.close()
@@ -0,0 +1,54 @@
+"""Test for the per-municipality source coverage bitmap"""
+import pytest
+
+from conftest import openpyxl
+
+from src.data.data_manager import DataManager
+
+
+@pytest.fixture
+def partial_data_dir(synthetic_data_dir):
+    """Synthetic data with the first municipality missing from the finance file"""
+    finance = synthetic_data_dir / "finance" / "r05_finance_all_municipalities.xlsx"
+    wb = openpyxl.load_workbook(finance)
+    wb.active.delete_rows(3, 1)
+    wb.save(finance)
+    return synthetic_data_dir
+
+
+def test_coverage_matches_source_lookups(partial_data_dir):
+    dm = DataManager(str(partial_data_dir))
+    coverage = dm.dataset.derived("coverage")
+
+    for code in coverage.codes():
+        covered = set(coverage.sources(code))
+        info = dm.get_jichitai_basic_info(jichitai_code=code)
+        assert ("population" in covered) == ("population" in info)
+        assert ("finance" in covered) == (info["finance"] is not None)
+        assert ("age_group" in covered) == (dm.get_age_group_population(jichitai_code=code) is not None)
+        assert info["data_coverage"] == coverage.sources(code)
+
+    missing = [code for code in coverage.codes() if not coverage.covers(code, "finance")]
+    assert len(missing) == 1
+    result = dm.get_data_coverage(jichitai_code=missing[0])
+    assert result["missing_sources"] == ["finance"]
+    assert "population" in result["covered_sources"]
+    assert dm.get_data_coverage(jichitai_code="999999") is None
+    dm.close()
+
+
+def test_summary_and_filter(partial_data_dir):
+    dm = DataManager(str(partial_data_dir))
+    summary = dm.get_data_coverage()
+    assert summary["municipality_count"] == len(dm.dataset.derived("coverage").codes())
+    assert sum(c["count"] for c in summary["combinations"]) == summary["municipality_count"]
+    assert summary["sources"]["finance"]["missing"] == 1
+    assert summary["complete_count"] == summary["municipality_count"] - 1
+
+    hokkaido = dm.get_data_coverage(prefecture="北海道")
+    assert 0 < hokkaido["municipality_count"] < summary["municipality_count"]
+
+    without_finance = dm.query_municipalities(where={"field": "has:finance", "op": "=", "value": 0}, limit=None)
+    assert without_finance["total_count"] == 1
+    assert without_finance["municipalities"][0]["has:finance"] == 0
+    dm.close()
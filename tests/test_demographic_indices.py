@@ -0,0 +1,63 @@
+"""Test for demographic indices derived from the age bands of every municipality"""
+import json
+
+from src.data.age_group_parser import AGE_GROUP_NAMES
+from src.data.data_manager import DataManager
+
+
+def expected_indices(bands, total):
+    youth, working, elderly = sum(bands[:3]), sum(bands[3:13]), sum(bands[13:])
+    half = sum(bands) / 2
+    cumulative = 0
+    for band, count in enumerate(bands):
+        if cumulative + count >= half:
+            median = round(5 * (band + (half - cumulative) / count), 1)
+            break
+        cumulative += count
+    return {
+        "late_elderly_population": sum(bands[15:]),
+        "late_elderly_ratio": round(sum(bands[15:]) / total * 100, 2),
+        "young_dependency_ratio": round(youth / working * 100, 2),
+        "old_dependency_ratio": round(elderly / working * 100, 2),
+        "total_dependency_ratio": round((youth + elderly) / working * 100, 2),
+        "aging_index": round(elderly / youth * 100, 2),
+        "median_age": median,
+        "sex_ratio": 100.0,
+    }
+
+
+def test_indices_for_every_municipality(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    table = dm.dataset.derived("table")
+
+    for record in dm.dataset.records("age_group"):
+        if record["gender"] != "計":
+            continue
+        row = table.row_of[record["jichitai_code"]]
+        bands = [record["age_groups"][name] for name in AGE_GROUP_NAMES]
+        expected = expected_indices(bands, record["total"])
+        assert table.row_dict(row, list(expected)) == expected
+
+    ages = dm.get_age_group_population(jichitai_code="142018")
+    assert ages["demographic_indices"]["median_age"] == table.value(table.row_of["142018"], "median_age")
+    dm.close()
+
+
+def test_indices_are_queryable(synthetic_data_dir, tmp_path):
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.query_municipalities(
+        where={"field": "old_dependency_ratio", "op": ">", "value": 0},
+        fields=["jichitai_code", "median_age", "sex_ratio:65-69歳"],
+        sort_by="late_elderly_population",
+        limit=2
+    )
+    assert result["total_count"] == 8
+    assert [m["jichitai_code"] for m in result["municipalities"]] == ["141003", "011002"]
+    assert result["municipalities"][0]["sex_ratio:65-69歳"] == 100.0
+
+    path = tmp_path / "indices.jsonl"
+    export = dm.export_municipalities(str(path), format="jsonl", columns=["jichitai_code", "aging_index"])
+    assert export["success"] and export["columns"] == 2
+    assert all(isinstance(row["aging_index"], float) for row in map(json.loads, path.read_text().splitlines()))
+    dm.close()
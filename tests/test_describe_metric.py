@@ -0,0 +1,43 @@
+"""Test for distribution statistics and histograms of a metric"""
+from src.data.data_manager import DataManager
+from src.data.distribution import histogram, quantile
+
+
+def test_describe_metric(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    # 財政力指数: .18 .45 .52 .69 .71 .79 .97, 世田谷区 missing
+    result = dm.describe_metric("financial_capability_index", bins=2)
+    overall = result["overall"]
+    assert (overall["count"], overall["missing"]) == (7, 1)
+    assert overall["mean"] == round(4.31 / 7, 6)
+    assert (overall["min"], overall["max"]) == (0.18, 0.97)
+    assert overall["quantiles"]["p50"] == 0.69
+    assert [b["count"] for b in overall["histogram"]] == [3, 4]
+    assert overall["histogram"][0] == {"lower": 0.18, "upper": 0.575, "count": 3}
+    assert result["cached"] is False
+    assert dm.describe_metric("financial_capability_index", bins=2)["cached"] is True
+
+    result = dm.describe_metric("financial_capability_index", group_by="prefecture", binning="quantile", bins=2)
+    assert result["groups"]["北海道"]["count"] == 3
+    assert result["groups"]["東京都"] == {"count": 0, "missing": 1}
+    assert [b["upper"] for b in result["overall"]["histogram"]] == [0.69, 0.97]
+
+    result = dm.describe_metric("population_total", where={"field": "prefecture", "op": "=", "value": "岩手県"})
+    assert result["overall"]["count"] == 2
+
+    assert "error" in dm.describe_metric("prefecture")
+    assert "error" in dm.describe_metric("unknown_metric")
+    assert "error" in dm.describe_metric("elderly_ratio", binning="log")
+    dm.close()
+
+
+def test_quantile_and_histogram_edges():
+    ordered = [1.0, 2.0, 3.0, 4.0]
+    assert quantile(ordered, 0.5) == 2.5
+    assert quantile(ordered, 1.0) == 4.0
+    # The maximum falls in the last bin
+    assert [b["count"] for b in histogram(ordered, 3)] == [1, 1, 2]
+    assert histogram([5.0, 5.0], 4) == [{"lower": 5.0, "upper": 5.0, "count": 2}]
+    # Coinciding quantile edges are merged: 1, 1, 1, 1.25, 2 -> 1, 1.25, 2
+    assert [b["count"] for b in histogram([1.0, 1.0, 1.0, 2.0], 4, "quantile")] == [3, 1]
@@ -0,0 +1,45 @@
+"""Test for the nationwide DX leaderboard"""
+from src.data.data_manager import DataManager
+
+
+def test_procedure_ranking_and_groups(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.get_dx_leaderboard("転入届", group_by="prefecture", limit=3)
+    assert result["category"] == "online_procedures"
+    names = [entry["jichitai_name"] for entry in result["ranking"]]
+    assert names == ["横須賀市", "横浜市", "世田谷区"]
+    assert result["ranking"][0]["jichitai_code"] == "142018"
+    assert result["ranking"][0]["value"] == 85.0
+
+    # 盛岡市 has no value: 7 of 8 municipalities covered
+    assert result["national"]["count"] == 7
+    assert result["national"]["coverage"] == 87.5
+
+    iwate = result["groups"]["岩手県"]
+    assert iwate == {"count": 1, "total": 2, "coverage": 50.0, "mean": 70.0,
+                     "median": 70.0, "min": 70.0, "max": 70.0}
+
+    dm.close()
+
+
+def test_flag_indicator_ties_filters_and_cache(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.get_dx_leaderboard("CIOの任命", jichitai_type=["市"], limit=None)
+    ranks = [(entry["jichitai_name"], entry["rank"], entry["raw_value"]) for entry in result["ranking"]]
+    assert ranks[0] == ("札幌市", 1, "実施")
+    assert ("函館市", 3, "未実施") in ranks
+    assert all(entry["jichitai_type"] == "市" for entry in result["ranking"])
+
+    asc = dm.get_dx_leaderboard("CIOの任命", sort_order="asc", limit=1)
+    assert asc["ranking"][0]["value"] == 0.0
+
+    rankings = dm.dataset.derived("dx_rankings")
+    assert rankings.stats("CIOの任命") is rankings.stats("CIOの任命")
+
+    assert "error" in dm.get_dx_leaderboard("存在しない指標")
+    for limit in (0, -1):
+        assert "error" in dm.get_dx_leaderboard("CIOの任命", limit=limit)
+    assert "error" in dm.get_dx_leaderboard("CIOの任命", sort_order="up")
+    dm.close()
@@ -0,0 +1,73 @@
+"""Test for the dense DX indicator / procedure matrices"""
+import math
+
+from conftest import MUNICIPALITIES, DX_INDICATORS, DX_PROCEDURES, dx_indicator_value, dx_procedure_value
+
+from src.data.data_manager import DataManager
+from src.data.dx_parser import DXMatrix
+
+
+def _expected_procedure(row, municipality):
+    value = dx_procedure_value(row, municipality)
+    if isinstance(value, str):
+        return float(value.replace("%", ""))
+    return value
+
+
+def test_matrices_shape_and_slices(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    dx = dm.dx_parser.load_data()
+
+    assert dx.comparison.n_rows == len(DX_INDICATORS)
+    assert dx.comparison.n_cols == len(MUNICIPALITIES)
+    assert dx.online.n_rows == len(DX_PROCEDURES)
+
+    # Flags and percent strings are encoded as numbers, blanks as NaN
+    flags = dx.comparison.row(dx.comparison.row_index["CIOの任命"])
+    assert flags[0] == 1.0 and flags[1] == 0.0 and math.isnan(flags[2])
+
+    yokosuka = dx.comparison.column(dx.comparison.col_index["横須賀市"])
+    assert list(yokosuka) == [0.0, 77.0, 27.0]
+
+    # Loading is done once
+    assert dm.dx_parser.load_data() is dx
+    dm.close()
+
+
+def test_lookup_decodes_original_values(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    for i, (code, _, name, *_rest) in enumerate(MUNICIPALITIES):
+        record = dm.dx_parser.get_by_name(name)
+        assert record["dx_indicators"] == {
+            indicator: dx_indicator_value(r, i) for r, indicator in enumerate(DX_INDICATORS)
+        }
+        assert record["online_procedures"] == {
+            procedure: _expected_procedure(r, i) for r, procedure in enumerate(DX_PROCEDURES)
+        }
+
+    result = dm.get_digital_agency_dx_data(jichitai_code="142018")
+    assert result["dx_data"]["dx_indicators"]["マイナンバーカードの保有状況"] == "77%"
+    assert dm.dx_parser.get_by_name("存在しない市") is None
+
+    dm.close()
+
+
+def test_decode_keeps_original_types():
+    rows = [
+        (None, None, "A市", "B町", "C村", "D市"),
+        ("体制", "職員数", 3, 2.5, "", None),
+        ("体制", "CIOの任命", "実施", 1, 1.0, "未実施"),
+        ("申請", "転入届", "12.5%", 0, "-", False),
+    ]
+    comparison = DXMatrix.from_rows(rows)
+    assert [comparison.column_dict(c)["職員数"] for c in range(4)] == [3, 2.5, "", None]
+    assert type(comparison.column_dict(0)["職員数"]) is int
+    # Numbers equal to a flag's code stay numbers
+    assert [comparison.column_dict(c)["CIOの任命"] for c in range(4)] == ["実施", 1, 1.0, "未実施"]
+    assert type(comparison.column_dict(1)["CIOの任命"]) is int
+    assert type(comparison.column_dict(2)["CIOの任命"]) is float
+    assert [comparison.column_dict(c)["転入届"] for c in range(4)] == ["12.5%", 0, "-", False]
+
+    online = DXMatrix.from_rows(rows, percent_strings_only=True)
+    assert [online.column_dict(c)["転入届"] for c in range(4)] == [12.5, 0, "-", False]
@@ -0,0 +1,55 @@
+"""Test for filtered, column-selected CSV export"""
+import csv
+
+from src.data.data_manager import DataManager
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_filtered_export_matches_search(synthetic_data_dir, tmp_path):
+    dm = DataManager(str(synthetic_data_dir))
+    output = tmp_path / "hokkaido.csv"
+
+    result = dm.export_all_municipalities_to_csv(
+        str(output),
+        columns=["jichitai_code", "population_total", "dx:転入届", "age:0-4歳", "age:女:100歳以上"],
+        prefecture=["北海道"],
+        population_min=100000,
+    )
+    assert result["success"] and result["columns"] == 5
+
+    rows = read_csv(output)
+    assert list(rows[0]) == ["jichitai_code", "population_total", "dx:転入届", "age:0-4歳", "age:女:100歳以上"]
+    searched = dm.search_jichitai_by_criteria(prefecture=["北海道"], population_min=100000)["jichitai_list"]
+    assert {row["jichitai_code"] for row in rows} == {m["jichitai_code"] for m in searched}
+
+    # Values agree with the per-municipality tools
+    row = next(r for r in rows if r["jichitai_code"] == "011002")
+    ages = dm.get_age_group_population(jichitai_code="011002")
+    assert int(row["population_total"]) == dm.get_jichitai_basic_info(jichitai_code="011002")["population"]["total"]
+    assert int(row["age:0-4歳"]) == ages["age_groups"]["計"]["breakdown"]["0-4歳"]
+    dm.close()
+
+
+def test_export_with_predicate_and_unknown_column(synthetic_data_dir, tmp_path):
+    dm = DataManager(str(synthetic_data_dir))
+    output = tmp_path / "selected.csv"
+
+    where = {"field": "elderly_ratio", "op": ">", "value": 25}
+    result = dm.export_all_municipalities_to_csv(str(output), columns=["jichitai_name", "elderly_ratio"], where=where)
+    expected = dm.query_municipalities(where=where, fields=["jichitai_name"], limit=None)["municipalities"]
+    assert [row["jichitai_name"] for row in read_csv(output)] == [m["jichitai_name"] for m in expected]
+    assert result["municipality_count"] == len(expected)
+
+    # Prefecture-level code entries are not exported once filtering applies
+    everything = dm.export_all_municipalities_to_csv(str(tmp_path / "default.csv"))
+    projected = dm.export_all_municipalities_to_csv(str(tmp_path / "projected.csv"), columns=["jichitai_code"])
+    assert projected["municipality_count"] < everything["municipality_count"]
+
+    error = dm.export_all_municipalities_to_csv(str(tmp_path / "bad.csv"), columns=["no_such_column"])
+    assert error["success"] is False and "no_such_column" in error["error"]
+    assert not (tmp_path / "bad.csv").exists()
+    dm.close()
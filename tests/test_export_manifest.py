@@ -0,0 +1,71 @@
+"""Test for skipping exports whose inputs have not changed"""
+import json
+import os
+import stat
+import threading
+
+from conftest import write_population
+
+from src.data.data_manager import DataManager
+from src.data.export import file_sha256, manifest_path
+
+
+def test_repeat_export_is_skipped_until_data_changes(synthetic_data_dir, tmp_path):
+    output = tmp_path / "municipalities.csv"
+    dm = DataManager(str(synthetic_data_dir))
+
+    first = dm.export_all_municipalities_to_csv(str(output))
+    assert first["success"] and first["unchanged"] is False
+    manifest = json.loads(manifest_path(output).read_text(encoding="utf-8"))
+    assert manifest["dataset_digest"] == dm.dataset.digest
+    assert manifest["sha256"] == first["sha256"]
+    assert manifest["params"]["columns"][0] == "jichitai_code"
+
+    # Same inputs: the file is not rewritten
+    os.utime(output, ns=(0, 0))
+    second = dm.export_all_municipalities_to_csv(str(output))
+    assert second["unchanged"] is True
+    assert second["municipality_count"] == first["municipality_count"]
+    assert output.stat().st_mtime_ns == 0
+
+    # An edited output file is regenerated
+    output.write_text("tampered", encoding="utf-8")
+    third = dm.export_all_municipalities_to_csv(str(output))
+    assert third["unchanged"] is False and third["sha256"] == first["sha256"]
+
+    # So is the export after a source changed
+    write_population(synthetic_data_dir, scale=2.0)
+    population = synthetic_data_dir / "population" / "r06_municipal_population.xlsx"
+    population_stat = population.stat()
+    os.utime(population, ns=(population_stat.st_atime_ns, population_stat.st_mtime_ns + 1_000_000_000))
+    dm.reload()
+    fourth = dm.export_all_municipalities_to_csv(str(output))
+    assert fourth["unchanged"] is False and fourth["sha256"] != first["sha256"]
+    dm.close()
+
+
+def test_concurrent_exports_to_one_path_stay_consistent(synthetic_data_dir, tmp_path):
+    output = tmp_path / "out" / "municipalities.csv"
+    output.parent.mkdir()
+    dm = DataManager(str(synthetic_data_dir))
+    variants = [dict(format="csv"), dict(format="jsonl"), dict(columns=["jichitai_code"]), dict(prefecture=["北海道"])]
+
+    def export(options):
+        for _ in range(5):
+            assert dm.export_municipalities(str(output), **options)["success"]
+
+    threads = [threading.Thread(target=export, args=(options,)) for options in variants]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Whichever export finished last, the file is the one its manifest describes
+    manifest = json.loads(manifest_path(output).read_text(encoding="utf-8"))
+    assert file_sha256(output) == manifest["sha256"]
+    assert sorted(p.name for p in output.parent.iterdir()) == ["municipalities.csv", "municipalities.csv.manifest.json"]
+    # Created under the normal umask, like a plain open() of the output
+    umask = os.umask(0o022)
+    os.umask(umask)
+    assert stat.S_IMODE(output.stat().st_mode) == 0o666 & ~umask
+    dm.close()
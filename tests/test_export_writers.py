@@ -0,0 +1,75 @@
+"""Test for JSON Lines and compressed export writers"""
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from src.data.data_manager import DataManager
+from src.data.export import ExportError, check_options
+
+
+def test_nested_jsonl_matches_tools(synthetic_data_dir, tmp_path):
+    dm = DataManager(str(synthetic_data_dir))
+    output = tmp_path / "municipalities.jsonl.gz"
+
+    result = dm.export_municipalities(str(output), format="jsonl", compression="gzip", prefecture=["神奈川県"])
+    assert result["success"] and result["columns"] is None
+
+    with gzip.open(output, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == result["municipality_count"]
+    assert {r["prefecture"] for r in records} == {"神奈川県"}
+
+    record = next(r for r in records if r["jichitai_code"] == "142018")
+    assert record["population"] == dm.get_jichitai_basic_info(jichitai_code="142018")["population"]
+    assert record["finance"] == dm.get_jichitai_basic_info(jichitai_code="142018")["finance"]
+    assert record["dx_data"] == dm.get_digital_agency_dx_data(jichitai_code="142018")["dx_data"]
+    ages = dm.get_age_group_population(jichitai_code="142018")["age_groups"]
+    assert record["age_groups"]["男"]["breakdown"] == ages["男"]["breakdown"]
+
+    # Compressed output is deterministic, so the manifest still matches
+    assert dm.export_municipalities(str(output), format="jsonl", compression="gzip", prefecture=["神奈川県"])["unchanged"]
+    dm.close()
+
+
+def test_compressed_csv_has_same_content(synthetic_data_dir, tmp_path):
+    dm = DataManager(str(synthetic_data_dir))
+    plain = tmp_path / "municipalities.csv"
+    packed = tmp_path / "municipalities.csv.gz"
+
+    dm.export_all_municipalities_to_csv(str(plain))
+    result = dm.export_municipalities(str(packed), compression="gzip")
+    assert result["success"] and not result["unchanged"]
+    assert gzip.decompress(packed.read_bytes()) == plain.read_bytes()
+
+    # Flat JSON Lines keeps missing values as null
+    flat = tmp_path / "flat.jsonl"
+    dm.export_municipalities(str(flat), format="jsonl", columns=["jichitai_code", "future_burden_ratio"])
+    rows = [json.loads(line) for line in flat.read_text(encoding="utf-8").splitlines()]
+    expected = list(csv.DictReader(io.StringIO(plain.read_text(encoding="utf-8-sig"))))
+    assert {r["jichitai_code"] for r in rows} <= {r["jichitai_code"] for r in expected}
+    assert any(r["future_burden_ratio"] is None for r in rows)
+    dm.close()
+
+
+def test_unknown_options_are_rejected(synthetic_data_dir, tmp_path):
+    with pytest.raises(ExportError):
+        check_options("xml", None)
+    dm = DataManager(str(synthetic_data_dir))
+    result = dm.export_municipalities(str(tmp_path / "out.csv"), compression="bz2")
+    assert result["success"] is False and "bz2" in result["error"]
+    assert not (tmp_path / "out.csv").exists()
+    dm.close()
+
+
+def test_zstd_export(synthetic_data_dir, tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    dm = DataManager(str(synthetic_data_dir))
+    output = tmp_path / "municipalities.jsonl.zst"
+    result = dm.export_municipalities(str(output), format="jsonl", compression="zstd")
+    with zstandard.ZstdDecompressor().stream_reader(open(output, "rb")) as f:
+        lines = io.TextIOWrapper(f, encoding="utf-8").read().splitlines()
+    assert len(lines) == result["municipality_count"]
+    dm.close()
@@ -0,0 +1,78 @@
+"""Test for hot reload of changed source files"""
+import os
+
+import pytest
+from conftest import write_population, write_mynumber
+
+from src.data.data_manager import DataManager
+
+
+def _bump_mtime(path):
+    """Make sure the fingerprint changes even on coarse-mtime filesystems"""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reload_swaps_only_changed_source(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    old = dm.dataset
+    old_population = old.records("population")
+    old_finance = old.records("finance")
+
+    assert dm.reload() is None
+
+    write_population(synthetic_data_dir, scale=2.0)
+    _bump_mtime(synthetic_data_dir / "population" / "r06_municipal_population.xlsx")
+    assert list(dm.changed_sources()) == ["population"]
+
+    new = dm.reload()
+    assert new is dm.dataset
+    assert new.version == old.version + 1
+    assert new.digest != old.digest
+
+    # Only the changed source was re-ingested
+    assert new.records("population") is not old_population
+    assert new.records("finance") is old_finance
+    assert new.derived("finance_by_code") is old.derived("finance_by_code")
+
+    # The old version is untouched for requests still holding it
+    assert old.derived("population_by_code")["142018"]["population"]["total"] == 380154
+    assert new.derived("population_by_code")["142018"]["population"]["total"] == 760308
+    assert dm.get_jichitai_basic_info(jichitai_code="142018")["population"]["total"] == 760308
+
+    dm.close()
+
+
+def test_watcher_waits_for_change_to_settle(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    watcher = dm.watch(interval=3600)
+    version = dm.dataset.version
+
+    write_mynumber(synthetic_data_dir, rate_offset=0.05)
+    _bump_mtime(synthetic_data_dir / "mynumber" / "mynumber_card_rate.xlsx")
+
+    # First sighting only marks the change as pending
+    assert watcher.poll() is False
+    assert dm.dataset.version == version
+
+    assert watcher.poll() is True
+    assert dm.dataset.version == version + 1
+    rate = dm.get_mynumber_card_rate(jichitai_code="011002")["mynumber_card_data"]["issuance_rate"]
+    assert rate == 75.0
+
+    dm.close()
+    assert not dm._watcher
+
+
+def test_failed_reload_keeps_current_dataset(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    current = dm.dataset
+
+    path = synthetic_data_dir / "population" / "r06_municipal_population.xlsx"
+    path.write_bytes(b"not an xlsx file")
+
+    with pytest.raises(Exception):
+        dm.reload()
+
+    assert dm.dataset is current
+    dm.close()
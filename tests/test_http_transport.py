@@ -0,0 +1,88 @@
+"""Test for serving many clients over streamable HTTP from one process"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamable_http_client
+
+from src.data.data_manager import DataManager
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, process.stderr.read()
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"server did not listen on {port}")
+
+
+async def client(url: str, code: str):
+    async with streamable_http_client(url) as (read_stream, write_stream, _):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            tools = await session.list_tools()
+            result = await session.call_tool("get_jichitai_basic_info", {"jichitai_code": code})
+            return len(tools.tools), json.loads(result.content[0].text)
+
+
+def test_concurrent_clients_and_graceful_shutdown(synthetic_data_dir, tmp_path):
+    bundle = tmp_path / "jichitai.bundle"
+    dm = DataManager(str(synthetic_data_dir))
+    dm.save_snapshot(str(bundle))
+    expected = {code: dm.get_jichitai_basic_info(jichitai_code=code) for code in ("011002", "142018")}
+    dm.close()
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        JICHITAI_TRANSPORT="http",
+        JICHITAI_HTTP_PORT=str(port),
+        JICHITAI_WORKERS="2",
+        JICHITAI_SNAPSHOT_PATH=str(bundle),
+        JICHITAI_SHUTDOWN_TIMEOUT="5",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "src.server"], cwd=PROJECT_ROOT, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        wait_for_port(port, process)
+        url = f"http://127.0.0.1:{port}/mcp"
+        codes = ["011002", "142018"] * 4
+
+        async def run_all():
+            return await asyncio.gather(*(client(url, code) for code in codes))
+
+        results = asyncio.run(run_all())
+        for code, (n_tools, info) in zip(codes, results):
+            assert n_tools > 10
+            assert info == expected[code]
+
+        # uvicorn exits by re-raising the signal once shutdown has completed
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) in (0, -signal.SIGTERM)
+        assert "Traceback" not in process.stderr.read()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
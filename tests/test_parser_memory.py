@@ -0,0 +1,46 @@
+"""Test that parsers release workbooks after ingestion and share repeated strings"""
+import os
+from pathlib import Path
+
+import pytest
+
+from src.data.data_manager import DataManager
+
+
+def open_xlsx_files():
+    fd_dir = Path("/proc/self/fd")
+    paths = []
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(fd_dir / fd)
+        except OSError:
+            continue
+        if target.endswith(".xlsx"):
+            paths.append(target)
+    return paths
+
+
+@pytest.mark.skipif(not Path("/proc/self/fd").exists(), reason="needs /proc")
+def test_no_workbook_stays_open(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    assert dm.dataset.has("dx")
+    assert open_xlsx_files() == []
+
+    for attr in ("population_parser", "finance_parser", "codes_parser", "mynumber_parser", "age_group_parser", "dx_parser"):
+        parser = getattr(dm, attr)
+        assert not any(name.startswith(("wb", "workbook", "worksheet", "ws")) for name in vars(parser)), attr
+    dm.close()
+
+
+def test_repeated_strings_are_shared(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    dataset = dm.dataset
+
+    codes = {r["jichitai_code"]: r for r in dataset.records("codes")}
+    for record in dataset.records("population"):
+        assert record["jichitai_code"] is codes[record["jichitai_code"]]["jichitai_code"]
+        assert record["prefecture"] is codes[record["jichitai_code"]]["prefecture"]
+
+    genders = {id(r["gender"]) for r in dataset.records("age_group") if r["gender"] == "計"}
+    assert len(genders) == 1
+    dm.close()
@@ -0,0 +1,50 @@
+"""Test for precomputed prefecture and national rollups"""
+from conftest import MUNICIPALITIES
+
+from src.data.data_manager import DataManager
+
+
+def test_prefecture_rollup(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    kanagawa = dm.get_prefecture_summary("神奈川県")
+    assert kanagawa["municipality_count"] == 2
+    assert kanagawa["population"]["total"] == 3752969 + 380154
+    assert kanagawa["households"] == 1830226 + 177301
+
+    # Population-weighted financial capability index
+    expected = (0.97 * 3752969 + 0.79 * 380154) / (3752969 + 380154)
+    assert kanagawa["finance"]["financial_capability_index"] == round(expected, 3)
+
+    issued = int(3752969 * 0.82) + int(380154 * 0.84)
+    assert kanagawa["mynumber_card"]["issued_cards"] == issued
+    assert kanagawa["mynumber_card"]["issuance_rate"] == round(issued / (3752969 + 380154) * 100, 2)
+
+    assert kanagawa["demographic_summary"]["elderly_ratio"] is not None
+    assert dm.get_prefecture_summary("存在しない県") is None
+    dm.close()
+
+
+def test_national_total_and_missing_indicators(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.get_prefecture_summary()
+    national = result["national"]
+    assert national["municipality_count"] == len(MUNICIPALITIES)
+    assert national["population"]["total"] == sum(m[3] for m in MUNICIPALITIES)
+    assert len(result["prefectures"]) == 4
+    assert dm.get_prefecture_summary("全国") == national
+
+    # Tokyo only has 世田谷区, which has no financial capability index
+    tokyo = dm.get_prefecture_summary("東京都")
+    assert tokyo["finance"]["financial_capability_index"] is None
+    assert tokyo["finance"]["current_balance_ratio"] == 82.0
+    dm.close()
+
+
+def test_designated_city_wards_are_not_units():
+    from src.data.table import is_designated_ward
+
+    assert is_designated_ward("札幌市中央区")
+    assert not is_designated_ward("世田谷区")
+    assert not is_designated_ward("札幌市")
@@ -0,0 +1,67 @@
+"""Test for the structured municipality query DSL"""
+from src.data.data_manager import DataManager
+
+
+def names(result):
+    return [m["jichitai_name"] for m in result["municipalities"]]
+
+
+def test_predicates_across_sources(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.query_municipalities(
+        where={"and": [
+            {"field": "financial_capability_index", "op": "between", "value": [0.5, 0.8]},
+            {"field": "households", "op": ">", "value": 100000},
+        ]},
+        sort_by="financial_capability_index",
+    )
+    assert names(result) == ["横須賀市", "札幌市", "盛岡市"]
+    assert set(result["municipalities"][0]) == {
+        "jichitai_code", "jichitai_name", "prefecture", "jichitai_type", "financial_capability_index", "households"
+    }
+
+    # DX flags are 1/0; municipality 2 (新篠津村) has no value
+    result = dm.query_municipalities(where={"field": "dx:CIOの任命", "op": "=", "value": 1}, sort_by="population_total")
+    assert names(result) == ["横浜市", "札幌市", "矢巾町"]
+    result = dm.query_municipalities(where={"field": "dx:CIOの任命", "op": "is_null"})
+    assert names(result) == ["新篠津村"]
+
+    result = dm.query_municipalities(
+        where={"or": [
+            {"field": "prefecture", "op": "in", "value": ["岩手県"]},
+            {"not": {"field": "future_burden_ratio", "op": "not_null"}},
+        ]},
+        fields=["jichitai_name"],
+        sort_by="jichitai_code",
+        sort_order="asc",
+    )
+    assert names(result) == ["新篠津村", "盛岡市", "矢巾町", "世田谷区"]
+
+    # Missing values sort last in either direction
+    result = dm.query_municipalities(sort_by="financial_capability_index", sort_order="asc", limit=None)
+    assert result["municipalities"][-1]["jichitai_name"] == "世田谷区"
+    assert result["total_count"] == 8
+    dm.close()
+
+
+def test_plan_cache_and_errors(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    first = dm.query_municipalities(where={"field": "population_total", "op": ">=", "value": 1000000})
+    second = dm.query_municipalities(where={"field": "population_total", "op": ">=", "value": 300000})
+    assert not first["plan_cached"] and second["plan_cached"]
+    assert first["total_count"] == 2 and second["total_count"] == 4
+
+    assert "error" in dm.query_municipalities(where={"field": "no_such_field", "op": "=", "value": 1})
+    assert "error" in dm.query_municipalities(where={"field": "households", "op": "~", "value": 1})
+    assert "error" in dm.query_municipalities(where={"field": "households", "op": ">", "value": "many"})
+    assert "error" in dm.query_municipalities(where={"field": "households", "op": "between", "value": [1]})
+    assert "error" in dm.query_municipalities(where={"and": []})
+
+    for limit in (0, -1):
+        assert "error" in dm.query_municipalities(limit=limit)
+    assert dm.query_municipalities(sort_order="dsc")["supported"] == ["asc", "desc"]
+    everything = dm.query_municipalities(limit=None)
+    assert everything["filtered_count"] == everything["total_count"] > 0
+    dm.close()
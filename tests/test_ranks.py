@@ -0,0 +1,40 @@
+"""Test for precomputed national, in-prefecture and in-type ranks"""
+import math
+from array import array
+
+from src.data.data_manager import DataManager
+from src.data.ranks import RankIndex
+
+
+def test_ranks_in_basic_info(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    assert "ranks" not in dm.get_jichitai_basic_info(jichitai_code="142018")
+
+    ranks = dm.get_jichitai_basic_info(jichitai_code="142018", include_ranks=True)["ranks"]
+    # 財政力指数: 横浜 0.97 > 横須賀 0.79 > 札幌 0.71 > ... (世田谷区 has none)
+    assert ranks["financial_capability_index"] == {
+        "national": {"rank": 2, "of": 7, "percentile": 78.6},
+        "prefecture": {"rank": 2, "of": 2, "percentile": 25.0},
+        "type": {"rank": 2, "of": 5, "percentile": 70.0},
+    }
+    assert ranks["population_total"]["national"]["rank"] == 4
+
+    # Missing values are not ranked
+    ranks = dm.get_jichitai_basic_info(jichitai_code="131121", include_ranks=True)["ranks"]
+    assert "financial_capability_index" not in ranks
+    assert ranks["population_total"]["prefecture"] == {"rank": 1, "of": 1, "percentile": 50.0}
+    # No municipality type in the synthetic code list, so no in-type rank
+    assert "type" not in ranks["population_total"]
+    dm.close()
+
+
+def test_ties_share_rank():
+    values = array("d", [3.0, 5.0, 3.0, 1.0, math.nan])
+    ranks = array("l", [0]) * 5
+    sizes = array("l", [0]) * 5
+    percentiles = array("d", [math.nan]) * 5
+    RankIndex._rank_group([0, 1, 2, 3], values.__getitem__, ranks, sizes, percentiles)
+    assert list(ranks) == [2, 1, 2, 4, 0]
+    assert list(percentiles)[:4] == [50.0, 87.5, 50.0, 12.5]
+    assert list(sizes)[:4] == [4, 4, 4, 4]
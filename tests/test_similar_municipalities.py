@@ -0,0 +1,56 @@
+"""Test for k-nearest-neighbour search over municipality profiles"""
+import math
+
+import pytest
+
+from src.data.data_manager import DataManager
+
+
+def test_nearest_by_population_only(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    features = dm.dataset.derived("similarity").features
+    only_population = {name: 0 for name in features}
+    only_population["population_total"] = 1
+
+    result = dm.find_similar_municipalities(jichitai_name="横浜市", k=3, weights=only_population)
+    assert result["reference"]["jichitai_code"] == "141003"
+    names = [m["jichitai_name"] for m in result["similar_municipalities"]]
+    assert names == ["札幌市", "世田谷区", "横須賀市"]
+    assert [m["rank"] for m in result["similar_municipalities"]] == [1, 2, 3]
+
+    # Distance is the standardized log-population difference
+    index = dm.dataset.derived("similarity")
+    std = index.stats["population_total"]["std"]
+    expected = abs(math.log1p(3752969) - math.log1p(1956928)) / std
+    assert result["similar_municipalities"][0]["distance"] == round(expected, 4)
+    dm.close()
+
+
+def test_constraints_and_errors(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.find_similar_municipalities(jichitai_code="142018", target_jichitai_type=["町", "村"])
+    assert {m["jichitai_name"] for m in result["similar_municipalities"]} == {"新篠津村", "矢巾町"}
+
+    result = dm.find_similar_municipalities(jichitai_code="142018", target_prefecture=["北海道"], k=1)
+    assert len(result["similar_municipalities"]) == 1
+    assert result["similar_municipalities"][0]["prefecture"] == "北海道"
+
+    # The reference itself is never returned
+    result = dm.find_similar_municipalities(jichitai_code="142018", k=20)
+    assert len(result["similar_municipalities"]) == 7
+    assert "142018" not in [m["jichitai_code"] for m in result["similar_municipalities"]]
+
+    assert "error" in dm.find_similar_municipalities(jichitai_code="142018", weights={"unknown": 1})
+    assert dm.find_similar_municipalities(jichitai_code="999999") is None
+
+    for weight in (-1000, -0.5, "1", None, float("nan")):
+        result = dm.find_similar_municipalities(jichitai_code="011002", weights={"population_total": weight})
+        assert "population_total" in result["error"]
+        assert "population_total" in result["supported"]
+
+    for k in (0, -1):
+        assert "error" in dm.find_similar_municipalities(jichitai_code="011002", k=k)
+    with pytest.raises(ValueError):
+        dm.dataset.derived("similarity").query(0, 0)
+    dm.close()
@@ -0,0 +1,57 @@
+"""Test for coalescing identical concurrent tool calls"""
+import asyncio
+import threading
+import time
+
+from mcp.types import TextContent
+
+from src import server
+
+
+def test_identical_calls_share_one_computation(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def slow_dispatch(name, arguments):
+        with lock:
+            calls.append((name, dict(arguments)))
+        time.sleep(0.2)
+        return [TextContent(type="text", text=f"{name}:{len(calls)}")]
+
+    monkeypatch.setattr(server, "dispatch_tool", slow_dispatch)
+
+    async def run():
+        same = [
+            server.call_tool("search_jichitai_by_criteria", {"prefecture": ["北海道"], "limit": 5}),
+            server.call_tool("search_jichitai_by_criteria", {"limit": 5, "prefecture": ["北海道"]}),
+            server.call_tool("search_jichitai_by_criteria", {"prefecture": ["北海道"], "limit": 5}),
+        ]
+        other = server.call_tool("search_jichitai_by_criteria", {"prefecture": ["東京都"], "limit": 5})
+        return await asyncio.gather(*same, other)
+
+    *same, other = asyncio.run(run())
+    assert len(calls) == 2
+    assert same[0] is same[1] is same[2]
+    assert other is not same[0]
+    assert server.in_flight == {}
+
+    # Finished calls are not cached: the next call runs again
+    asyncio.run(server.call_tool("search_jichitai_by_criteria", {"prefecture": ["北海道"], "limit": 5}))
+    assert len(calls) == 3
+
+
+def test_cancelled_caller_does_not_cancel_shared_call(monkeypatch):
+    def slow_dispatch(name, arguments):
+        time.sleep(0.2)
+        return [TextContent(type="text", text="done")]
+
+    monkeypatch.setattr(server, "dispatch_tool", slow_dispatch)
+
+    async def run():
+        first = asyncio.ensure_future(server.call_tool("export_all_municipalities_csv", {"output_path": "x.csv"}))
+        second = asyncio.ensure_future(server.call_tool("export_all_municipalities_csv", {"output_path": "x.csv"}))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run())[0].text == "done"
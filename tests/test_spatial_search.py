@@ -0,0 +1,130 @@
+"""Test for radius and nearest searches over municipal office coordinates"""
+import json
+import math
+
+import pytest
+
+from src import server
+
+from src.data.data_manager import DataManager
+from src.data.spatial import EARTH_RADIUS_KM
+
+
+# 函館市 (012025) has no row; the last row is out of range and skipped
+COORDINATES = """jichitai_code,office_name,latitude,longitude
+011002,札幌市役所,43.0621,141.3544
+013048,新篠津村役場,43.2254,141.6495
+032018,盛岡市役所,39.7020,141.1545
+033227,矢巾町役場,39.6050,141.1627
+131121,世田谷区役所,35.6464,139.6532
+141003,横浜市役所,35.4437,139.6380
+142018,横須賀市役所,35.2810,139.6722
+999999,不明,135.0,139.0
+"""
+
+
+@pytest.fixture
+def geo_data_dir(synthetic_data_dir):
+    path = synthetic_data_dir / "geo" / "municipal_office_coordinates.csv"
+    path.parent.mkdir()
+    path.write_text(COORDINATES, encoding="utf-8")
+    return synthetic_data_dir
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def test_radius_and_nearest(geo_data_dir):
+    dm = DataManager(str(geo_data_dir))
+
+    result = dm.find_nearest_municipalities(jichitai_name="横浜市", k=2)
+    assert result["center"]["jichitai_code"] == "141003"
+    assert [m["jichitai_name"] for m in result["municipalities"]] == ["横須賀市", "世田谷区"]
+    assert result["municipalities"][0]["distance_km"] == round(haversine_km(35.4437, 139.6380, 35.2810, 139.6722), 3)
+
+    result = dm.find_municipalities_within_radius(30, jichitai_code="141003")
+    assert [m["jichitai_name"] for m in result["municipalities"]] == ["横須賀市", "世田谷区"]
+    assert result["total_count"] == 2
+
+    # Filters compose with the radius
+    result = dm.find_municipalities_within_radius(30, jichitai_code="141003", population_min=500000)
+    assert [m["jichitai_name"] for m in result["municipalities"]] == ["世田谷区"]
+    result = dm.find_nearest_municipalities(
+        k=5, latitude=39.70, longitude=141.15,
+        where={"field": "jichitai_type", "op": "=", "value": "町"}
+    )
+    assert [m["jichitai_name"] for m in result["municipalities"]] == ["矢巾町"]
+    assert result["center"] == {"latitude": 39.70, "longitude": 141.15}
+
+    assert dm.find_municipalities_within_radius(10, jichitai_code="012025")["error"]
+    assert dm.find_municipalities_within_radius(10, jichitai_code="999999") is None
+    assert "fields" in dm.find_nearest_municipalities(jichitai_code="141003", where={"field": "nope", "op": "=", "value": 1})
+    dm.close()
+
+
+def test_tree_matches_brute_force(geo_data_dir):
+    dm = DataManager(str(geo_data_dir))
+    index = dm.dataset.derived("spatial")
+    assert len(index) == 7
+
+    points = [(row, *index.location(row)) for row in index.locations]
+    for lat, lon in [(35.5, 139.7), (43.0, 141.0), (39.0, 141.0), (20.0, 120.0)]:
+        expected = sorted((haversine_km(lat, lon, plat, plon), row) for row, plat, plon in points)
+        for k in (1, 3, 7, 10):
+            assert [m["row"] for m in index.nearest(lat, lon, k)] == [row for _, row in expected[:k]]
+        for radius in (5, 50, 500, 5000):
+            assert [m["row"] for m in index.within(lat, lon, radius)] == [row for d, row in expected if d <= radius]
+    dm.close()
+
+
+def test_without_coordinates(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    assert dm.dataset.derived("spatial") is None
+    assert "error" in dm.find_nearest_municipalities(jichitai_code="141003")
+    dm.close()
+
+
+def test_invalid_arguments(geo_data_dir):
+    dm = DataManager(str(geo_data_dir))
+    index = dm.dataset.derived("spatial")
+
+    for result in (
+        dm.find_municipalities_within_radius(-300, jichitai_code="011002"),
+        dm.find_municipalities_within_radius(0, jichitai_code="011002"),
+        dm.find_municipalities_within_radius(float("nan"), jichitai_code="011002"),
+        dm.find_municipalities_within_radius(30, jichitai_code="011002", limit=0),
+        dm.find_nearest_municipalities(k=-1, jichitai_code="011002"),
+        dm.find_nearest_municipalities(k=0, jichitai_code="011002"),
+        dm.find_nearest_municipalities(latitude=400, longitude=139.0),
+        dm.find_nearest_municipalities(latitude=-90.5, longitude=139.0),
+        dm.find_municipalities_within_radius(30, latitude=35.0, longitude=181.0),
+        dm.find_municipalities_within_radius(30, latitude=35.0, longitude=-200.0),
+    ):
+        assert result["success"] is False and result["error"]
+
+    with pytest.raises(ValueError):
+        index.within(35.0, 139.0, -1)
+    with pytest.raises(ValueError):
+        index.nearest(91.0, 139.0, 1)
+    with pytest.raises(ValueError):
+        index.nearest(35.0, 139.0, 0)
+
+    # The bounds themselves are valid
+    assert dm.find_nearest_municipalities(k=1, latitude=90.0, longitude=-180.0)["municipalities"]
+    dm.close()
+
+
+def test_invalid_limit_through_the_tool(geo_data_dir, monkeypatch):
+    dm = DataManager(str(geo_data_dir))
+    monkeypatch.setattr(server, "data_manager", dm)
+
+    def call(**arguments):
+        return json.loads(server.dispatch_tool("find_municipalities_within_radius", arguments)[0].text)
+
+    assert "limit" in call(radius_km=30, jichitai_code="141003", limit=0)["error"]
+    assert len(call(radius_km=30, jichitai_code="141003", limit=1)["municipalities"]) == 1
+    assert len(call(radius_km=30, jichitai_code="141003")["municipalities"]) == 2
+    dm.close()
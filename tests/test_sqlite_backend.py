@@ -0,0 +1,70 @@
+"""Test for the optional SQLite backend"""
+import os
+
+from conftest import MUNICIPALITIES, write_population
+
+from src.data.data_manager import DataManager
+
+
+SEARCHES = [
+    {},
+    {"population_min": 100000, "sort_order": "asc"},
+    {"prefecture": ["北海道", "岩手県"], "limit": 2},
+    {"jichitai_type": ["市"], "financial_capability_min": 0.5, "sort_by": "financial_capability"},
+    {"sort_by": "financial_capability", "sort_order": "asc"},
+    {"population_max": 1000},
+]
+
+
+def test_search_matches_in_memory(synthetic_data_dir, tmp_path):
+    memory = DataManager(str(synthetic_data_dir))
+    backed = DataManager(str(synthetic_data_dir), sqlite_path=str(tmp_path / "jichitai.sqlite3"))
+
+    assert backed.sqlite.matches(backed.dataset)
+    for criteria in SEARCHES:
+        assert backed.search_jichitai_by_criteria(**criteria) == memory.search_jichitai_by_criteria(**criteria)
+    memory.close()
+    backed.close()
+
+
+def test_ad_hoc_queries_and_reuse(synthetic_data_dir, tmp_path):
+    db_path = tmp_path / "jichitai.sqlite3"
+    dm = DataManager(str(synthetic_data_dir), sqlite_path=str(db_path))
+
+    result = dm.run_sql_query(
+        "SELECT prefecture, SUM(population_total) FROM municipalities WHERE is_unit GROUP BY prefecture ORDER BY 1"
+    )
+    assert result["columns"] == ["prefecture", "SUM(population_total)"]
+    sums = dict(result["rows"])
+    assert sums["神奈川県"] == 3752969 + 380154
+
+    result = dm.run_sql_query("SELECT raw_value FROM dx_values WHERE indicator = ? AND jichitai_name = ?", ["CIOの任命", "札幌市"])
+    assert result["rows"] == [["実施"]]
+
+    result = dm.run_sql_query("SELECT jichitai_code FROM population", limit=3)
+    assert result["row_count"] == 3 and result["truncated"]
+
+    # Read-only: writes are rejected
+    assert "error" in dm.run_sql_query("DELETE FROM population")
+    assert "error" in dm.run_sql_query("SELECT * FROM no_such_table")
+    dm.close()
+
+    # Another manager over the same data reuses the file without rebuilding
+    mtime = os.stat(db_path).st_mtime_ns
+    again = DataManager(str(synthetic_data_dir), sqlite_path=str(db_path))
+    assert again.sqlite.matches(again.dataset)
+    assert os.stat(db_path).st_mtime_ns == mtime
+
+    # A reload re-materializes the new version
+    write_population(synthetic_data_dir, scale=2.0)
+    os.utime(synthetic_data_dir / "population" / "r06_municipal_population.xlsx", ns=(1, 1))
+    assert again.reload(["population"]) is not None
+    total = again.run_sql_query("SELECT total FROM population WHERE jichitai_code = '142018'")["rows"][0][0]
+    assert total == int(MUNICIPALITIES[7][3] * 2.0)
+    again.close()
+
+
+def test_disabled_backend(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+    assert "error" in dm.run_sql_query("SELECT 1")
+    dm.close()
@@ -0,0 +1,62 @@
+"""Test for multi-vintage time-series data"""
+from conftest import write_finance, write_mynumber, write_population
+
+from src.data.data_manager import DataManager
+
+
+def test_population_series_and_delta(synthetic_data_dir):
+    write_population(synthetic_data_dir, scale=0.5, file_name="r05_municipal_population.xlsx")
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.get_time_series(jichitai_codes=["142018", "033227"], metrics=["population_total"])
+    assert result["vintages"] == ["r05", "r06"]
+    yokosuka = result["municipalities"][0]
+    assert yokosuka["jichitai_name"] == "横須賀市"
+    assert yokosuka["series"]["population_total"] == [190077.0, 380154.0]
+
+    delta = dm.get_time_series(jichitai_codes=["142018"], metrics=["population_total"], mode="delta")
+    change = delta["municipalities"][0]["delta"]["population_total"][0]
+    assert change["from"] == "r05" and change["to"] == "r06"
+    assert change["change"] == 190077.0
+    assert change["change_rate"] == 100.0
+
+    dm.close()
+
+
+def test_finance_series_by_prefecture(synthetic_data_dir):
+    write_finance(synthetic_data_dir, file_name="r04_finance_all_municipalities.xlsx", delta=-0.1)
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.get_time_series(source="finance", prefecture="岩手県", metrics=["financial_capability_index"])
+    assert result["vintages"] == ["r04", "r05"]
+    assert [m["jichitai_code"] for m in result["municipalities"]] == ["032018", "033227"]
+    assert result["municipalities"][1]["series"]["financial_capability_index"] == [0.42, 0.52]
+
+    # Missing values stay null instead of breaking the series
+    tokyo = dm.get_time_series(source="finance", jichitai_codes=["131121"], metrics=["financial_capability_index"])
+    assert tokyo["municipalities"][0]["series"]["financial_capability_index"] == [None, None]
+
+    dm.close()
+
+
+def test_unknown_metric_and_missing_source(synthetic_data_dir):
+    dm = DataManager(str(synthetic_data_dir))
+
+    assert "error" in dm.get_time_series(metrics=["no_such_metric"])
+    assert "error" in dm.get_time_series(source="mynumber", jichitai_codes=["142018"])
+    assert dm.get_time_series(jichitai_codes=["142018"], mode="deltas")["supported"] == ["series", "delta"]
+
+    dm.close()
+
+
+def test_current_mynumber_vintage_from_sheet_title(synthetic_data_dir):
+    write_mynumber(synthetic_data_dir, title="マイナンバーカード交付状況（令和７年８月末時点）")
+    write_mynumber(synthetic_data_dir, rate_offset=-0.1, file_name="r07_03_mynumber_card_rate.xlsx")
+    dm = DataManager(str(synthetic_data_dir))
+
+    result = dm.get_time_series(source="mynumber", jichitai_codes=["142018"], metrics=["issuance_rate"])
+    assert result["vintages"] == ["r07_03", "r07_08"]
+    assert result["municipalities"][0]["series"]["issuance_rate"] == [
+        74.0, 84.0
+    ]
+    dm.close()